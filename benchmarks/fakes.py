@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class LatencyFakeChatModel(BaseChatModel):
+    """Chat model that cycles through fixed responses, or computes them from
+    the prompt with `respond`, after sleeping for `latency` seconds. Stands
+    in for an OpenAI chat model; `respond` may return a whole message, e.g.
+    one with a function call for the agent."""
+
+    responses: List[str] = []
+    respond: Optional[Callable[[List[BaseMessage]], Union[str, BaseMessage]]] = None
+    latency: float = 0.0
+    i: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-fake-chat-model"
+
+    def _next_response(self, messages: List[BaseMessage]) -> ChatResult:
+        if self.respond is not None:
+            response = self.respond(messages)
+        else:
+            response = self.responses[self.i % len(self.responses)]
+            self.i += 1
+        if isinstance(response, str):
+            response = AIMessage(content=response)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._next_response(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._next_response(messages)
+
+
+class LatencyFakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic embeddings that take `latency` seconds per call."""
+
+    latency: float = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class _FakeResult:
+    def __iter__(self):
+        return iter([])
+
+    def single(self):
+        return None
+
+    def consume(self):
+        return None
+
+
+class _FakeTransaction:
+    def __init__(self, driver: "FakeNeo4jDriver") -> None:
+        self.driver = driver
+
+    def run(self, query: str, parameters: dict | None = None, **kwargs: Any) -> _FakeResult:
+        rows = (parameters or {}).get("rows")
+        time.sleep(self.driver.latency + self.driver.row_latency * len(rows or []))
+        self.driver.queries += 1
+        return _FakeResult()
+
+
+class _FakeSession:
+    def __init__(self, driver: "FakeNeo4jDriver") -> None:
+        self.driver = driver
+
+    def __enter__(self) -> "_FakeSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(_FakeTransaction(self.driver), *args, **kwargs)
+
+    execute_write = execute_read
+
+    def run(self, query: str, parameters: dict | None = None, **kwargs: Any) -> _FakeResult:
+        return _FakeTransaction(self.driver).run(query, parameters)
+
+
+class FakeNeo4jDriver:
+    """Neo4j driver stand-in for the ETL loader: every statement takes
+    `latency` seconds plus `row_latency` per UNWIND row and returns nothing,
+    so an empty graph is what every read sees."""
+
+    def __init__(self, latency: float = 0.0, row_latency: float = 0.0) -> None:
+        self.latency = latency
+        self.row_latency = row_latency
+        self.queries = 0
+
+    def session(self, database: str | None = None, **kwargs: Any) -> _FakeSession:
+        return _FakeSession(self)
+
+    def close(self) -> None:
+        pass
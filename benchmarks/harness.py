@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import platform
+import resource
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+
+BASELINE_FORMAT_VERSION = 1
+
+
+async def measure_stage(
+    operation: Callable[[int], Awaitable[Any]],
+    iterations: int,
+    concurrency: int = 1,
+    warmup: int = 2,
+    items_per_iteration: int = 1,
+) -> dict[str, Any]:
+    """Time `iterations` awaited calls of operation(i), at most
+    `concurrency` at a time, after `warmup` untimed calls.
+
+    Reports latency percentiles in milliseconds, throughput in items per
+    second over the wall time, and the peak Python heap allocated by one
+    more call traced with tracemalloc (kept out of the timed calls, which
+    it would slow down).
+    """
+    for i in range(warmup):
+        await operation(i)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def timed(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await operation(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(iterations)))
+    wall_seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        await operation(iterations)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "throughput_per_s": round(iterations * items_per_iteration / wall_seconds, 3),
+        "peak_memory_mb": round(peak_bytes / 2**20, 3),
+    }
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2**20 if platform.system() == "Darwin" else 2**10), 3)
+
+
+def save_baseline(path: str, results: dict[str, Any], config: dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": BASELINE_FORMAT_VERSION,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "config": config,
+                "max_rss_mb": max_rss_mb(),
+                "stages": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def compare_to_baseline(
+    path: str, results: dict[str, Any], max_regression: float
+) -> list[str]:
+    """Print p50/p95/p99 changes against a saved baseline and return the
+    stages whose p95 got slower by more than max_regression (0.2 = 20%)."""
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)["stages"]
+
+    regressions = []
+    print(f"\n{'stage':<28}{'p50':>18}{'p95':>18}{'p99':>18}")
+    for stage, result in results.items():
+        if stage not in baseline:
+            continue
+        cells = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            before, after = baseline[stage][metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            cells.append(f"{after:9.2f} ({change:+6.1%})")
+        print(f"{stage:<28}" + "".join(f"{cell:>18}" for cell in cells))
+        before_p95 = baseline[stage]["p95_ms"]
+        if before_p95 and (result["p95_ms"] - before_p95) / before_p95 > max_regression:
+            regressions.append(stage)
+    return regressions
+
+
+def print_results(results: dict[str, Any]) -> None:
+    print(
+        f"{'stage':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'items/s':>12}{'peak MB':>10}"
+    )
+    for stage, r in results.items():
+        print(
+            f"{stage:<28}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['throughput_per_s']:>12.1f}{r['peak_memory_mb']:>10.2f}"
+        )
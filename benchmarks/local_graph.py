@@ -0,0 +1,264 @@
+import asyncio
+import time
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from langchain_community.graphs.graph_store import GraphStore
+
+from chatbot_api.rag_agents import fast_path
+from chatbot_api.tools.traffic_analytics import TRAFFIC_ARTICLES_QUERY, TRAFFIC_ROWS_QUERY
+from chatbot_api.tools.traffic_performance import (
+    ROLLUPS_EXIST_QUERY,
+    TOP_REPORTERS_FROM_TRAFFIC_QUERY,
+    TOP_REPORTERS_QUERY,
+)
+from chatbot_api.utils.data_version import DATA_VERSION_QUERY
+from chatbot_api.utils.graph_entities import ENTITIES_QUERY
+from chatbot_api.utils.neo4j_vector_retriever import VECTOR_SEARCH_QUERY
+from chatbot_api.utils.passage_context import PASSAGE_SEARCH_QUERY
+
+STRUCTURED_SCHEMA = {
+    "node_props": {
+        "Articles": [
+            {"property": "article_id", "type": "INTEGER"},
+            {"property": "title", "type": "STRING"},
+            {"property": "published_at", "type": "STRING"},
+        ],
+        "Reporter": [{"property": "reporter_name", "type": "STRING"}],
+        "Category": [{"property": "category_name", "type": "STRING"}],
+        "ArticleTraffic": [
+            {"property": "grain", "type": "STRING"},
+            {"property": "period_start", "type": "STRING"},
+            {"property": "sessions", "type": "INTEGER"},
+            {"property": "screenPageViews", "type": "INTEGER"},
+            {"property": "activeUsers", "type": "INTEGER"},
+        ],
+    },
+    "rel_props": {},
+    "relationships": [
+        {"start": "Reporter", "type": "WROTE", "end": "Articles"},
+        {"start": "Category", "type": "CONTAIN", "end": "Articles"},
+        {"start": "Articles", "type": "ROLLUP", "end": "ArticleTraffic"},
+    ],
+}
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _top_k(vectors: np.ndarray, embedding: list[float], k: int) -> tuple[np.ndarray, np.ndarray]:
+    query = np.asarray(embedding, dtype=np.float32)
+    scores = vectors @ (query / np.linalg.norm(query))
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+class LocalGraph(GraphStore):
+    """In-memory stand-in for the publisher graph.
+
+    Answers the fixed queries the API runs (entity catalog, data version,
+    reporter ranking, fast path, traffic analytics, vector and passage
+    search) from pandas
+    frames and NumPy vectors, after sleeping `latency` seconds per query.
+    Any other Cypher, such as LLM-generated queries, gets the newest
+    articles back.
+    """
+
+    def __init__(
+        self,
+        articles: pd.DataFrame,
+        traffic: pd.DataFrame,
+        passages: pd.DataFrame | None = None,
+        dimension: int = 256,
+        latency: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.schema = str(STRUCTURED_SCHEMA)
+        self.structured_schema = STRUCTURED_SCHEMA
+        self.articles = articles.fillna("")
+        traffic = traffic.merge(
+            self.articles[["article_id", "reporter_name", "category_name"]],
+            on="article_id",
+        )
+        self.article_days = traffic.groupby(
+            ["article_id", "traffic_date"], as_index=False
+        )[["activeUsers", "sessions", "screenPageViews"]].sum()
+        self.reporter_days = traffic.groupby(
+            ["reporter_name", "traffic_date"], as_index=False
+        )[["activeUsers", "sessions", "screenPageViews"]].sum()
+
+        rng = np.random.default_rng(seed)
+        self.article_vectors = _normalized(
+            rng.standard_normal((len(self.articles), dimension), dtype=np.float32)
+        )
+        self.passages = passages
+        if passages is not None:
+            self.passage_vectors = _normalized(
+                rng.standard_normal((len(passages), dimension), dtype=np.float32)
+            )
+
+        self.handlers = {
+            DATA_VERSION_QUERY: lambda p: [{"data_version": 1}],
+            ENTITIES_QUERY: self._entities,
+            TOP_REPORTERS_QUERY: self._top_reporters,
+            TOP_REPORTERS_FROM_TRAFFIC_QUERY: self._top_reporters,
+            ROLLUPS_EXIST_QUERY: lambda p: [{"rollups": True}],
+            **dict.fromkeys(fast_path.LIST_ARTICLES_QUERIES.values(), self._list_articles),
+            **dict.fromkeys(fast_path.COUNT_ARTICLES_QUERIES.values(), self._count_articles),
+            **dict.fromkeys(fast_path.MOST_VIEWED_QUERIES.values(), self._most_viewed),
+            fast_path.LAST_TRAFFIC_DAY_QUERY: lambda p: [
+                {"last_day": self.article_days["traffic_date"].max()}
+            ],
+            PASSAGE_SEARCH_QUERY: self._passage_search,
+            TRAFFIC_ROWS_QUERY: self._traffic_rows,
+            TRAFFIC_ARTICLES_QUERY: self._traffic_articles,
+        }
+
+    @property
+    def get_schema(self) -> str:
+        return str(STRUCTURED_SCHEMA)
+
+    @property
+    def get_structured_schema(self) -> dict[str, Any]:
+        return STRUCTURED_SCHEMA
+
+    def refresh_schema(self) -> None:
+        pass
+
+    def add_graph_documents(self, *args: Any, **kwargs: Any) -> None:
+        raise NotImplementedError
+
+    def _run(self, query: str, params: dict[str, Any] | None) -> list[dict[str, Any]]:
+        params = params or {}
+        handler = self.handlers.get(query)
+        if handler is not None:
+            return handler(params)
+        if query.startswith(VECTOR_SEARCH_QUERY):
+            return self._vector_search(params)
+        return self._list_articles({"limit": 10})
+
+    def query(self, query: str, params: dict | None = None) -> list[dict[str, Any]]:
+        time.sleep(self.latency)
+        return self._run(query, params)
+
+    async def aquery(self, query: str, params: dict | None = None) -> list[dict[str, Any]]:
+        await asyncio.sleep(self.latency)
+        return self._run(query, params)
+
+    def _entities(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        return [
+            {"kind": "reporter", "name": name}
+            for name in self.articles["reporter_name"].unique()
+        ] + [
+            {"kind": "category", "name": name}
+            for name in self.articles["category_name"].unique()
+        ]
+
+    def _filtered_articles(self, params: dict[str, Any]) -> pd.DataFrame:
+        articles = self.articles
+        if params.get("reporter"):
+            articles = articles[articles["reporter_name"] == params["reporter"]]
+        if params.get("category"):
+            articles = articles[articles["category_name"] == params["category"]]
+        return articles
+
+    def _in_range(self, dates: pd.Series, params: dict[str, Any]) -> pd.Series:
+        mask = pd.Series(True, index=dates.index)
+        if params.get("start_date"):
+            mask &= dates >= params["start_date"]
+        if params.get("end_date"):
+            mask &= dates <= params["end_date"]
+        return mask
+
+    def _list_articles(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        articles = self._filtered_articles(params)
+        articles = articles[self._in_range(articles["published_at"].str[:10], params)]
+        return (
+            articles.sort_values("published_at", ascending=False)
+            .head(params.get("limit", 10))[
+                ["title", "published_at", "reporter_name", "category_name"]
+            ].to_dict("records")
+        )
+
+    def _count_articles(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        articles = self._filtered_articles(params)
+        mask = self._in_range(articles["published_at"].str[:10], params)
+        return [{"articles": int(mask.sum())}]
+
+    def _most_viewed(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        days = self.article_days[self._in_range(self.article_days["traffic_date"], params)]
+        totals = days.groupby("article_id", as_index=False)[
+            ["sessions", "screenPageViews"]
+        ].sum()
+        totals = totals.merge(self._filtered_articles(params), on="article_id")
+        top = totals.nlargest(params.get("limit", 10), "screenPageViews")
+        return [
+            {
+                "title": row.title,
+                "published_at": row.published_at,
+                "reporter_name": row.reporter_name,
+                "tot_pageviews": int(row.screenPageViews),
+                "tot_session": int(row.sessions),
+            }
+            for row in top.itertuples()
+        ]
+
+    def _traffic_rows(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        return self.article_days.to_dict("records")
+
+    def _traffic_articles(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        return self.articles[
+            ["article_id", "title", "published_at", "reporter_name", "category_name"]
+        ].to_dict("records")
+
+    def _top_reporters(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        days = self.reporter_days[self._in_range(self.reporter_days["traffic_date"], params)]
+        totals = days.groupby("reporter_name", as_index=False)[
+            ["sessions", "screenPageViews", "activeUsers"]
+        ].sum()
+        top = totals.nlargest(params.get("top_n", 5), "sessions")
+        return [
+            {
+                "reporter_name": row.reporter_name,
+                "tot_session": int(row.sessions),
+                "tot_pageviews": int(row.screenPageViews),
+                "tot_users": int(row.activeUsers),
+            }
+            for row in top.itertuples()
+        ]
+
+    def _vector_search(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        top, scores = _top_k(self.article_vectors, params["embedding"], params["k"])
+        rows = []
+        for index, score in zip(top, scores):
+            article = self.articles.iloc[index]
+            rows.append(
+                {
+                    "text": f"\nreporter_name: {article.reporter_name}"
+                    f"\ncategory_name: {article.category_name}"
+                    f"\nbody_content: {article.body_content}"
+                    f"\ntitle: {article.title}"
+                    f"\npublished_at: {article.published_at}",
+                    "score": float(score),
+                    "metadata": {
+                        "article_id": int(article.article_id),
+                        "title": article.title,
+                        "published_at": article.published_at,
+                        "reporter_name": article.reporter_name,
+                        "category_name": article.category_name,
+                    },
+                }
+            )
+        return rows
+
+    def _passage_search(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        top, scores = _top_k(self.passage_vectors, params["embedding"], params["k"])
+        return [
+            {**self.passages.iloc[index].to_dict(), "score": float(score)}
+            for index, score in zip(top, scores)
+        ]
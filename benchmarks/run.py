@@ -0,0 +1,434 @@
+"""Offline benchmarks for the chatbot API and the ETL loader.
+
+Runs the graph QA chain, the Summary chain with each retriever, the
+Productivity tool, the fast path, the /doc-rag-agent endpoint and the
+batched ETL load against local stand-ins: fake chat models and embeddings
+with a configurable latency, an in-memory graph and a no-op Neo4j driver.
+No OpenAI key or Neo4j instance is needed.
+
+    python -m benchmarks.run --scale 10 --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.run --scale 10 --compare benchmarks/baselines/local.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import warnings
+from contextlib import ExitStack
+from unittest import mock
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ETL_SRC_DIR = os.path.join(REPO_DIR, "publisher_neo4j_etl", "src")
+
+# The API modules read their settings on import.
+for key, value in {
+    "EMBEDDING_BACKEND": "fake",
+    "ANSWER_CACHE_BACKEND": "none",
+    "WARM_UP_ON_STARTUP": "false",
+    "SNAPSHOT_DIR": tempfile.mkdtemp(prefix="benchmark-snapshots-"),
+}.items():
+    os.environ.setdefault(key, value)
+sys.path.insert(0, ETL_SRC_DIR)
+
+import httpx
+import numpy as np
+import pandas as pd
+from langchain_core.messages import AIMessage, FunctionMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.vectorstores import VectorStore
+
+from benchmarks.fakes import FakeNeo4jDriver, LatencyFakeChatModel, LatencyFakeEmbeddings
+from benchmarks.harness import compare_to_baseline, measure_stage, print_results, save_baseline
+from benchmarks.local_graph import LocalGraph
+from benchmarks.synthetic_data import ARTICLES_CSV, TRAFFIC_CSV, scale_dataset
+from chatbot_api import main as api
+from chatbot_api.chains.doc_cypher_chain import build_traffict_cypher_chain
+from chatbot_api.chains.doc_summary_chain import (
+    articles_retrieval_query,
+    build_summary_vector_chain,
+)
+from chatbot_api.rag_agents import doc_rag_agent
+from chatbot_api.rag_agents.fast_path import answer_fast_path
+from chatbot_api.tools.traffic_analytics import aget_popular_articles, aget_traffic_trend
+from chatbot_api.tools.traffic_performance import aget_most_productive_reporter
+from chatbot_api.utils import mmap_vector_retriever as mmap
+from chatbot_api.utils.graph_entities import find_entities
+from chatbot_api.utils.neo4j_connection import Neo4jConnectionManager
+from chatbot_api.utils.neo4j_vector_retriever import AsyncNeo4jVectorRetriever
+from chatbot_api.utils.passage_context import PassageContextRetriever
+
+STAGES = [
+    "cypher_chain",
+    "cypher_chain_cached",
+    "summary_neo4j",
+    "summary_mmap",
+    "summary_passages",
+    "productivity_tool",
+    "traffic_analytics",
+    "fast_path",
+    "api_doc_rag_agent",
+    "etl_batched",
+    "etl_parallel",
+]
+
+SUMMARY_QUESTIONS = [
+    "Give me highlight of what happen on pemilu 2024!",
+    "Summarize the news about the floods",
+    "What did the articles say about the national football team?",
+    "What happened at the music festival?",
+]
+DATE_RANGES = ["", "2024-03-20 to 2024-03-25", "2024-03-21", "2024-03-22 to 2024-03-22"]
+# Popular and Trend tool inputs, answered from the in-process traffic table.
+ANALYTICS_INPUTS = [
+    (aget_popular_articles, "articles pageviews top 10 2024-03-20 to 2024-03-25"),
+    (aget_popular_articles, "reporters sessions top 5"),
+    (aget_popular_articles, "categories growth 2024-03-22 to 2024-03-23"),
+    (aget_traffic_trend, "daily pageviews 2024-03-20 to 2024-03-25"),
+]
+
+
+class _LocalVectorStore(VectorStore):
+    """The attributes AsyncNeo4jVectorRetriever reads from a Neo4jVector,
+    for a search answered by the local graph."""
+
+    def __init__(self, embedding, index_name: str, retrieval_query: str) -> None:
+        self.embedding = embedding
+        self.index_name = index_name
+        self.retrieval_query = retrieval_query
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError
+
+    def similarity_search(self, query, k=4, **kwargs):
+        raise NotImplementedError
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError
+
+
+def _write_vector_export(graph: LocalGraph, export_dir: str) -> None:
+    """Write the local graph's article vectors in the ETL export layout."""
+    version_dir = os.path.join(export_dir, "v00000001-benchmark")
+    os.makedirs(version_dir, exist_ok=True)
+    np.save(os.path.join(version_dir, mmap.VECTORS_FILE), graph.article_vectors)
+    columns = ["article_id", "title", "published_at", "reporter_name", "category_name", "body_content"]
+    with open(os.path.join(version_dir, mmap.SIDECAR_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": mmap.VECTOR_EXPORT_FORMAT_VERSION,
+                "data_version": 1,
+                "dimension": graph.article_vectors.shape[1],
+                "articles": graph.articles[columns].to_dict("records"),
+            },
+            f,
+            default=int,
+        )
+    with open(os.path.join(export_dir, mmap.CURRENT_POINTER), "w", encoding="utf-8") as f:
+        f.write("v00000001-benchmark")
+
+
+def _passages(articles: pd.DataFrame) -> pd.DataFrame:
+    from passage_stage import split_passages
+
+    rows = []
+    for article in articles.itertuples():
+        for seq, text in enumerate(split_passages(article.body_content)):
+            rows.append(
+                {
+                    "text": text,
+                    "seq": seq,
+                    "article_id": article.article_id,
+                    "title": article.title,
+                    "published_at": article.published_at,
+                    "reporter_name": article.reporter_name,
+                    "category_name": article.category_name,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def _word_count(text: str) -> int:
+    # Roughly tiktoken's count for this text, without downloading its
+    # encoding files.
+    return int(len(text.split()) * 1.3)
+
+
+def _cypher_llm(catalog: dict[str, list[str]], latency: float) -> LatencyFakeChatModel:
+    """Cypher model answering reporter questions with a Cypher statement
+    that names the reporter, so the template cache can parameterize it."""
+
+    def respond(messages) -> str:
+        question = messages[-1].content.split("The question is:")[-1]
+        reporters = [v for kind, v, _, _ in find_entities(question, catalog) if kind == "reporter"]
+        reporter = reporters[0] if reporters else catalog["reporter"][0]
+        return (
+            f"MATCH (r:Reporter {{reporter_name: '{reporter}'}})-[:WROTE]->(a:Articles) "
+            "RETURN a.title AS title, a.published_at AS published_at "
+            "ORDER BY a.published_at DESC LIMIT 10"
+        )
+
+    return LatencyFakeChatModel(respond=respond, latency=latency)
+
+
+def _agent_llm(latency: float) -> LatencyFakeChatModel:
+    """Agent model that calls the Graph tool once, then answers."""
+
+    def respond(messages):
+        if isinstance(messages[-1], FunctionMessage):
+            return "Here is what the graph says about the question."
+        question = messages[-1].content
+        return AIMessage(
+            content="",
+            additional_kwargs={
+                "function_call": {"name": "Graph", "arguments": json.dumps({"__arg1": question})}
+            },
+        )
+
+    return LatencyFakeChatModel(respond=respond, latency=latency)
+
+
+AGENT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", "You are a helpful assistant"),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ]
+)
+
+
+async def run_benchmarks(args: argparse.Namespace) -> dict:
+    articles_path, traffic_path = ARTICLES_CSV, TRAFFIC_CSV
+    if args.scale > 1:
+        articles_path, traffic_path = scale_dataset(args.scale, args.data_dir)
+    articles = pd.read_csv(articles_path)
+    traffic = pd.read_csv(traffic_path)
+    stages = args.stages.split(",") if args.stages else STAGES
+
+    graph = LocalGraph(
+        articles,
+        traffic,
+        passages=_passages(articles) if "summary_passages" in stages else None,
+        dimension=args.dimension,
+        latency=args.graph_latency,
+    )
+    catalog = {
+        "reporter": sorted(graph.articles["reporter_name"].unique()),
+        "category": sorted(graph.articles["category_name"].unique()),
+    }
+    reporters = catalog["reporter"][:20]
+    categories = catalog["category"][:10]
+    embeddings = LatencyFakeEmbeddings(size=args.dimension, latency=args.embedding_latency)
+
+    def llm(response: str) -> LatencyFakeChatModel:
+        return LatencyFakeChatModel(responses=[response], latency=args.llm_latency)
+
+    def cypher_chain(cached: bool):
+        chain = build_traffict_cypher_chain(
+            graph=graph,
+            cypher_llm=_cypher_llm(catalog, args.llm_latency),
+            qa_llm=llm("The reporter wrote these articles."),
+        )
+        chain.verbose = False
+        if not cached:
+            chain.cypher_cache = chain.result_cache = None
+        return chain
+
+    def summary_chain(retriever):
+        return build_summary_vector_chain(retriever=retriever, llm=llm("A short summary."))
+
+    reporter_questions = [f"Which articles did {name} write about politics?" for name in reporters]
+    fast_path_questions = [
+        q
+        for name in reporters[:5]
+        for q in (f"latest articles by {name}", f"how many articles did {name} write?")
+    ] + [f"most viewed articles in {name}" for name in categories[:5]] + [
+        "who is the most productive reporter?"
+    ]
+    api_questions = [q for pair in zip(fast_path_questions, reporter_questions) for q in pair]
+
+    def questions(items):
+        return lambda i: items[i % len(items)]
+
+    operations = {}
+    if "cypher_chain" in stages:
+        chain = cypher_chain(cached=False)
+        q = questions(reporter_questions)
+        operations["cypher_chain"] = lambda i: chain.ainvoke(q(i))
+    if "cypher_chain_cached" in stages:
+        cached_chain = cypher_chain(cached=True)
+        q = questions(reporter_questions)
+        operations["cypher_chain_cached"] = lambda i: cached_chain.ainvoke(q(i))
+    if "summary_neo4j" in stages:
+        neo4j_chain = summary_chain(
+            AsyncNeo4jVectorRetriever(
+                vectorstore=_LocalVectorStore(embeddings, "articles", articles_retrieval_query),
+                search_kwargs={"k": 12},
+            )
+        )
+        operations["summary_neo4j"] = lambda i: neo4j_chain.ainvoke(
+            SUMMARY_QUESTIONS[i % len(SUMMARY_QUESTIONS)]
+        )
+    if "summary_mmap" in stages:
+        export_dir = tempfile.mkdtemp(prefix="benchmark-vectors-")
+        _write_vector_export(graph, export_dir)
+        mmap_chain = summary_chain(
+            mmap.MmapVectorRetriever(
+                index=mmap.MmapVectorIndex(export_dir), embeddings=embeddings, k=12
+            )
+        )
+        operations["summary_mmap"] = lambda i: mmap_chain.ainvoke(
+            SUMMARY_QUESTIONS[i % len(SUMMARY_QUESTIONS)]
+        )
+    if "summary_passages" in stages:
+        passage_chain = summary_chain(
+            PassageContextRetriever(embeddings=embeddings, count_tokens=_word_count)
+        )
+        operations["summary_passages"] = lambda i: passage_chain.ainvoke(
+            SUMMARY_QUESTIONS[i % len(SUMMARY_QUESTIONS)]
+        )
+    if "productivity_tool" in stages:
+        operations["productivity_tool"] = lambda i: aget_most_productive_reporter(
+            DATE_RANGES[i % len(DATE_RANGES)]
+        )
+    if "traffic_analytics" in stages:
+
+        def analytics(i):
+            tool, text = ANALYTICS_INPUTS[i % len(ANALYTICS_INPUTS)]
+            return tool(text)
+
+        operations["traffic_analytics"] = analytics
+    if "fast_path" in stages:
+        q = questions(fast_path_questions)
+        operations["fast_path"] = lambda i: answer_fast_path(q(i))
+    if "api_doc_rag_agent" in stages:
+        executor = doc_rag_agent.build_doc_rag_agent_executor(
+            llm=_agent_llm(args.llm_latency), prompt=AGENT_PROMPT, mode="functions"
+        )
+        executor.verbose = False
+        agent_chain = cypher_chain(cached=False)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=api.app), base_url="http://benchmark"
+        )
+        q = questions(api_questions)
+
+        async def post(i):
+            response = await client.post("/doc-rag-agent", json={"text": q(i)})
+            response.raise_for_status()
+
+        operations["api_doc_rag_agent"] = post
+
+    results = {}
+    with ExitStack() as stack:
+
+        async def aquery(self, query, params=None, timeout=None):
+            return await graph.aquery(query, params)
+
+        stack.enter_context(
+            mock.patch.object(
+                Neo4jConnectionManager,
+                "query",
+                lambda self, query, params=None, timeout=None: graph.query(query, params),
+            )
+        )
+        stack.enter_context(mock.patch.object(Neo4jConnectionManager, "aquery", aquery))
+        if "api_doc_rag_agent" in operations:
+            stack.enter_context(
+                mock.patch.object(
+                    api, "get_doc_rag_agent_executor", lambda tier="large": executor
+                )
+            )
+            stack.enter_context(
+                mock.patch.object(doc_rag_agent, "get_traffict_cypher_chain", lambda: agent_chain)
+            )
+
+        for stage in STAGES:
+            if stage in operations:
+                results[stage] = await measure_stage(
+                    operations[stage], args.iterations, concurrency=args.concurrency
+                )
+
+    for stage, workers in [("etl_batched", 1), ("etl_parallel", args.etl_workers)]:
+        if stage in stages:
+            results[stage] = await _measure_etl(
+                articles_path, traffic_path, len(articles) + len(traffic), workers, args
+            )
+    return results
+
+
+async def _measure_etl(articles_path, traffic_path, rows, workers, args) -> dict:
+    from bulk_csv_writer import load_publisher_graph_batched
+
+    def load(i):
+        driver = FakeNeo4jDriver(latency=args.graph_latency, row_latency=args.etl_row_latency)
+        return asyncio.to_thread(
+            load_publisher_graph_batched,
+            driver,
+            articles_path,
+            traffic_path,
+            batch_size=args.etl_batch_size,
+            incremental=False,
+            workers=workers,
+        )
+
+    return await measure_stage(
+        load, args.etl_iterations, warmup=0, items_per_iteration=rows
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="copies of the sample data")
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(tempfile.gettempdir(), "publisher-benchmark-data"),
+        help="where scaled CSVs are written",
+    )
+    parser.add_argument("--stages", default="", help=f"comma separated, of {','.join(STAGES)}")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.01)
+    parser.add_argument("--graph-latency", type=float, default=0.002, help="seconds per query")
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--etl-iterations", type=int, default=3)
+    parser.add_argument("--etl-workers", type=int, default=4)
+    parser.add_argument("--etl-batch-size", type=int, default=1000)
+    parser.add_argument("--etl-row-latency", type=float, default=0.00002)
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with this baseline JSON")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="allowed p95 slowdown, 0.2 = 20%%"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    warnings.simplefilter("ignore", DeprecationWarning)
+    results = asyncio.run(run_benchmarks(args))
+    print_results(results)
+
+    config = {
+        k: v
+        for k, v in vars(args).items()
+        if k not in ("data_dir", "save_baseline", "compare", "max_regression")
+    }
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, config)
+    if args.compare:
+        regressions = compare_to_baseline(args.compare, results, args.max_regression)
+        if regressions:
+            print(f"\np95 regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
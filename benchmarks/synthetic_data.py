@@ -0,0 +1,84 @@
+"""Scale data/articles.csv and data/traffic.csv up for benchmarks.
+
+Every copy of the dataset gets its own article and traffic ids and a
+numbered title, while reporters, categories and dates stay the same, so
+the scaled graph has the same shape with more articles per entity.
+
+    python -m benchmarks.synthetic_data --scale 100 --out-dir benchmarks/data
+"""
+
+import argparse
+import csv
+import os
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+ARTICLES_CSV = os.path.join(DATA_DIR, "articles.csv")
+TRAFFIC_CSV = os.path.join(DATA_DIR, "traffic.csv")
+
+csv.field_size_limit(2**31 - 1)
+
+
+def _max_int(path: str, column: str) -> int:
+    with open(path, newline="", encoding="utf-8") as f:
+        return max(int(row[column]) for row in csv.DictReader(f))
+
+
+def scale_dataset(
+    scale: int,
+    out_dir: str,
+    articles_path: str = ARTICLES_CSV,
+    traffic_path: str = TRAFFIC_CSV,
+) -> tuple[str, str]:
+    """Write `scale` copies of both CSVs into out_dir, streaming row by row.
+    Returns the paths of the scaled articles and traffic CSVs."""
+    os.makedirs(out_dir, exist_ok=True)
+    article_span = _max_int(articles_path, "article_id") + 1
+    traffic_span = _max_int(traffic_path, "traffic_id") + 1
+
+    outputs = []
+    for path, name, rewrite in [
+        (
+            articles_path,
+            f"articles_x{scale}.csv",
+            lambda row, copy: {
+                **row,
+                "article_id": int(row["article_id"]) + copy * article_span,
+                "title": f"{row['title']} ({copy})" if copy else row["title"],
+            },
+        ),
+        (
+            traffic_path,
+            f"traffic_x{scale}.csv",
+            lambda row, copy: {
+                **row,
+                "traffic_id": int(row["traffic_id"]) + copy * traffic_span,
+                "article_id": int(row["article_id"]) + copy * article_span,
+            },
+        ),
+    ]:
+        out_path = os.path.join(out_dir, name)
+        with open(out_path, "w", newline="", encoding="utf-8") as out:
+            writer = None
+            for copy in range(scale):
+                with open(path, newline="", encoding="utf-8") as f:
+                    reader = csv.DictReader(f)
+                    if writer is None:
+                        writer = csv.DictWriter(out, fieldnames=reader.fieldnames)
+                        writer.writeheader()
+                    for row in reader:
+                        writer.writerow(rewrite(row, copy))
+        outputs.append(out_path)
+
+    return outputs[0], outputs[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--out-dir", default=os.path.join("benchmarks", "data"))
+    args = parser.parse_args()
+    print(*scale_dataset(args.scale, args.out_dir), sep="\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain.chains import GraphCypherQAChain
+from langchain.chains.graph_qa.cypher import extract_cypher
+from langchain_core.runnables import RunnableLambda
+
+from chatbot_api.utils.cypher_cache import parameterize_cypher
+from chatbot_api.utils.cypher_guard import CypherGuardError
+from chatbot_api.utils.cypher_log import log_cypher
+
+INTERMEDIATE_STEPS_KEY = "intermediate_steps"
+
+
+class CachedGraphCypherQAChain(GraphCypherQAChain):
+    """GraphCypherQAChain that reuses Cypher generated for the same question
+    template and graph results for the same Cypher and parameters."""
+
+    cypher_cache: Any = None
+    """CypherTemplateCache, or None to always generate Cypher."""
+    result_cache: Any = None
+    """GraphResultCache, or None to always query the graph."""
+    query_guard: Any = None
+    """CypherGuard checking, planning and bounding the Cypher before it
+    runs and compacting its rows, or None to run it as generated."""
+    router: Any = None
+    """ModelRouter, or None to use cypher_generation_chain and qa_chain
+    for every question."""
+    small_cypher_generation_chain: Any = None
+    """Cypher generation on the router's small model, tried first for
+    simple questions and escalated from when its Cypher fails."""
+    small_qa_chain: Any = None
+    """QA on the router's small model, for simple questions over small
+    contexts."""
+
+    def _cypher_chain(self, tier: Optional[str]):
+        if tier == "small" and self.small_cypher_generation_chain is not None:
+            return self.small_cypher_generation_chain
+        return self.cypher_generation_chain
+
+    def _qa(self, question: str, context: List[Dict[str, Any]], tier: Optional[str]):
+        """QA chain for the context: the small one for simple questions over
+        small contexts, once the Cypher held up."""
+        if self.router is None or self.small_qa_chain is None:
+            return self.qa_chain
+        if tier == "large":
+            return self.qa_chain
+        if self.router.context_tier("graph_qa", question, str(context)) == "small":
+            return self.small_qa_chain
+        return self.qa_chain
+
+    def _generate_cypher(self, question: str, callbacks, tier: Optional[str] = None) -> str:
+        generated_cypher = self._cypher_chain(tier).run(
+            {"question": question, "schema": self.graph_schema}, callbacks=callbacks
+        )
+        return self._clean_cypher(generated_cypher)
+
+    async def _agenerate_cypher(
+        self, question: str, callbacks, tier: Optional[str] = None
+    ) -> str:
+        generated_cypher = await self._cypher_chain(tier).arun(
+            {"question": question, "schema": self.graph_schema}, callbacks=callbacks
+        )
+        return self._clean_cypher(generated_cypher)
+
+    def _parameterized(self, cypher: str, template) -> tuple:
+        """The Cypher, its parameters and, when it could be parameterized
+        for the template, the cacheable parameterized Cypher."""
+        if template and cypher:
+            parameterized = parameterize_cypher(cypher, template)
+            if parameterized:
+                return parameterized, template.params, parameterized
+        return cypher, {}, None
+
+    def _clean_cypher(self, generated_cypher: str) -> str:
+        # Extract Cypher code if it is wrapped in backticks
+        generated_cypher = extract_cypher(generated_cypher)
+
+        # Correct Cypher query if enabled
+        if self.cypher_query_corrector:
+            generated_cypher = self.cypher_query_corrector(generated_cypher)
+
+        return generated_cypher
+
+    def _query_graph(self, cypher: str, params: Dict[str, Any], callbacks) -> List[Dict[str, Any]]:
+        """Run the graph lookup as its own "graph_query" run, so callbacks
+        and event streams see the Cypher, its parameters and the rows."""
+        return self._graph_query_runnable().invoke(
+            {"query": cypher, "params": params}, config={"callbacks": callbacks}
+        )
+
+    async def _aquery_graph(
+        self, cypher: str, params: Dict[str, Any], callbacks
+    ) -> List[Dict[str, Any]]:
+        return await self._graph_query_runnable().ainvoke(
+            {"query": cypher, "params": params}, config={"callbacks": callbacks}
+        )
+
+    def _graph_query_runnable(self) -> RunnableLambda:
+        return RunnableLambda(
+            self._run_graph_query, afunc=self._arun_graph_query, name="graph_query"
+        )
+
+    def _run_graph_query(self, inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        cypher, params = inputs["query"], inputs["params"]
+        if self.result_cache is not None:
+            rows = self.result_cache.get(cypher, params)
+            if rows is not None:
+                return rows
+        start = time.perf_counter()
+        if self.query_guard is not None:
+            rows = self.query_guard.run(self.graph, cypher, params)
+        else:
+            rows = self.graph.query(cypher, params)
+        log_cypher(cypher, params, len(rows), (time.perf_counter() - start) * 1000)
+        if self.result_cache is not None:
+            self.result_cache.put(cypher, params, rows)
+        return rows
+
+    async def _arun_graph_query(self, inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        cypher, params = inputs["query"], inputs["params"]
+        if self.result_cache is not None:
+            rows = await self.result_cache.aget(cypher, params)
+            if rows is not None:
+                return rows
+        start = time.perf_counter()
+        if self.query_guard is not None:
+            rows = await self.query_guard.arun(self.graph, cypher, params)
+        elif hasattr(self.graph, "aquery"):
+            rows = await self.graph.aquery(cypher, params)
+        else:
+            rows = await asyncio.to_thread(self.graph.query, cypher, params)
+        log_cypher(cypher, params, len(rows), (time.perf_counter() - start) * 1000)
+        if self.result_cache is not None:
+            await self.result_cache.aput(cypher, params, rows)
+        return rows
+
+    def _context(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.query_guard is not None:
+            return self.query_guard.compact(rows)
+        return rows[: self.top_k]
+
+    def _rejected(self, error: CypherGuardError, intermediate_steps: List) -> Dict[str, Any]:
+        """Answer with the rejection instead of the QA LLM, so the agent can
+        ask a narrower question."""
+        intermediate_steps.append({"rejected": str(error)})
+        chain_result: Dict[str, Any] = {
+            self.output_key: f"The graph query was not run: {error}"
+        }
+        if self.return_intermediate_steps:
+            chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
+        return chain_result
+
+    def _escalation(
+        self, tier: Optional[str], cypher: str, rows: List, error: Optional[Exception]
+    ) -> Optional[str]:
+        """Why Cypher from the small model should be generated again by the
+        large one: it was rejected, invalid, empty or found nothing."""
+        if tier != "small" or self.small_cypher_generation_chain is None:
+            return None
+        if error is not None:
+            return "rejected" if isinstance(error, CypherGuardError) else "invalid"
+        if not cypher:
+            return "empty"
+        if not rows:
+            return "no_rows"
+        return None
+
+    def _checked_query(self, cypher: str, params: Dict[str, Any], callbacks) -> tuple:
+        """Bound and run the Cypher. Returns it as run, its rows and the
+        ValueError it failed with, if any, so the caller may escalate."""
+        # Generated Cypher is empty if the query corrector finds an invalid schema
+        if not cypher:
+            return cypher, [], None
+        try:
+            if self.query_guard is not None:
+                cypher = self.query_guard.rewrite(cypher)
+            return cypher, self._query_graph(cypher, params, callbacks), None
+        except ValueError as e:
+            return cypher, [], e
+
+    async def _achecked_query(self, cypher: str, params: Dict[str, Any], callbacks) -> tuple:
+        if not cypher:
+            return cypher, [], None
+        try:
+            if self.query_guard is not None:
+                cypher = self.query_guard.rewrite(cypher)
+            return cypher, await self._aquery_graph(cypher, params, callbacks), None
+        except ValueError as e:
+            return cypher, [], e
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        """Generate (or reuse) a Cypher statement, use it to look up in db
+        and answer question."""
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        callbacks = _run_manager.get_child()
+        question = inputs[self.input_key]
+
+        intermediate_steps: List = []
+
+        template = self.cypher_cache.template(question) if self.cypher_cache else None
+        cached_cypher = self.cypher_cache.get(template) if template else None
+        tier = None
+
+        if cached_cypher:
+            cypher, params, parameterized = cached_cypher, template.params, None
+        else:
+            if self.router is not None:
+                tier = self.router.question_tier("cypher_generation", question)
+            cypher, params, parameterized = self._parameterized(
+                self._generate_cypher(question, callbacks, tier), template
+            )
+
+        cypher, rows, error = self._checked_query(cypher, params, callbacks)
+        if cached_cypher and error is not None:
+            # Cached Cypher that no longer runs (e.g. after a schema or guard
+            # change) is dropped and generated again.
+            intermediate_steps.append({"query": cypher, "params": params, "evicted": str(error)})
+            self.cypher_cache.delete(template)
+            cached_cypher = None
+            if self.router is not None:
+                tier = self.router.question_tier("cypher_generation", question)
+            cypher, params, parameterized = self._parameterized(
+                self._generate_cypher(question, callbacks, tier), template
+            )
+            cypher, rows, error = self._checked_query(cypher, params, callbacks)
+        reason = self._escalation(tier, cypher, rows, error)
+        if reason:
+            intermediate_steps.append({"query": cypher, "params": params, "escalated": reason})
+            tier = self.router.escalate("cypher_generation", reason)
+            cypher, params, parameterized = self._parameterized(
+                self._generate_cypher(question, callbacks, tier), template
+            )
+            cypher, rows, error = self._checked_query(cypher, params, callbacks)
+
+        _run_manager.on_text(
+            "Cached Cypher:" if cached_cypher else "Generated Cypher:",
+            end="\n",
+            verbose=self.verbose,
+        )
+        _run_manager.on_text(cypher, color="green", end="\n", verbose=self.verbose)
+
+        intermediate_steps.append({"query": cypher, "params": params})
+
+        if isinstance(error, CypherGuardError):
+            return self._rejected(error, intermediate_steps)
+        if error is not None:
+            raise error
+        context = self._context(rows)
+
+        # Only Cypher that ran and found something is trusted for reuse.
+        if parameterized and context:
+            self.cypher_cache.put(template, parameterized)
+
+        if self.return_direct:
+            final_result = context
+        else:
+            _run_manager.on_text("Full Context:", end="\n", verbose=self.verbose)
+            _run_manager.on_text(
+                str(context), color="green", end="\n", verbose=self.verbose
+            )
+
+            intermediate_steps.append({"context": context})
+
+            qa_chain = self._qa(question, context, tier)
+            result = qa_chain(
+                {"question": question, "context": context},
+                callbacks=callbacks,
+            )
+            final_result = result[qa_chain.output_key]
+
+        chain_result: Dict[str, Any] = {self.output_key: final_result}
+        if self.return_intermediate_steps:
+            chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
+
+        return chain_result
+
+    async def _acall(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        """Async counterpart of _call, awaiting the LLMs and the graph
+        instead of blocking a worker thread on them."""
+        _run_manager = run_manager or AsyncCallbackManagerForChainRun.get_noop_manager()
+        callbacks = _run_manager.get_child()
+        question = inputs[self.input_key]
+
+        intermediate_steps: List = []
+
+        template = await self.cypher_cache.atemplate(question) if self.cypher_cache else None
+        cached_cypher = await self.cypher_cache.aget(template) if template else None
+        tier = None
+
+        if cached_cypher:
+            cypher, params, parameterized = cached_cypher, template.params, None
+        else:
+            if self.router is not None:
+                tier = self.router.question_tier("cypher_generation", question)
+            cypher, params, parameterized = self._parameterized(
+                await self._agenerate_cypher(question, callbacks, tier), template
+            )
+
+        cypher, rows, error = await self._achecked_query(cypher, params, callbacks)
+        if cached_cypher and error is not None:
+            intermediate_steps.append({"query": cypher, "params": params, "evicted": str(error)})
+            await self.cypher_cache.adelete(template)
+            cached_cypher = None
+            if self.router is not None:
+                tier = self.router.question_tier("cypher_generation", question)
+            cypher, params, parameterized = self._parameterized(
+                await self._agenerate_cypher(question, callbacks, tier), template
+            )
+            cypher, rows, error = await self._achecked_query(cypher, params, callbacks)
+        reason = self._escalation(tier, cypher, rows, error)
+        if reason:
+            intermediate_steps.append({"query": cypher, "params": params, "escalated": reason})
+            tier = self.router.escalate("cypher_generation", reason)
+            cypher, params, parameterized = self._parameterized(
+                await self._agenerate_cypher(question, callbacks, tier), template
+            )
+            cypher, rows, error = await self._achecked_query(cypher, params, callbacks)
+
+        await _run_manager.on_text(
+            "Cached Cypher:" if cached_cypher else "Generated Cypher:",
+            end="\n",
+            verbose=self.verbose,
+        )
+        await _run_manager.on_text(cypher, color="green", end="\n", verbose=self.verbose)
+
+        intermediate_steps.append({"query": cypher, "params": params})
+
+        if isinstance(error, CypherGuardError):
+            return self._rejected(error, intermediate_steps)
+        if error is not None:
+            raise error
+        context = self._context(rows)
+
+        if parameterized and context:
+            await self.cypher_cache.aput(template, parameterized)
+
+        if self.return_direct:
+            final_result = context
+        else:
+            await _run_manager.on_text("Full Context:", end="\n", verbose=self.verbose)
+            await _run_manager.on_text(
+                str(context), color="green", end="\n", verbose=self.verbose
+            )
+
+            intermediate_steps.append({"context": context})
+
+            qa_chain = self._qa(question, context, tier)
+            result = await qa_chain.acall(
+                {"question": question, "context": context},
+                callbacks=callbacks,
+            )
+            final_result = result[qa_chain.output_key]
+
+        chain_result: Dict[str, Any] = {self.output_key: final_result}
+        if self.return_intermediate_steps:
+            chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
+
+        return chain_result
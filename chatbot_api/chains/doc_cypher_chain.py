@@ -1,21 +1,20 @@
 import os
+from functools import lru_cache
 
-from langchain.chains import GraphCypherQAChain
+from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain_community.graphs import Neo4jGraph
-from langchain_openai import ChatOpenAI
+
+from chatbot_api.chains.cached_cypher_qa_chain import CachedGraphCypherQAChain
+from chatbot_api.utils.chat_models import ResilientChatOpenAI
+from chatbot_api.utils.cypher_cache import get_cypher_caches
+from chatbot_api.utils.cypher_guard import get_cypher_guard
+from chatbot_api.utils.model_router import get_model_router
+from chatbot_api.utils.neo4j_connection import get_graph
+from chatbot_api.utils.snapshots import apply_schema_snapshot
 
 DOC_QA_MODEL = os.getenv("DOC_QA_MODEL")
 DOC_CYPHER_MODEL = os.getenv("DOC_CYPHER_MODEL")
 
-graph = Neo4jGraph(
-    url=os.getenv("NEO4J_URI"),
-    username=os.getenv("NEO4J_USERNAME"),
-    password=os.getenv("NEO4J_PASSWORD"),
-)
-
-graph.refresh_schema()
-
 cypher_generation_template = """
 Task:
 Generate Cypher query for a Neo4j graph database.
@@ -67,10 +66,34 @@ WHERE r.reporter_name = "Muhamad Ridlo"
 RETURN a.title, a.published_at;
 
 # How does the performance of each articles?
-MATCH (a:Articles)-[g:GAIN]->(t:Traffic) 
-RETURN a.title, sum(g.sessions) AS tot_session, sum(g.screenPageViews) as tot_pageviews, sum(g.activeUsers) as tot_users
+MATCH (a:Articles)-[:ROLLUP]->(at:ArticleTraffic {{grain: 'month'}})
+RETURN a.title, sum(at.sessions) AS tot_session, sum(at.screenPageViews) as tot_pageviews, sum(at.activeUsers) as tot_users
 ORDER BY tot_session DESC
 
+# How many pageviews on all article on 2024-04-01?
+MATCH (:Articles)-[:ROLLUP]->(at:ArticleTraffic {{grain: 'day', period_start: '2024-04-01'}})
+RETURN sum(at.screenPageViews) AS tot_pageviews
+
+# Which category had the most pageviews in March 2024?
+MATCH (c:Category)-[:ROLLUP]->(ct:CategoryTraffic {{grain: 'month', period_start: '2024-03-01'}})
+RETURN c.category_name, ct.screenPageViews AS tot_pageviews
+ORDER BY tot_pageviews DESC
+LIMIT 1
+
+# How many sessions did reporter Muhamad Ridlo get each week?
+MATCH (r:Reporter)-[:ROLLUP]->(rt:ReporterTraffic {{grain: 'week'}})
+WHERE r.reporter_name = "Muhamad Ridlo"
+RETURN rt.period_start AS week_start, rt.sessions AS tot_session
+ORDER BY week_start
+
+
+Traffic totals are pre-aggregated in ArticleTraffic, CategoryTraffic and
+ReporterTraffic nodes, linked from their Articles, Category or Reporter with a
+ROLLUP relationship. Their grain is 'day', 'week' (weeks start on Monday) or
+'month', and period_start is the first day of the period as a 'YYYY-MM-DD'
+string. Always use these rollups for traffic questions instead of summing GAIN
+relationships. Use the coarsest grain that matches the asked date range exactly,
+and 'day' rollups for arbitrary date ranges.
 
 Make sure to use IS NULL or IS NOT NULL when analyzing missing properties.
 Never return embedding properties in your queries. 
@@ -125,13 +148,56 @@ qa_generation_prompt = PromptTemplate(
     input_variables=["context", "question"], template=qa_generation_template
 )
 
-traffict_cypher_chain = GraphCypherQAChain.from_llm(
-    cypher_llm=ChatOpenAI(model=DOC_CYPHER_MODEL, temperature=0),
-    qa_llm=ChatOpenAI(model=DOC_QA_MODEL, temperature=0),
-    graph=graph,
-    verbose=True,
-    qa_prompt=qa_generation_prompt,
-    cypher_prompt=cypher_generation_prompt,
-    validate_cypher=True,
-    top_k=100,
-)
\ No newline at end of file
+
+def build_traffict_cypher_chain(
+    graph=None, cypher_llm=None, qa_llm=None, router=None
+) -> CachedGraphCypherQAChain:
+    """Build the graph QA chain. The schema comes from the local schema
+    snapshot, so building it does not read the schema from Neo4j.
+
+    With a ModelRouter, simple questions get Cypher and answers from its
+    small model first and the given or DOC_* models are the large tier.
+    """
+    if graph is None:
+        graph = get_graph()
+        apply_schema_snapshot(graph)
+    cypher_cache, graph_result_cache = get_cypher_caches()
+
+    if router is not None:
+        cypher_llm = cypher_llm or router.chat_model("cypher_generation", "large")
+        qa_llm = qa_llm or router.chat_model("graph_qa", "large")
+        small_chains = {
+            "router": router,
+            "small_cypher_generation_chain": LLMChain(
+                llm=router.chat_model("cypher_generation", "small"),
+                prompt=cypher_generation_prompt,
+            ),
+            "small_qa_chain": LLMChain(
+                llm=router.chat_model("graph_qa", "small"), prompt=qa_generation_prompt
+            ),
+        }
+    else:
+        small_chains = {}
+
+    return CachedGraphCypherQAChain.from_llm(
+        cypher_llm=cypher_llm
+        or ResilientChatOpenAI(model=DOC_CYPHER_MODEL, temperature=0, tags=["cypher_generation"]),
+        qa_llm=qa_llm
+        or ResilientChatOpenAI(model=DOC_QA_MODEL, temperature=0, tags=["graph_qa"]),
+        graph=graph,
+        verbose=True,
+        qa_prompt=qa_generation_prompt,
+        cypher_prompt=cypher_generation_prompt,
+        validate_cypher=True,
+        top_k=100,
+        exclude_types=["EtlState"],
+        cypher_cache=cypher_cache,
+        result_cache=graph_result_cache,
+        query_guard=get_cypher_guard(),
+        **small_chains,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_traffict_cypher_chain() -> CachedGraphCypherQAChain:
+    return build_traffict_cypher_chain(router=get_model_router())
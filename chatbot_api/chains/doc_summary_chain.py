@@ -1,6 +1,8 @@
 import os
+from functools import lru_cache
 
 from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import (
     ChatPromptTemplate,
     HumanMessagePromptTemplate,
@@ -8,26 +10,47 @@ from langchain.prompts import (
     SystemMessagePromptTemplate,
 )
 from langchain.vectorstores.neo4j_vector import Neo4jVector
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from chatbot_api.chains.routed_retrieval_qa import RoutedRetrievalQA
+from chatbot_api.utils.chat_models import ResilientChatOpenAI
+from chatbot_api.utils.embeddings import get_embeddings
+from chatbot_api.utils.mmap_vector_retriever import (
+    MmapVectorRetriever,
+    get_mmap_vector_index,
+)
+from chatbot_api.utils.model_router import get_model_router
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+from chatbot_api.utils.neo4j_vector_retriever import AsyncNeo4jVectorRetriever
+from chatbot_api.utils.passage_context import PassageContextRetriever, token_counter
 
 DOC_QA_MODEL = os.getenv("DOC_QA_MODEL")
+# "neo4j" searches the Neo4j "articles" vector index, "mmap" the vectors the
+# ETL exports to VECTOR_EXPORT_DIR, in process.
+SUMMARY_RETRIEVER = os.getenv("SUMMARY_RETRIEVER", "neo4j")
+SUMMARY_AUTO_FILTERS = os.getenv("SUMMARY_AUTO_FILTERS", "false").lower() == "true"
+# "articles" stuffs whole articles into the prompt, "passages" the best
+# passages that fit in SUMMARY_CONTEXT_TOKENS.
+SUMMARY_CONTEXT_MODE = os.getenv("SUMMARY_CONTEXT_MODE", "articles")
 
-neo4j_vector_index = Neo4jVector.from_existing_graph(
-    embedding=OpenAIEmbeddings(),
-    url=os.getenv("NEO4J_URI"),
-    username=os.getenv("NEO4J_USERNAME"),
-    password=os.getenv("NEO4J_PASSWORD"),
-    index_name="articles",
-    node_label="Articles",
-    text_node_properties=[
-        "reporter_name",
-        "category_name",
-        "body_content",
-        "title",
-        "published_at",
-    ],
-    embedding_node_property="embedding",
-)
+# Embeddings are computed offline by the ETL embedding stage, the API only
+# queries the existing "articles" index.
+articles_retrieval_query = """
+OPTIONAL MATCH (reporter:Reporter)-[:WROTE]->(node)
+OPTIONAL MATCH (category:Category)-[:CONTAIN]->(node)
+RETURN '\nreporter_name: ' + coalesce(reporter.reporter_name, '')
+    + '\ncategory_name: ' + coalesce(category.category_name, '')
+    + '\nbody_content: ' + coalesce(node.body_content, '')
+    + '\ntitle: ' + coalesce(node.title, '')
+    + '\npublished_at: ' + coalesce(node.published_at, '') AS text,
+    score,
+    {
+        article_id: node.article_id,
+        title: node.title,
+        published_at: node.published_at,
+        reporter_name: reporter.reporter_name,
+        category_name: category.category_name
+    } AS metadata
+"""
 
 content_template = """Your job is to use article
 body_content to answer questions about a specific event or information. Use the following context to answer questions.
@@ -52,9 +75,66 @@ content_prompt = ChatPromptTemplate(
     input_variables=["context", "question"], messages=messages
 )
 
-summary_vector_chain = RetrievalQA.from_chain_type(
-    llm=ChatOpenAI(model=DOC_QA_MODEL, temperature=0),
-    chain_type="stuff",
-    retriever=neo4j_vector_index.as_retriever(k=12),
-)
-summary_vector_chain.combine_documents_chain.llm_chain.prompt = content_prompt
\ No newline at end of file
+
+def get_neo4j_vector_index() -> Neo4jVector:
+    """Vector store over the existing "articles" index, sharing the pooled
+    driver. Connects to Neo4j, so it is only built on first use."""
+    connection_manager = get_connection_manager()
+    return connection_manager.adopt(
+        Neo4jVector.from_existing_index(
+            embedding=get_embeddings(),
+            url=connection_manager.uri,
+            username=connection_manager.username,
+            password=connection_manager.password,
+            database=connection_manager.database,
+            index_name="articles",
+            retrieval_query=articles_retrieval_query,
+        )
+    )
+
+
+def get_summary_retriever():
+    if SUMMARY_CONTEXT_MODE == "passages":
+        return PassageContextRetriever(
+            embeddings=get_embeddings(), count_tokens=token_counter(DOC_QA_MODEL)
+        )
+    if SUMMARY_RETRIEVER == "mmap":
+        return MmapVectorRetriever(
+            index=get_mmap_vector_index(),
+            embeddings=get_embeddings(),
+            k=12,
+            auto_filters=SUMMARY_AUTO_FILTERS,
+        )
+    return AsyncNeo4jVectorRetriever(
+        vectorstore=get_neo4j_vector_index(), search_kwargs={"k": 12}
+    )
+
+
+def build_summary_vector_chain(retriever=None, llm=None, router=None) -> RetrievalQA:
+    """Build the summary chain. With a ModelRouter, answers over small
+    contexts to simple questions use its small model and the given or
+    DOC_QA_MODEL model is the large tier."""
+    if router is not None:
+        llm = llm or router.chat_model("summary_qa", "large")
+        small_chain = {
+            "router": router,
+            "small_combine_documents_chain": load_qa_chain(
+                router.chat_model("summary_qa", "small"), chain_type="stuff", prompt=content_prompt
+            ),
+        }
+    else:
+        small_chain = {}
+
+    summary_vector_chain = RoutedRetrievalQA.from_chain_type(
+        llm=llm or ResilientChatOpenAI(model=DOC_QA_MODEL, temperature=0, tags=["summary_qa"]),
+        chain_type="stuff",
+        retriever=retriever or get_summary_retriever(),
+        **small_chain,
+    )
+    summary_vector_chain.combine_documents_chain.llm_chain.prompt = content_prompt
+    return summary_vector_chain
+
+
+@lru_cache(maxsize=1)
+def get_summary_vector_chain() -> RetrievalQA:
+    return build_summary_vector_chain(router=get_model_router())
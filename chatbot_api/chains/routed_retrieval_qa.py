@@ -0,0 +1,65 @@
+import inspect
+from typing import Any, Dict, List, Optional
+
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForChainRun,
+    CallbackManagerForChainRun,
+)
+from langchain.chains import RetrievalQA
+from langchain_core.documents import Document
+
+
+class RoutedRetrievalQA(RetrievalQA):
+    """RetrievalQA that answers with small_combine_documents_chain when the
+    router sends the question and its retrieved documents to the small
+    model, and with combine_documents_chain otherwise."""
+
+    router: Any = None
+    """ModelRouter, or None to always use combine_documents_chain."""
+    small_combine_documents_chain: Any = None
+
+    def _combine_chain(self, question: str, docs: List[Document]):
+        if self.router is None or self.small_combine_documents_chain is None:
+            return self.combine_documents_chain
+        context = "\n".join(doc.page_content for doc in docs)
+        if self.router.context_tier("summary_qa", question, context) == "small":
+            return self.small_combine_documents_chain
+        return self.combine_documents_chain
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs[self.input_key]
+        if "run_manager" in inspect.signature(self._get_docs).parameters:
+            docs = self._get_docs(question, run_manager=_run_manager)
+        else:
+            docs = self._get_docs(question)  # type: ignore[call-arg]
+        answer = self._combine_chain(question, docs).run(
+            input_documents=docs, question=question, callbacks=_run_manager.get_child()
+        )
+
+        if self.return_source_documents:
+            return {self.output_key: answer, "source_documents": docs}
+        return {self.output_key: answer}
+
+    async def _acall(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or AsyncCallbackManagerForChainRun.get_noop_manager()
+        question = inputs[self.input_key]
+        if "run_manager" in inspect.signature(self._aget_docs).parameters:
+            docs = await self._aget_docs(question, run_manager=_run_manager)
+        else:
+            docs = await self._aget_docs(question)  # type: ignore[call-arg]
+        answer = await self._combine_chain(question, docs).arun(
+            input_documents=docs, question=question, callbacks=_run_manager.get_child()
+        )
+
+        if self.return_source_documents:
+            return {self.output_key: answer, "source_documents": docs}
+        return {self.output_key: answer}
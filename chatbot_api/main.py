@@ -1,31 +1,365 @@
-from fastapi import FastAPI
-from chatbot_api.rag_agents.doc_rag_agent import doc_rag_agent_executor
-from chatbot_api.models.doc_rag_query import DocsQueryInput, DocsQueryOutput
-from chatbot_api.utils.async_utils import async_retry
+import asyncio
+import os
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from chatbot_api.rag_agents.doc_rag_agent import (
+    agent_tier,
+    get_doc_rag_agent_executor,
+    warm_up,
+)
+from chatbot_api.rag_agents.fast_path import answer_fast_path
+from chatbot_api.models.doc_rag_query import (
+    DocsBatchQueryInput,
+    DocsBatchQueryOutput,
+    DocsQueryInput,
+    DocsQueryOutput,
+)
+from chatbot_api.utils.answer_cache import get_answer_cache, normalize_question
+from chatbot_api.utils.conversation_memory import get_conversation_memory
+from chatbot_api.utils.data_version import aget_data_version
+from chatbot_api.utils.metrics import NEO4J_POOL, REGISTRY
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+from chatbot_api.utils.resilience import CircuitOpenError, circuit_status
+from chatbot_api.utils.sse import format_sse, stream_agent_events
+from chatbot_api.utils.tracing import current_callbacks, request_trace, timed_stage
+
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+WARM_UP_RETRY_DELAY = float(os.getenv("WARM_UP_RETRY_DELAY", "5"))
+
+# Agent runs shared by all batch requests in this process, and the largest
+# batch accepted.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+batch_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+# Without a startup warm-up the API initializes on first use and is
+# reported ready straight away.
+readiness = {"ready": not WARM_UP_ON_STARTUP, "error": None}
 
 app = FastAPI(
     title="Docs Chatbot",
     description="Endpoints for a document system graph RAG chatbot",
 )
 
-@async_retry(max_retries=10, delay=1)
-async def invoke_agent_with_retry(query: str):
-    """Retry the agent if a tool fails to run.
+def _agent_inputs(query: str, chat_history: list | None = None) -> dict:
+    if chat_history:
+        return {"input": query, "chat_history": chat_history}
+    return {"input": query}
 
-    This can help when there are intermittent connection issues
-    to external APIs.
-    """
-    return await doc_rag_agent_executor.ainvoke({"input": query})
+async def invoke_agent(query: str, chat_history: list | None = None):
+    """Run the agent once. Transient Neo4j and OpenAI failures are retried
+    by the failing call itself, so the steps before it are not replayed."""
+    return await get_doc_rag_agent_executor(agent_tier(query)).ainvoke(
+        _agent_inputs(query, chat_history), config={"callbacks": current_callbacks()}
+    )
 
 @app.get("/")
 async def get_status():
     return {"status": "running"}
 
+@app.get("/health")
+async def get_health():
+    connection_manager = get_connection_manager()
+    neo4j_health = await connection_manager.ahealth_check()
+    return {
+        "status": "ok" if neo4j_health["healthy"] else "degraded",
+        "neo4j": neo4j_health,
+        "neo4j_pool": connection_manager.pool_metrics(),
+        "circuits": circuit_status(),
+    }
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError) -> JSONResponse:
+    """Fail fast while Neo4j or OpenAI is known to be down."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "dependency": exc.dependency},
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
+
+@app.get("/metrics")
+async def get_metrics() -> PlainTextResponse:
+    """Request and per-stage latency histograms, LLM token counters, rows
+    per query and Neo4j pool gauges in the Prometheus text format."""
+    for name, value in get_connection_manager().pool_metrics().items():
+        NEO4J_POOL.set(value, metric=name)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.delete("/conversations/{session_id}")
+async def delete_conversation(session_id: str):
+    """Forget a session's conversation."""
+    conversation_memory = get_conversation_memory()
+    if conversation_memory is not None:
+        conversation_memory.delete(session_id)
+    return {"session_id": session_id, "deleted": True}
+
+@app.get("/ready")
+async def get_ready():
+    """Readiness: 503 until the agent, its chains and their Neo4j
+    connections have been warmed up."""
+    if not readiness["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "error": readiness["error"]},
+        )
+    return {"status": "ready"}
+
+async def _warm_up_until_ready():
+    while True:
+        try:
+            await asyncio.to_thread(warm_up)
+        except Exception as e:
+            readiness["error"] = str(e)
+            await asyncio.sleep(WARM_UP_RETRY_DELAY)
+        else:
+            readiness.update(ready=True, error=None)
+            return
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Warm up in the background so the server starts accepting
+    connections (and answering /ready) without waiting on dependencies."""
+    if WARM_UP_ON_STARTUP:
+        app.state.warm_up_task = asyncio.create_task(_warm_up_until_ready())
+
+@app.on_event("shutdown")
+async def close_connections():
+    warm_up_task = getattr(app.state, "warm_up_task", None)
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    connection_manager = get_connection_manager()
+    connection_manager.close()
+    await connection_manager.aclose()
+
+def _conversation(session_id: str | None):
+    """Return (memory, chat history) of the session, or (None, []) without
+    a session or with conversation memory off."""
+    conversation_memory = get_conversation_memory() if session_id else None
+    if conversation_memory is None:
+        return None, []
+    return conversation_memory, conversation_memory.history(session_id)
+
+async def _remember(conversation_memory, session_id, query_response) -> None:
+    if conversation_memory is not None:
+        await conversation_memory.aappend(
+            session_id, query_response["input"], query_response["output"]
+        )
+    query_response["session_id"] = session_id
+
+async def _lookup_answer(text: str, chat_history: list | None = None):
+    """Return (cache, data_version, lookup), or Nones when caching is off.
+    Follow-up questions bypass the cache, their answer depends on the
+    conversation."""
+    answer_cache = get_answer_cache()
+    if answer_cache is None or chat_history:
+        return None, None, None
+    with timed_stage("answer_cache"):
+        data_version = await aget_data_version()
+        return answer_cache, data_version, await answer_cache.alookup(text, data_version)
+
+async def _store_answer(answer_cache, data_version, lookup, query_response) -> None:
+    await answer_cache.astore(
+        query_response["input"],
+        {
+            "output": query_response["output"],
+            "intermediate_steps": query_response["intermediate_steps"],
+            "route": query_response.get("route"),
+        },
+        data_version,
+        embedding=lookup.embedding,
+        entities=lookup.entities,
+    )
+    query_response["cache"] = lookup.info(data_version)
+
+async def _answer_query(text: str, session_id: str | None = None) -> dict:
+    conversation_memory, chat_history = _conversation(session_id)
+    answer_cache, data_version, lookup = await _lookup_answer(text, chat_history)
+    if lookup is not None and lookup.hit:
+        query_response = {
+            **lookup.response,
+            "input": text,
+            "cache": lookup.info(data_version),
+        }
+        await _remember(conversation_memory, session_id, query_response)
+        return query_response
+
+    query_response = None
+    # Follow-up questions go to the agent, which sees the conversation.
+    if not chat_history:
+        with timed_stage("fast_path"):
+            query_response = await answer_fast_path(text)
+    if query_response is None:
+        query_response = await invoke_agent(text, chat_history)
+        query_response.pop("chat_history", None)
+        query_response["intermediate_steps"] = [
+            str(s) for s in query_response["intermediate_steps"]
+        ]
+        query_response["route"] = "agent"
+
+    if answer_cache is not None:
+        await _store_answer(answer_cache, data_version, lookup, query_response)
+
+    await _remember(conversation_memory, session_id, query_response)
+    return query_response
+
+def _route_label(query_response: dict) -> str | None:
+    if (query_response.get("cache") or {}).get("hit"):
+        return "cache"
+    return query_response.get("route")
+
+async def _traced_answer(
+    text: str, endpoint: str, include_timings: bool = False, session_id: str | None = None
+) -> dict:
+    """_answer_query with its stages traced, adding the per-stage timings to
+    the response when asked for."""
+    with request_trace(endpoint) as trace:
+        query_response = await _answer_query(text, session_id)
+        trace.route = _route_label(query_response)
+    if include_timings:
+        query_response["timings"] = trace.timings()
+    return query_response
+
 @app.post("/doc-rag-agent")
 async def query_doc_agent(query: DocsQueryInput) -> DocsQueryOutput:
-    query_response = await invoke_agent_with_retry(query.text)
-    query_response["intermediate_steps"] = [
-        str(s) for s in query_response["intermediate_steps"]
-    ]
+    return await _traced_answer(
+        query.text, "/doc-rag-agent", query.include_timings, query.session_id
+    )
+
+async def _run_batch(texts: list[str]):
+    """Answer each distinct normalized question once, at most
+    BATCH_MAX_CONCURRENCY at a time, yielding the results of every item as
+    their question completes."""
+    groups: dict[str, list[int]] = {}
+    for index, text in enumerate(texts):
+        groups.setdefault(normalize_question(text), []).append(index)
+
+    async def answer(indexes: list[int]):
+        async with batch_semaphore:
+            try:
+                response = await _traced_answer(texts[indexes[0]], "/doc-rag-agent/batch")
+                return indexes, response, None
+            except Exception as e:
+                return indexes, None, str(e)
+
+    tasks = [asyncio.create_task(answer(indexes)) for indexes in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, response, error = await next_done
+            yield [
+                {
+                    "index": index,
+                    "input": texts[index],
+                    "result": {**response, "input": texts[index]} if response else None,
+                    "error": error,
+                    "duplicate_of": None if index == indexes[0] else indexes[0],
+                }
+                for index in indexes
+            ]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _batch_texts(batch: DocsBatchQueryInput) -> list[str]:
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BATCH_MAX_ITEMS} items per batch",
+        )
+    return [item.text for item in batch.items]
+
+@app.post("/doc-rag-agent/batch")
+async def query_doc_agent_batch(batch: DocsBatchQueryInput) -> DocsBatchQueryOutput:
+    """Answer a list of questions in one request, with per-item results
+    and errors in input order."""
+    texts = _batch_texts(batch)
+    results = []
+    unique_questions = 0
+    async for items in _run_batch(texts):
+        results.extend(items)
+        unique_questions += 1
+    return {
+        "results": sorted(results, key=lambda item: item["index"]),
+        "unique_questions": unique_questions,
+    }
+
+async def _stream_batch(texts: list[str]):
+    unique_questions = 0
+    async for items in _run_batch(texts):
+        unique_questions += 1
+        for item in items:
+            yield format_sse("result", item)
+    yield format_sse(
+        "done", {"items": len(texts), "unique_questions": unique_questions}
+    )
+
+@app.post("/doc-rag-agent/batch/stream")
+async def stream_doc_agent_batch(batch: DocsBatchQueryInput) -> StreamingResponse:
+    """Like /doc-rag-agent/batch, but sends each item as a "result" Server-Sent
+    Event as soon as it is answered, then a "done" event."""
+    return StreamingResponse(
+        _stream_batch(_batch_texts(batch)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _doc_agent_events(text: str, session_id: str | None = None):
+    conversation_memory, chat_history = _conversation(session_id)
+    answer_cache, data_version, lookup = await _lookup_answer(text, chat_history)
+    if lookup is not None and lookup.hit:
+        final = {**lookup.response, "input": text, "cache": lookup.info(data_version)}
+        await _remember(conversation_memory, session_id, final)
+        yield "token", {"text": lookup.response["output"]}
+        yield "final", final
+        return
+
+    try:
+        fast_response = None
+        if not chat_history:
+            with timed_stage("fast_path"):
+                fast_response = await answer_fast_path(text)
+        if fast_response is not None:
+            if answer_cache is not None:
+                await _store_answer(answer_cache, data_version, lookup, fast_response)
+            await _remember(conversation_memory, session_id, fast_response)
+            yield "token", {"text": fast_response["output"]}
+            yield "final", fast_response
+            return
+
+        async for event, data in stream_agent_events(
+            get_doc_rag_agent_executor(agent_tier(text)),
+            _agent_inputs(text, chat_history),
+            config={"callbacks": current_callbacks()},
+        ):
+            if event == "final":
+                data["route"] = "agent"
+                if answer_cache is not None:
+                    await _store_answer(answer_cache, data_version, lookup, data)
+                await _remember(conversation_memory, session_id, data)
+            yield event, data
+    except CircuitOpenError as e:
+        yield "error", {"message": str(e), "dependency": e.dependency}
+    except Exception as e:
+        yield "error", {"message": str(e)}
+
+async def _stream_doc_agent(
+    text: str, include_timings: bool = False, session_id: str | None = None
+):
+    with request_trace("/doc-rag-agent/stream") as trace:
+        async for event, data in _doc_agent_events(text, session_id):
+            if event == "final":
+                trace.route = _route_label(data)
+                if include_timings:
+                    data["timings"] = trace.timings()
+            yield format_sse(event, data)
 
-    return query_response
\ No newline at end of file
+@app.post("/doc-rag-agent/stream")
+async def stream_doc_agent(query: DocsQueryInput) -> StreamingResponse:
+    """Stream tool selection, generated Cypher, retrieval hits and answer
+    tokens as Server-Sent Events while the agent runs."""
+    return StreamingResponse(
+        _stream_doc_agent(query.text, query.include_timings, query.session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,8 +2,50 @@ from pydantic import BaseModel
 
 class DocsQueryInput(BaseModel):
     text: str
+    include_timings: bool = False
+    session_id: str | None = None
+
+class CacheInfo(BaseModel):
+    hit: bool = False
+    tier: str | None = None
+    similarity: float | None = None
+    age_seconds: float | None = None
+    data_version: int | None = None
+
+class StageTiming(BaseModel):
+    stage: str
+    duration_ms: float
+    name: str | None = None
+    tier: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    rows: int | None = None
+    cypher: str | None = None
+    error: str | None = None
+
+class RequestTimings(BaseModel):
+    total_ms: float
+    stages: list[StageTiming]
 
 class DocsQueryOutput(BaseModel):
     input: str
     output: str
-    intermediate_steps: list[str]
\ No newline at end of file
+    intermediate_steps: list[str]
+    cache: CacheInfo | None = None
+    route: str | None = None
+    timings: RequestTimings | None = None
+    session_id: str | None = None
+
+class DocsBatchQueryInput(BaseModel):
+    items: list[DocsQueryInput]
+
+class DocsBatchItemOutput(BaseModel):
+    index: int
+    input: str
+    result: DocsQueryOutput | None = None
+    error: str | None = None
+    duplicate_of: int | None = None
+
+class DocsBatchQueryOutput(BaseModel):
+    results: list[DocsBatchItemOutput]
+    unique_questions: int
@@ -1,24 +1,70 @@
 import os
+from functools import lru_cache
 
-from chatbot_api.chains.doc_cypher_chain import traffict_cypher_chain
-from chatbot_api.chains.doc_summary_chain import summary_vector_chain
-from langchain import hub
-from langchain.agents import AgentExecutor, Tool, create_openai_functions_agent
-from langchain_openai import ChatOpenAI
+from chatbot_api.chains.doc_cypher_chain import get_traffict_cypher_chain
+from chatbot_api.chains.doc_summary_chain import get_summary_vector_chain
+from langchain.agents import (
+    AgentExecutor,
+    Tool,
+    create_openai_functions_agent,
+    create_openai_tools_agent,
+)
+from chatbot_api.tools.traffic_analytics import (
+    TRAFFIC_ANALYTICS_ENABLED,
+    aget_popular_articles,
+    aget_traffic_trend,
+    get_popular_articles,
+    get_traffic_analytics,
+    get_traffic_trend,
+)
 from chatbot_api.tools.traffic_performance import (
+    aget_most_productive_reporter,
     get_most_productive_reporter,
 )
+from chatbot_api.utils.chat_models import ResilientChatOpenAI
+from chatbot_api.utils.data_version import get_data_version
+from chatbot_api.utils.model_router import get_model_router
+from chatbot_api.utils.neo4j_connection import get_graph
+from chatbot_api.utils.snapshots import (
+    load_agent_prompt,
+    load_snapshot,
+    refresh_schema_snapshot,
+)
 
 DOC_AGENT_MODEL = os.getenv("DOC_AGENT_MODEL")
+# "functions" calls one tool per step, "tools" lets the model request several
+# tools in one step, which the executor then runs concurrently.
+DOC_AGENT_MODE = os.getenv("DOC_AGENT_MODE", "functions")
+
+AGENT_MODES = {
+    "functions": ("hwchase17/openai-functions-agent", create_openai_functions_agent),
+    "tools": ("hwchase17/openai-tools-agent", create_openai_tools_agent),
+}
+
+
+# The chains connect to Neo4j when built, so tools only build them on first
+# use and building the agent itself stays local.
+def _summary(query: str):
+    return get_summary_vector_chain().invoke(query)
+
+
+async def _asummary(query: str):
+    return await get_summary_vector_chain().ainvoke(query)
+
+
+def _graph(query: str):
+    return get_traffict_cypher_chain().invoke(query)
+
+
+async def _agraph(query: str):
+    return await get_traffict_cypher_chain().ainvoke(query)
 
-# This line pulls the "openai-functions-agent" prompt template from the LangChain hub.
-# Check the LangChain hub for the latest updates on the "openai-functions-agent" prompt template.
-doc_agent_prompt = hub.pull("hwchase17/openai-functions-agent")
 
 tools = [
     Tool(
         name="Summary",
-        func=summary_vector_chain.invoke,
+        func=_summary,
+        coroutine=_asummary,
         description="""Useful when you need to answer questions
         about content summary, highlight, or any other qualitative
         question that could be answered about a context of the article content using semantic
@@ -26,56 +72,137 @@ tools = [
         counting, percentages, or aggregations. Use the
         entire prompt as input to the tool. For instance, if the prompt is
         "Give me highlight of what happen on pemilu 2024!", the input should be
-        "Give me highlight of what happen on pemilu 2024!".
+        "Give me highlight of what happen on pemilu 2024!". If the prompt
+        refers to earlier messages, pass it rewritten as a standalone question.
         """,
     ),
     Tool(
         name="Graph",
-        func=traffict_cypher_chain.invoke,
+        func=_graph,
+        coroutine=_agraph,
         description="""Useful for answering questions about author, reporter, category, article
         statistics, and article traffict details. Use the entire prompt as
         input to the tool. For instance, if the prompt is "How many pageviews on all article today?", 
         the input should be "How many pageviews on all article today?".
+        If the prompt refers to earlier messages, pass it rewritten as a
+        standalone question.
         """,
     ),
-    # Tool(
-    #     name="Popular",
-    #     func=get_popular_articles,
-    #     description="""Use when asked about popular or most viewed article at a specific timeline period. 
-    #     This tool can only get the list of popular or most viewed articles title and does not have any information about
-    #     the article content or summary. 
-    #     Pass only words that represent date range as input. For example if the prompt
-    #     "Give me the popular article today", the words represent date is today and input should be current date in YYYY-MM-DD format.
-    #     "Give me the popular article for the last 7 days", the words represent date is 7 days and input should be the date from 7 days ago from now in YYYY-MM-DD format.
-    #     "Give me the popular article for the last 3 month", the words represent date is 3 month and input should be date from 3 month ago from now in YYYY-MM-DD format.
-    #     """,
-    # ),
     Tool(
         name="Productivity",
         func=get_most_productive_reporter,
+        coroutine=aget_most_productive_reporter,
         description="""
-        Use when you need to find out whos reporter has the most viewed articles. 
-        This tool does not have any information about aggregate
-        or historical viewed articles. This tool returns a dictionary with the
-        reporter name as the key and the total pageviews as the value.
+        Use when you need to find out whos reporter has the most viewed articles,
+        optionally within a date range. Pass the date range as input in
+        "YYYY-MM-DD to YYYY-MM-DD" format, a single YYYY-MM-DD date to count from
+        that date onwards, or an empty string for all time.
+        This tool returns a dictionary with the most productive reporter_name,
+        their tot_session, and the top_reporters ranking with the total sessions,
+        pageviews and users of each reporter.
         """,
     ),
 ]
 
-chat_model = ChatOpenAI(
-    model=DOC_AGENT_MODEL,
-    temperature=0,
-)
+# Answered from the in-process traffic table, without generating Cypher.
+analytics_tools = [
+    Tool(
+        name="Popular",
+        func=get_popular_articles,
+        coroutine=aget_popular_articles,
+        description="""Use when asked about the popular, most viewed or most
+        read articles, or the top reporters or categories by traffic, over a
+        date range, or which of them grew the most. It only knows titles,
+        reporters, categories and traffic numbers, not the article content.
+        Pass what to rank ("articles", "reporters" or "categories"), the
+        metric ("pageviews", "sessions" or "users"), "growth" to rank by the
+        increase over the previous period of the same length, how many to
+        return and the date range in "YYYY-MM-DD to YYYY-MM-DD" format. For
+        example "Top 5 reporters by sessions last week" should be input as
+        "reporters sessions top 5 2024-03-11 to 2024-03-17". "last 30 days"
+        style ranges end at the last day with traffic. Leave the dates out
+        for all time.
+        """,
+    ),
+    Tool(
+        name="Trend",
+        func=get_traffic_trend,
+        coroutine=aget_traffic_trend,
+        description="""Use when asked how traffic developed over time: the
+        pageviews, sessions or users per day, week or month, of all articles
+        or of one reporter or category, and whether it is rising or falling.
+        Pass the reporter or category name if any, the metric, "daily",
+        "weekly" or "monthly", and the date range in "YYYY-MM-DD to
+        YYYY-MM-DD" format. For example "monthly pageviews Politik
+        2024-01-01 to 2024-06-30".
+        """,
+    ),
+]
+if TRAFFIC_ANALYTICS_ENABLED:
+    tools += analytics_tools
 
-doc_rag_agent = create_openai_functions_agent(
-    llm=chat_model,
-    prompt=doc_agent_prompt,
-    tools=tools,
-)
 
-doc_rag_agent_executor = AgentExecutor(
-    agent=doc_rag_agent,
-    tools=tools,
-    return_intermediate_steps=True,
-    verbose=True,
-)
\ No newline at end of file
+def build_doc_rag_agent_executor(
+    tools=tools, llm=None, prompt=None, mode: str = DOC_AGENT_MODE
+) -> AgentExecutor:
+    """Build the agent. The prompt comes from the local prompt snapshot, so
+    LangChain hub is only contacted when no snapshot exists yet."""
+    prompt_name, create_agent = AGENT_MODES[mode]
+    chat_model = llm or ResilientChatOpenAI(
+        model=DOC_AGENT_MODEL,
+        temperature=0,
+        tags=["agent"],
+    )
+
+    doc_rag_agent = create_agent(
+        llm=chat_model,
+        prompt=prompt or load_agent_prompt(prompt_name),
+        tools=tools,
+    )
+
+    return AgentExecutor(
+        agent=doc_rag_agent,
+        tools=tools,
+        return_intermediate_steps=True,
+        verbose=True,
+    )
+
+
+@lru_cache(maxsize=2)
+def get_doc_rag_agent_executor(tier: str = "large") -> AgentExecutor:
+    """The agent on the model router's model for the tier, or on
+    DOC_AGENT_MODEL when routing is off."""
+    router = get_model_router()
+    if router is None:
+        return build_doc_rag_agent_executor()
+    return build_doc_rag_agent_executor(llm=router.chat_model("agent", tier))
+
+
+def agent_tier(question: str) -> str:
+    """Tier of the agent model for the question, see ModelRouter."""
+    router = get_model_router()
+    return router.question_tier("agent", question) if router is not None else "large"
+
+
+def warm_up() -> None:
+    """Build the agent and its chains ahead of the first request.
+
+    The schema snapshot is refreshed first when it was taken at another ETL
+    data version than the graph's current one.
+    """
+    # Positional tiers, as agent_tier passes them, so the warmed entries are
+    # the same lru_cache keys requests look up.
+    get_doc_rag_agent_executor("large")
+    if get_model_router() is not None:
+        get_doc_rag_agent_executor("small")
+
+    data_version = get_data_version()
+    snapshot = load_snapshot("graph_schema")
+    if snapshot is None or snapshot.get("data_version") != data_version:
+        refresh_schema_snapshot(get_graph(), data_version)
+        get_traffict_cypher_chain.cache_clear()
+
+    get_traffict_cypher_chain()
+    get_summary_vector_chain()
+    if TRAFFIC_ANALYTICS_ENABLED:
+        get_traffic_analytics().table()
@@ -0,0 +1,422 @@
+import os
+import re
+from datetime import date, timedelta
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+from langchain_core.output_parsers import StrOutputParser
+
+from chatbot_api.tools.traffic_performance import aget_top_reporters
+from chatbot_api.utils.chat_models import ResilientChatOpenAI
+from chatbot_api.utils.graph_entities import aget_entity_catalog, find_entities
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+# "template" formats the rows directly, "llm" has the graph QA prompt phrase
+# them (one LLM call instead of the agent's two to three).
+FAST_PATH_PHRASING = os.getenv("FAST_PATH_PHRASING", "template")
+FAST_PATH_LIST_LIMIT = int(os.getenv("FAST_PATH_LIST_LIMIT", "20"))
+FAST_PATH_TOP_N = int(os.getenv("FAST_PATH_TOP_N", "10"))
+# Days counted as "lately" / "recently" in traffic rankings, ending at the
+# last day with traffic.
+FAST_PATH_RECENT_DAYS = int(os.getenv("FAST_PATH_RECENT_DAYS", "7"))
+
+DOC_QA_MODEL = os.getenv("DOC_QA_MODEL")
+
+# Words a routed question may consist of besides reporter names, category
+# names, dates and numbers. Anything else (e.g. a topic) means the question
+# needs the agent.
+ROUTABLE_WORDS = {
+    "a", "about", "all", "an", "and", "any", "are", "article", "articles",
+    "artikel", "at", "author", "authors", "before", "between", "by", "can", "category",
+    "categories", "count", "did", "do", "does", "during", "each", "every",
+    "find", "for", "from", "get", "give", "got", "has", "have", "how", "i",
+    "in", "is", "it", "kategori", "know", "last", "lately", "latest", "list",
+    "many", "me", "most", "name", "names", "newest", "news", "number", "of", "on", "please",
+    "popular", "posted", "productive", "published", "read", "recent",
+    "recently", "reporter", "reporters", "s", "see", "show", "since", "tell",
+    "the", "there", "title", "titled", "titles", "to", "top", "total", "until",
+    "viewed", "views", "was", "were", "what", "which", "who", "whos", "whose",
+    "with", "after", "write", "writes", "written", "wrote", "yang", "apa", "berapa",
+    "siapa", "oleh", "di", "dari", "terbaru", "terpopuler", "paling", "banyak",
+    "dibaca", "ditulis", "tulisan", "berita", "produktif",
+}
+COUNT_WORDS = {"many", "count", "number", "total", "berapa"}
+LATEST_WORDS = {"latest", "newest", "last", "recent", "recently", "lately", "terbaru"}
+RECENT_WORDS = {"recent", "recently", "lately", "terbaru"}
+POPULAR_WORDS = {"viewed", "views", "popular", "read", "dibaca", "terpopuler"}
+PRODUCTIVE_WORDS = {"productive", "produktif"}
+RANK_WORDS = {"most", "top", "popular", "terpopuler", "paling"}
+REPORTER_WORDS = {"reporter", "reporters", "author", "authors"}
+CATEGORY_WORDS = {"category", "categories", "kategori"}
+ONWARDS_WORDS = {"since", "from", "after"}
+UNTIL_WORDS = {"until", "before"}
+# "before" and "after" leave out the date itself.
+EXCLUSIVE_WORDS = {"before", "after"}
+# A number is a limit only next to one of these, as in "top 5" or
+# "3 latest articles"; any other number (e.g. a year) needs the agent.
+LIMIT_BEFORE_WORDS = {"top", "latest", "last", "newest"}
+LIMIT_AFTER_WORDS = {
+    "articles", "artikel", "titles", "news", "berita", "reporters", "latest",
+    "newest", "most",
+}
+
+# "the most popular article" asks for one, "articles" / "news" for a list.
+SINGULAR_WORDS = {"article", "title"}
+PLURAL_WORDS = {"articles", "titles", "news", "berita"}
+
+WORD_PATTERN = re.compile(r"[a-z]+|\d+")
+
+# Articles in scope, starting from the reporter or category node when the
+# question names one, so the name indexes are used instead of a scan of
+# every article. Keyed by which of the two filters are set.
+ARTICLE_SCOPES = {
+    (False, False): """
+MATCH (a:Articles)
+OPTIONAL MATCH (r:Reporter)-[:WROTE]->(a)
+OPTIONAL MATCH (c:Category)-[:CONTAIN]->(a)
+""",
+    (True, False): """
+MATCH (r:Reporter {reporter_name: $reporter})-[:WROTE]->(a:Articles)
+OPTIONAL MATCH (c:Category)-[:CONTAIN]->(a)
+""",
+    (False, True): """
+MATCH (c:Category {category_name: $category})-[:CONTAIN]->(a:Articles)
+OPTIONAL MATCH (r:Reporter)-[:WROTE]->(a)
+""",
+    (True, True): """
+MATCH (r:Reporter {reporter_name: $reporter})-[:WROTE]->(a:Articles)
+MATCH (c:Category {category_name: $category})-[:CONTAIN]->(a)
+""",
+}
+PUBLISHED_FILTERS = """
+WITH a, r, c
+WHERE ($start_date IS NULL OR substring(a.published_at, 0, 10) >= $start_date)
+    AND ($end_date IS NULL OR substring(a.published_at, 0, 10) <= $end_date)
+"""
+
+LIST_ARTICLES_QUERIES = {
+    scope: match
+    + PUBLISHED_FILTERS
+    + """
+RETURN a.title AS title, a.published_at AS published_at,
+    r.reporter_name AS reporter_name, c.category_name AS category_name
+ORDER BY a.published_at DESC
+LIMIT $limit
+"""
+    for scope, match in ARTICLE_SCOPES.items()
+}
+
+COUNT_ARTICLES_QUERIES = {
+    scope: match + PUBLISHED_FILTERS + "RETURN count(a) AS articles"
+    for scope, match in ARTICLE_SCOPES.items()
+}
+
+LAST_TRAFFIC_DAY_QUERY = """
+MATCH (day:ArticleTraffic {grain: 'day'})
+RETURN max(day.period_start) AS last_day
+"""
+
+MOST_VIEWED_QUERIES = {
+    scope: match
+    + """
+MATCH (a)-[:ROLLUP]->(at:ArticleTraffic {grain: 'day'})
+WHERE ($start_date IS NULL OR at.period_start >= $start_date)
+    AND ($end_date IS NULL OR at.period_start <= $end_date)
+RETURN a.title AS title, a.published_at AS published_at,
+    r.reporter_name AS reporter_name,
+    sum(at.screenPageViews) AS tot_pageviews,
+    sum(at.sessions) AS tot_session
+ORDER BY tot_pageviews DESC
+LIMIT $limit
+"""
+    for scope, match in ARTICLE_SCOPES.items()
+}
+
+
+@dataclass
+class FastPathMatch:
+    """A question recognized as one of the fixed intents."""
+
+    intent: str
+    params: dict[str, Any] = field(default_factory=dict)
+
+
+def match_fast_path(
+    question: str, catalog: dict[str, list[str]]
+) -> FastPathMatch | None:
+    """Recognize latest / list / count / most viewed / most productive
+    reporter questions, or return None when the question needs the agent."""
+    params: dict[str, Any] = {
+        "reporter": None,
+        "category": None,
+        "start_date": None,
+        "end_date": None,
+    }
+    dates = []
+    remaining = question.lower()
+    for kind, value, start, end in reversed(find_entities(question, catalog)):
+        if kind == "date":
+            dates.append(value)
+        elif params[kind] is None:
+            params[kind] = value
+        else:
+            return None  # several reporters or categories
+        remaining = remaining[:start] + " " + remaining[end:]
+
+    words = WORD_PATTERN.findall(remaining)
+    if not words or any(w not in ROUTABLE_WORDS and not w.isdigit() for w in words):
+        return None
+    vocabulary = set(words)
+    # A category named like a routable word ("News") only means the category
+    # when the question says so; "the latest news" is about all articles.
+    if (
+        params["category"]
+        and params["category"].lower() in ROUTABLE_WORDS
+        and not vocabulary & CATEGORY_WORDS
+    ):
+        return None
+
+    date_range = _date_range(dates, vocabulary)
+    if date_range is None:
+        return None
+    params["start_date"], params["end_date"] = date_range
+
+    limit = _limit(words)
+    if limit == 0:
+        return None
+    if not dates and vocabulary & RECENT_WORDS:
+        params["recent_days"] = FAST_PATH_RECENT_DAYS
+
+    # Questions about categories in general (rankings, counts) need the agent.
+    if vocabulary & CATEGORY_WORDS and params["category"] is None:
+        return None
+    # Reporters ranked by the traffic of their articles. Rankings by article
+    # count ("wrote the most articles") need the agent.
+    if vocabulary & PRODUCTIVE_WORDS or (
+        vocabulary & REPORTER_WORDS
+        and vocabulary & RANK_WORDS
+        and params["reporter"] is None
+    ):
+        if (
+            params["reporter"]
+            or params["category"]
+            or vocabulary & COUNT_WORDS
+            or not vocabulary & (PRODUCTIVE_WORDS | POPULAR_WORDS)
+        ):
+            return None
+        return FastPathMatch(
+            "most_productive_reporter",
+            {**params, "top_n": limit or FAST_PATH_TOP_N},
+        )
+    # Any other question about reporters in general, e.g. counting them.
+    if vocabulary & REPORTER_WORDS and params["reporter"] is None:
+        return None
+    if vocabulary & POPULAR_WORDS:
+        # "How many views did X get" asks for a total, not a ranking.
+        if vocabulary & COUNT_WORDS or not vocabulary & RANK_WORDS:
+            return None
+        return FastPathMatch(
+            "most_viewed", {**params, "limit": limit or _default_limit(vocabulary)}
+        )
+    if vocabulary & COUNT_WORDS and (params["reporter"] or params["category"]):
+        if vocabulary & LATEST_WORDS:
+            return None
+        return FastPathMatch("count_articles", params)
+    if vocabulary & LATEST_WORDS:
+        plural = vocabulary & PLURAL_WORDS
+        return FastPathMatch(
+            "latest_articles",
+            {**params, "limit": limit or (FAST_PATH_TOP_N if plural else 1)},
+        )
+    if params["reporter"] or params["category"]:
+        return FastPathMatch(
+            "list_articles", {**params, "limit": limit or FAST_PATH_LIST_LIMIT}
+        )
+    return None
+
+
+def _default_limit(vocabulary: set[str]) -> int:
+    """1 for a singular noun without a plural one, FAST_PATH_TOP_N otherwise."""
+    if vocabulary & SINGULAR_WORDS and not vocabulary & PLURAL_WORDS:
+        return 1
+    return FAST_PATH_TOP_N
+
+
+def _date_range(
+    dates: list[str], vocabulary: set[str]
+) -> tuple[str | None, str | None] | None:
+    """Start and end date of the question, or None when the dates are
+    ambiguous: two dates are a range, one date is a single day unless it
+    follows since / from / after (start) or until / before (end)."""
+    if not dates:
+        return None, None
+    if len(dates) == 2:
+        return min(dates), max(dates)
+    if len(dates) > 2:
+        return None
+
+    day = dates[0]
+    onwards, until = vocabulary & ONWARDS_WORDS, vocabulary & UNTIL_WORDS
+    if onwards and until:
+        return None
+    exclusive = 1 if vocabulary & EXCLUSIVE_WORDS else 0
+    if onwards:
+        return (date.fromisoformat(day) + timedelta(days=exclusive)).isoformat(), None
+    if until:
+        return None, (date.fromisoformat(day) - timedelta(days=exclusive)).isoformat()
+    return day, day
+
+
+def _limit(words: list[str]) -> int | None:
+    """The question's result limit, None without one, or 0 when it has a
+    number that is not a limit."""
+    limit = None
+    for i, word in enumerate(words):
+        if not word.isdigit():
+            continue
+        before = words[i - 1] if i else None
+        after = words[i + 1] if i + 1 < len(words) else None
+        if (
+            limit is not None
+            or not 0 < int(word) <= 100
+            or (before not in LIMIT_BEFORE_WORDS and after not in LIMIT_AFTER_WORDS)
+        ):
+            return 0
+        limit = int(word)
+    return limit
+
+
+def _scope(params: dict[str, Any]) -> str:
+    scope = ""
+    if params.get("reporter"):
+        scope += f" by {params['reporter']}"
+    if params.get("category"):
+        scope += f" in {params['category']}"
+    start, end = params.get("start_date"), params.get("end_date")
+    if start and end and start == end:
+        scope += f" on {start}"
+    elif start and end:
+        scope += f" from {start} to {end}"
+    elif start:
+        scope += f" since {start}"
+    elif end:
+        scope += f" until {end}"
+    return scope
+
+
+def _article_line(row: dict[str, Any]) -> str:
+    details = ", ".join(
+        str(row[key]) for key in ("published_at", "reporter_name", "category_name")
+        if row.get(key)
+    )
+    return f"{row['title']} ({details})" if details else str(row["title"])
+
+
+def format_fast_path_answer(match: FastPathMatch, rows: list[dict[str, Any]]) -> str:
+    scope = _scope(match.params)
+    if match.intent == "count_articles":
+        return f"There are {rows[0]['articles']} articles{scope}."
+    if match.intent == "most_productive_reporter":
+        lines = [
+            f"{i}. {row['reporter_name']}: {row['tot_session']} sessions, "
+            f"{row['tot_pageviews']} pageviews, {row['tot_users']} users"
+            for i, row in enumerate(rows, 1)
+        ]
+        return (
+            f"The most productive reporter{scope} is {rows[0]['reporter_name']} "
+            f"with {rows[0]['tot_session']} sessions.\nTop reporters:\n" + "\n".join(lines)
+        )
+    if match.intent == "most_viewed" and match.params["limit"] == 1:
+        return (
+            f"The most viewed article{scope} is {_article_line(rows[0])} with "
+            f"{rows[0]['tot_pageviews']} pageviews and {rows[0]['tot_session']} sessions."
+        )
+    if match.intent == "most_viewed":
+        lines = [
+            f"{i}. {_article_line(row)}: {row['tot_pageviews']} pageviews, "
+            f"{row['tot_session']} sessions"
+            for i, row in enumerate(rows, 1)
+        ]
+        return f"Most viewed articles{scope}:\n" + "\n".join(lines)
+    if match.intent == "latest_articles" and len(rows) == 1:
+        return f"The latest article{scope} is {_article_line(rows[0])}."
+    heading = "Latest articles" if match.intent == "latest_articles" else "Articles"
+    lines = [f"{i}. {_article_line(row)}" for i, row in enumerate(rows, 1)]
+    return f"{heading}{scope}:\n" + "\n".join(lines)
+
+
+async def _resolve_recent_days(params: dict[str, Any]) -> None:
+    """Turn recent_days into a date range ending at the last traffic day."""
+    rows = await get_connection_manager().aquery(LAST_TRAFFIC_DAY_QUERY)
+    last_day = rows[0]["last_day"] if rows else None
+    if last_day:
+        start = date.fromisoformat(last_day) - timedelta(days=params["recent_days"] - 1)
+        params["start_date"], params["end_date"] = start.isoformat(), last_day
+
+
+async def _run_intent(match: FastPathMatch) -> tuple[str | None, list[dict[str, Any]]]:
+    """Return the Cypher that ran (None for tool-backed intents) and its rows."""
+    if match.params.get("recent_days") and match.intent in (
+        "most_viewed",
+        "most_productive_reporter",
+    ):
+        await _resolve_recent_days(match.params)
+
+    if match.intent == "most_productive_reporter":
+        rows = await aget_top_reporters(
+            match.params["start_date"], match.params["end_date"], match.params["top_n"]
+        )
+        return None, rows
+
+    queries = {
+        "latest_articles": LIST_ARTICLES_QUERIES,
+        "list_articles": LIST_ARTICLES_QUERIES,
+        "count_articles": COUNT_ARTICLES_QUERIES,
+        "most_viewed": MOST_VIEWED_QUERIES,
+    }[match.intent]
+    query = queries[(bool(match.params["reporter"]), bool(match.params["category"]))]
+    return query, await get_connection_manager().aquery(query, match.params)
+
+
+@lru_cache(maxsize=1)
+def get_fast_path_phraser():
+    from chatbot_api.chains.doc_cypher_chain import qa_generation_prompt
+
+    return (
+        qa_generation_prompt
+        | ResilientChatOpenAI(model=DOC_QA_MODEL, temperature=0, tags=["graph_qa"])
+        | StrOutputParser()
+    )
+
+
+async def answer_fast_path(question: str) -> dict[str, Any] | None:
+    """Answer a recognized question without the agent, shaped like the
+    agent's response, or return None to fall back to the agent. Questions
+    whose query finds nothing also fall back, so the agent can try harder."""
+    if not FAST_PATH_ENABLED:
+        return None
+    match = match_fast_path(question, await aget_entity_catalog())
+    if match is None:
+        return None
+
+    cypher, rows = await _run_intent(match)
+    if not rows or (match.intent == "count_articles" and not rows[0]["articles"]):
+        return None
+
+    if FAST_PATH_PHRASING == "llm":
+        output = await get_fast_path_phraser().ainvoke(
+            {"question": question, "context": rows}
+        )
+    else:
+        output = format_fast_path_answer(match, rows)
+
+    return {
+        "input": question,
+        "output": output,
+        "intermediate_steps": [
+            str({"route": match.intent, "query": cypher, "params": match.params})
+        ],
+        "route": f"fast_path:{match.intent}",
+    }
@@ -0,0 +1,578 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+from chatbot_api.tools.traffic_performance import _parse_date_range
+from chatbot_api.utils.data_version import get_data_version
+from chatbot_api.utils.graph_entities import DATE_PATTERN, find_entities
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+TRAFFIC_ANALYTICS_ENABLED = os.getenv("TRAFFIC_ANALYTICS_ENABLED", "true").lower() == "true"
+# "neo4j" reads the GAIN edges at startup and again on every new ETL data
+# version, "export" loads the columns the ETL writes to TRAFFIC_EXPORT_DIR.
+TRAFFIC_ANALYTICS_SOURCE = os.getenv("TRAFFIC_ANALYTICS_SOURCE", "neo4j")
+# Layout written by the ETL traffic export stage (publisher_neo4j_etl/src/
+# traffic_export.py): TRAFFIC_EXPORT_DIR/CURRENT names the version directory
+# holding traffic.npz and articles.json.
+TRAFFIC_EXPORT_DIR = os.getenv("TRAFFIC_EXPORT_DIR", "traffic_export")
+TRAFFIC_EXPORT_FORMAT_VERSION = 1
+# Seconds between checks for a new ETL data version or export.
+TRAFFIC_ANALYTICS_REFRESH_INTERVAL = float(
+    os.getenv("TRAFFIC_ANALYTICS_REFRESH_INTERVAL", "60")
+)
+TRAFFIC_ANALYTICS_TOP_N = int(os.getenv("TRAFFIC_ANALYTICS_TOP_N", "10"))
+
+CURRENT_POINTER = "CURRENT"
+TRAFFIC_FILE = "traffic.npz"
+SIDECAR_FILE = "articles.json"
+
+METRICS = ("pageviews", "sessions", "users")
+
+TRAFFIC_ROWS_QUERY = """
+MATCH (a:Articles)-[g:GAIN]->(t:Traffic)
+RETURN a.article_id AS article_id, t.traffic_date AS traffic_date,
+    g.activeUsers AS activeUsers, g.sessions AS sessions,
+    g.screenPageViews AS screenPageViews
+"""
+
+TRAFFIC_ARTICLES_QUERY = """
+MATCH (a:Articles)
+OPTIONAL MATCH (r:Reporter)-[:WROTE]->(a)
+OPTIONAL MATCH (c:Category)-[:CONTAIN]->(a)
+RETURN a.article_id AS article_id, a.title AS title,
+    a.published_at AS published_at,
+    head(collect(DISTINCT r.reporter_name)) AS reporter_name,
+    head(collect(DISTINCT c.category_name)) AS category_name
+"""
+
+WORD_PATTERN = re.compile(r"[a-z]+|\d+")
+REPORTER_WORDS = {"reporter", "reporters", "author", "authors", "penulis", "wartawan"}
+CATEGORY_WORDS = {"category", "categories", "kategori", "rubrik"}
+GROWTH_WORDS = {
+    "growth", "growing", "grew", "rising", "rise", "trending", "increase", "increased",
+    "naik", "kenaikan", "pertumbuhan", "meningkat",
+}
+METRIC_WORDS = {
+    "sessions": "sessions", "session": "sessions", "sesi": "sessions",
+    "users": "users", "user": "users", "pengguna": "users", "pembaca": "users",
+    "pageviews": "pageviews", "pageview": "pageviews", "views": "pageviews",
+}
+GRAIN_WORDS = {
+    "daily": "day", "day": "day", "days": "day", "harian": "day",
+    "weekly": "week", "week": "week", "weeks": "week", "mingguan": "week",
+    "monthly": "month", "month": "month", "months": "month", "bulanan": "month",
+}
+# Words before a result count, as in "top 5".
+TOP_WORDS = {"top", "teratas"}
+# Units of a relative range such as "last 30 days" or "2 weeks", in days; a
+# month counts as 30 days. The range ends at the last day with traffic.
+PERIOD_DAYS = {
+    "day": 1, "days": 1, "hari": 1,
+    "week": 7, "weeks": 7, "minggu": 7,
+    "month": 30, "months": 30, "bulan": 30,
+}
+RELATIVE_WORDS = {"last", "past", "previous", "terakhir", "lalu"}
+# Relative slope per period, as a share of the mean, below which a trend is flat.
+FLAT_TREND = 0.01
+NO_TRAFFIC = "No traffic data is loaded yet."
+
+
+def _day(value: str) -> int:
+    return int(np.datetime64(str(value)[:10], "D").astype(np.int64))
+
+
+def _iso(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+@dataclass
+class TrafficTable:
+    """Article traffic as columns, one row per article and day, sorted by
+    day, with the article, reporter and category of every row one index
+    lookup away."""
+
+    day: np.ndarray
+    article: np.ndarray
+    metrics: dict[str, np.ndarray]
+    article_ids: np.ndarray
+    articles: list[dict[str, Any]]
+    article_reporter: np.ndarray
+    article_category: np.ndarray
+    reporters: list[str]
+    categories: list[str]
+    version: Any = None
+
+    @classmethod
+    def from_columns(
+        cls,
+        article_id: np.ndarray,
+        day: np.ndarray,
+        metrics: dict[str, np.ndarray],
+        articles: dict[int, dict[str, Any]],
+        version: Any = None,
+    ) -> "TrafficTable":
+        """Build the table from per-row article ids and days, and the
+        metadata of each article by id."""
+        order = np.argsort(day, kind="stable")
+        article_ids, article = np.unique(
+            np.asarray(article_id, dtype=np.int64)[order], return_inverse=True
+        )
+        metadata = [articles.get(int(i)) or {"article_id": int(i)} for i in article_ids]
+        reporters = sorted({a["reporter_name"] for a in metadata if a.get("reporter_name")})
+        categories = sorted({a["category_name"] for a in metadata if a.get("category_name")})
+        reporter_index = {name: i for i, name in enumerate(reporters)}
+        category_index = {name: i for i, name in enumerate(categories)}
+        return cls(
+            day=np.asarray(day, dtype=np.int32)[order],
+            article=article.astype(np.int32),
+            metrics={m: np.asarray(metrics[m], dtype=np.int64)[order] for m in METRICS},
+            article_ids=article_ids,
+            articles=metadata,
+            article_reporter=np.array(
+                [reporter_index.get(a.get("reporter_name"), -1) for a in metadata], dtype=np.int32
+            ),
+            article_category=np.array(
+                [category_index.get(a.get("category_name"), -1) for a in metadata], dtype=np.int32
+            ),
+            reporters=reporters,
+            categories=categories,
+            version=version,
+        )
+
+    @classmethod
+    def from_rows(
+        cls, rows: list[dict[str, Any]], articles: list[dict[str, Any]], version: Any = None
+    ) -> "TrafficTable":
+        """Build the table from TRAFFIC_ROWS_QUERY and TRAFFIC_ARTICLES_QUERY rows."""
+        article_id, day, metrics = _columns(rows)
+        return cls.from_columns(
+            article_id, day, metrics, {a["article_id"]: a for a in articles}, version
+        )
+
+    @property
+    def first_day(self) -> str | None:
+        return _iso(self.day[0]) if len(self.day) else None
+
+    @property
+    def last_day(self) -> str | None:
+        return _iso(self.day[-1]) if len(self.day) else None
+
+    def catalog(self) -> dict[str, list[str]]:
+        """Reporter and category names, in the shape find_entities expects."""
+        return {"reporter": self.reporters, "category": self.categories}
+
+    def _rows(self, start_date: str | None, end_date: str | None) -> slice:
+        """Rows of the days from start_date to end_date, both included."""
+        start, end = 0, len(self.day)
+        if start_date is not None:
+            start = np.searchsorted(self.day, _day(start_date), side="left")
+        if end_date is not None:
+            end = np.searchsorted(self.day, _day(end_date), side="right")
+        return slice(int(start), int(end))
+
+    def _groups(self, dimension: str, rows: slice) -> tuple[np.ndarray, int]:
+        article = self.article[rows]
+        if dimension == "reporter":
+            return self.article_reporter[article], len(self.reporters)
+        if dimension == "category":
+            return self.article_category[article], len(self.categories)
+        return article, len(self.article_ids)
+
+    def totals(
+        self, dimension: str, start_date: str | None = None, end_date: str | None = None
+    ) -> dict[str, np.ndarray]:
+        """Every metric summed per article, reporter or category over the range."""
+        rows = self._rows(start_date, end_date)
+        groups, size = self._groups(dimension, rows)
+        known = groups >= 0
+        return {
+            m: np.bincount(groups[known], weights=self.metrics[m][rows][known], minlength=size)
+            .astype(np.int64)
+            for m in METRICS
+        }
+
+    def _entry(self, dimension: str, index: int) -> dict[str, Any]:
+        if dimension == "reporter":
+            return {"reporter_name": self.reporters[index]}
+        if dimension == "category":
+            return {"category_name": self.categories[index]}
+        article = self.articles[index]
+        return {
+            key: article.get(key)
+            for key in ("article_id", "title", "published_at", "reporter_name", "category_name")
+        }
+
+    def top(
+        self,
+        dimension: str = "article",
+        start_date: str | None = None,
+        end_date: str | None = None,
+        metric: str = "pageviews",
+        top_n: int = TRAFFIC_ANALYTICS_TOP_N,
+    ) -> list[dict[str, Any]]:
+        """The top_n articles, reporters or categories by a metric over the
+        range, with all three metrics."""
+        totals = self.totals(dimension, start_date, end_date)
+        ranked = _largest(totals[metric], top_n)
+        return [
+            {**self._entry(dimension, i), **{m: int(totals[m][i]) for m in METRICS}}
+            for i in ranked
+        ]
+
+    def growth(
+        self,
+        dimension: str = "article",
+        start_date: str | None = None,
+        end_date: str | None = None,
+        metric: str = "pageviews",
+        top_n: int = TRAFFIC_ANALYTICS_TOP_N,
+    ) -> list[dict[str, Any]]:
+        """The top_n articles, reporters or categories that gained the most
+        of a metric over the range, compared with the period of the same
+        length right before it."""
+        start, end = self._bounds(start_date, end_date)
+        length = end - start + 1
+        current = self.totals(dimension, _iso(start), _iso(end))[metric]
+        previous = self.totals(dimension, _iso(start - length), _iso(start - 1))[metric]
+        change = current - previous
+        return [
+            {
+                **self._entry(dimension, i),
+                metric: int(current[i]),
+                f"previous_{metric}": int(previous[i]),
+                "change": int(change[i]),
+                "change_pct": round(float(change[i]) / previous[i] * 100, 1)
+                if previous[i]
+                else None,
+            }
+            for i in _largest(change, top_n)
+        ]
+
+    def trend(
+        self,
+        start_date: str | None = None,
+        end_date: str | None = None,
+        grain: str | None = None,
+        metric: str = "pageviews",
+        reporter: str | None = None,
+        category: str | None = None,
+    ) -> dict[str, Any]:
+        """A metric per day, week or month over the range, for all traffic or
+        one reporter or category, with its overall change and direction."""
+        start, end = self._bounds(start_date, end_date)
+        if grain is None:
+            grain = "day" if end - start < 31 else "week" if end - start < 180 else "month"
+        rows = self._rows(_iso(start), _iso(end))
+        day, values = self.day[rows], self.metrics[metric][rows]
+        if reporter is not None or category is not None:
+            mask = np.ones(len(day), dtype=bool)
+            article = self.article[rows]
+            if reporter is not None:
+                mask &= self.article_reporter[article] == _index(self.reporters, reporter)
+            if category is not None:
+                mask &= self.article_category[article] == _index(self.categories, category)
+            day, values = day[mask], values[mask]
+
+        # Every period of the range, so days without traffic count as zero.
+        starts = np.unique(_periods(np.arange(start, end + 1, dtype=np.int32), grain))
+        bucket = np.searchsorted(starts, _periods(day, grain))
+        series = np.bincount(bucket, weights=values, minlength=len(starts)).astype(np.int64)
+        result: dict[str, Any] = {
+            "metric": metric,
+            "grain": grain,
+            "start_date": _iso(start),
+            "end_date": _iso(end),
+            "reporter_name": reporter,
+            "category_name": category,
+            "total": int(series.sum()),
+            "series": [
+                {"period_start": _iso(s), metric: int(v)} for s, v in zip(starts, series)
+            ],
+            "direction": "flat",
+            "change_pct": None,
+        }
+        if len(series) >= 2:
+            slope = np.polyfit(np.arange(len(series)), series.astype(np.float64), 1)[0]
+            mean = series.mean()
+            if mean and abs(slope) / mean >= FLAT_TREND:
+                result["direction"] = "rising" if slope > 0 else "falling"
+            if series[0]:
+                result["change_pct"] = round(float(series[-1] - series[0]) / series[0] * 100, 1)
+        return result
+
+    def _bounds(self, start_date: str | None, end_date: str | None) -> tuple[int, int]:
+        """The range as days, open ends bounded by the loaded traffic."""
+        if not len(self.day):
+            raise ValueError("No traffic is loaded")
+        start = _day(start_date) if start_date else int(self.day[0])
+        end = _day(end_date) if end_date else int(self.day[-1])
+        return start, end
+
+
+def _columns(rows: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray, dict[str, np.ndarray]]:
+    article_id = np.array([r["article_id"] for r in rows], dtype=np.int64)
+    day = np.array([str(r["traffic_date"])[:10] for r in rows], dtype="datetime64[D]")
+    metrics = {
+        "users": np.array([r["activeUsers"] or 0 for r in rows], dtype=np.int64),
+        "sessions": np.array([r["sessions"] or 0 for r in rows], dtype=np.int64),
+        "pageviews": np.array([r["screenPageViews"] or 0 for r in rows], dtype=np.int64),
+    }
+    return article_id, day.astype(np.int32), metrics
+
+
+def _largest(values: np.ndarray, n: int) -> list[int]:
+    """Indexes of the n largest positive values, largest first."""
+    n = min(n, len(values))
+    if n <= 0:
+        return []
+    candidates = np.argpartition(-values, n - 1)[:n]
+    ranked = candidates[np.argsort(-values[candidates], kind="stable")]
+    return [int(i) for i in ranked if values[i] > 0]
+
+
+def _index(names: list[str], name: str) -> int:
+    try:
+        return names.index(name)
+    except ValueError:
+        return -2  # matches no article, unlike -1 for articles without one
+
+
+def _periods(day: np.ndarray, grain: str) -> np.ndarray:
+    """First day of the day's week (Monday) or month, as days."""
+    if grain == "week":
+        # 1970-01-01 was a Thursday.
+        return day - (day + 3) % 7
+    if grain == "month":
+        months = day.astype("datetime64[D]").astype("datetime64[M]")
+        return months.astype("datetime64[D]").astype(np.int32)
+    return day
+
+
+def _load_export(export_dir: str, version: str) -> TrafficTable:
+    version_dir = os.path.join(export_dir, version)
+    with open(os.path.join(version_dir, SIDECAR_FILE), encoding="utf-8") as f:
+        sidecar = json.load(f)
+    if sidecar.get("format_version") != TRAFFIC_EXPORT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported traffic export format in {version_dir}")
+    articles = sidecar["articles"]
+    with np.load(os.path.join(version_dir, TRAFFIC_FILE)) as columns:
+        article_ids = np.array([a["article_id"] for a in articles], dtype=np.int64)
+        return TrafficTable.from_columns(
+            article_ids[columns["article"]],
+            columns["day"],
+            {m: columns[m] for m in METRICS},
+            {a["article_id"]: a for a in articles},
+            version,
+        )
+
+
+class TrafficAnalytics:
+    """The traffic table, loaded on first use and refreshed at most every
+    refresh_interval seconds: read again from Neo4j once the ETL data
+    version changed, or from a newer ETL export. Queries running during a
+    refresh keep the previous table."""
+
+    def __init__(
+        self,
+        source: str = TRAFFIC_ANALYTICS_SOURCE,
+        export_dir: str = TRAFFIC_EXPORT_DIR,
+        refresh_interval: float = TRAFFIC_ANALYTICS_REFRESH_INTERVAL,
+    ) -> None:
+        self.source = source
+        self.export_dir = export_dir
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._table: TrafficTable | None = None
+        self._checked_at = 0.0
+
+    def _fresh(self) -> TrafficTable | None:
+        table = self._table
+        if table is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return table
+        return None
+
+    def table(self) -> TrafficTable:
+        table = self._fresh()
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._fresh()
+            if table is not None:
+                return table
+            if self.source == "export":
+                self._table = self._refresh_from_export(self._table)
+            else:
+                self._table = self._refresh_from_neo4j(self._table)
+            self._checked_at = time.monotonic()
+            return self._table
+
+    async def atable(self) -> TrafficTable:
+        """table(), building or refreshing it on a worker thread."""
+        return self._fresh() or await asyncio.to_thread(self.table)
+
+    def _refresh_from_export(self, table: TrafficTable | None) -> TrafficTable:
+        try:
+            with open(os.path.join(self.export_dir, CURRENT_POINTER), encoding="utf-8") as f:
+                version = f.read().strip() or None
+        except OSError:
+            version = None
+        if version is None:
+            raise FileNotFoundError(f"No traffic export in {self.export_dir}")
+        if table is not None and table.version == version:
+            return table
+        return _load_export(self.export_dir, version)
+
+    def _refresh_from_neo4j(self, table: TrafficTable | None) -> TrafficTable:
+        connection = get_connection_manager()
+        data_version = get_data_version()
+        if table is not None and table.version == data_version:
+            return table
+        # All of it is read again: the ETL may backfill or correct any day,
+        # and edit or re-assign any article.
+        articles = connection.query(TRAFFIC_ARTICLES_QUERY)
+        rows = connection.query(TRAFFIC_ROWS_QUERY)
+        return TrafficTable.from_rows(rows, articles, data_version)
+
+
+@lru_cache(maxsize=1)
+def get_traffic_analytics() -> TrafficAnalytics:
+    return TrafficAnalytics()
+
+
+def _words(text: str) -> list[str]:
+    """Words and numbers of text in order, without its ISO dates."""
+    return WORD_PATTERN.findall(DATE_PATTERN.sub(" ", text.lower()))
+
+
+def _metric(words: list[str]) -> str:
+    """The first metric mentioned, pageviews by default."""
+    return next((METRIC_WORDS[w] for w in words if w in METRIC_WORDS), "pageviews")
+
+
+def _top_n(words: list[str]) -> int:
+    """The count after "top" (or before what is ranked, as in "5
+    reporters"); other numbers, e.g. a year, are not a count."""
+    ranked = REPORTER_WORDS | CATEGORY_WORDS | {"article", "articles", "artikel", "berita"}
+    for i, word in enumerate(words):
+        if not word.isdigit() or not 0 < int(word) <= 100:
+            continue
+        if (i and words[i - 1] in TOP_WORDS) or (i + 1 < len(words) and words[i + 1] in ranked):
+            return int(word)
+    return TRAFFIC_ANALYTICS_TOP_N
+
+
+def _relative_days(words: list[str]) -> tuple[int | None, list[str]]:
+    """Days of a relative range such as "last 30 days", "2 weeks", "last
+    month" or "7 hari terakhir", and the words without it."""
+    for i, word in enumerate(words):
+        if word not in PERIOD_DAYS or i == 0:
+            continue
+        if words[i - 1].isdigit():
+            count = int(words[i - 1])
+        elif words[i - 1] in RELATIVE_WORDS:
+            count = 1
+        else:
+            continue  # e.g. "per week", a grain rather than a range
+        first, last = i - 1, i + 1
+        if first > 0 and words[first - 1] in RELATIVE_WORDS:
+            first -= 1
+        if last < len(words) and words[last] in RELATIVE_WORDS:
+            last += 1
+        return count * PERIOD_DAYS[word], words[:first] + words[last:]
+    return None, words
+
+
+def _date_range(
+    text: str, words: list[str], last_day: str | None
+) -> tuple[str | None, str | None, list[str]]:
+    """The "YYYY-MM-DD [to YYYY-MM-DD]" range of text or, without dates, its
+    relative range ending at last_day, and the words left after a relative
+    range."""
+    start_date, end_date = _parse_date_range(text)
+    days, words = _relative_days(words)
+    if days is not None and start_date is None and last_day is not None:
+        end_date = last_day
+        start_date = (date.fromisoformat(last_day) - timedelta(days=days - 1)).isoformat()
+    return start_date, end_date, words
+
+
+def parse_popular_input(text: Any, last_day: str | None = None) -> dict[str, Any]:
+    """Dimension, metric, ranking, count and date range out of the Popular
+    tool's input, e.g. "reporters by sessions growth top 5 2024-03-01 to
+    2024-03-31". Relative ranges such as "last 30 days" end at last_day."""
+    text = str(text or "")
+    start_date, end_date, words = _date_range(text, _words(text), last_day)
+    vocabulary = set(words)
+    return {
+        "dimension": "reporter"
+        if vocabulary & REPORTER_WORDS
+        else "category"
+        if vocabulary & CATEGORY_WORDS
+        else "article",
+        "metric": _metric(words),
+        "ranking": "growth" if vocabulary & GROWTH_WORDS else "total",
+        "top_n": _top_n(words),
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+
+def _popular(table: TrafficTable, query: Any) -> dict[str, Any]:
+    params = parse_popular_input(query, table.last_day)
+    if table.last_day is None:
+        return {**params, "results": [], "message": NO_TRAFFIC}
+    rank = table.growth if params["ranking"] == "growth" else table.top
+    return {
+        **params,
+        "data_from": table.first_day,
+        "data_until": table.last_day,
+        "results": rank(
+            params["dimension"],
+            params["start_date"],
+            params["end_date"],
+            params["metric"],
+            params["top_n"],
+        ),
+    }
+
+
+def get_popular_articles(query: Any) -> dict[str, Any]:
+    """Rank articles, reporters or categories by traffic or traffic growth
+    over a date range, from the in-process traffic table."""
+    return _popular(get_traffic_analytics().table(), query)
+
+
+async def aget_popular_articles(query: Any) -> dict[str, Any]:
+    return _popular(await get_traffic_analytics().atable(), query)
+
+
+def _trend(table: TrafficTable, query: Any) -> dict[str, Any]:
+    if table.last_day is None:
+        return {"series": [], "message": NO_TRAFFIC}
+    text = str(query or "")
+    start_date, end_date, words = _date_range(text, _words(text), table.last_day)
+    scope: dict[str, str] = {}
+    for kind, value, _, _ in find_entities(text, table.catalog()):
+        if kind in ("reporter", "category"):
+            scope.setdefault(kind, value)
+    grain = next((GRAIN_WORDS[w] for w in words if w in GRAIN_WORDS), None)
+    return table.trend(start_date, end_date, grain, _metric(words), **scope)
+
+
+def get_traffic_trend(query: Any) -> dict[str, Any]:
+    """Traffic per day, week or month over a date range, for all articles
+    or one reporter or category, from the in-process traffic table."""
+    return _trend(get_traffic_analytics().table(), query)
+
+
+async def aget_traffic_trend(query: Any) -> dict[str, Any]:
+    return _trend(await get_traffic_analytics().atable(), query)
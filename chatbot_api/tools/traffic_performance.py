@@ -1,70 +1,121 @@
-import os
+import re
 from typing import Any
 
-import numpy as np
-from langchain_community.graphs import Neo4jGraph
-
-def _get_reporter_names() -> list[str]:
-    """Fetch a list of reporter names from a Neo4j database."""
-    graph = Neo4jGraph(
-        url=os.getenv("NEO4J_URI"),
-        username=os.getenv("NEO4J_USERNAME"),
-        password=os.getenv("NEO4J_PASSWORD"),
-    )
-
-    reporter_list = graph.query(
-        """
-        MATCH (r:Reporters)
-        RETURN r.reporter_name AS reporter_name
-        """
-    )
-
-    reporter_list = [d["reporter_name"].lower() for d in reporter_list]
-
-    return reporter_list
-
-
-def _get_current_performance(reporter: str) -> int:
-    """Get the current reporter article performances."""
-
-    reporter_list = _get_reporter_names()
-
-    if reporter.lower() not in reporter_list:
-        return -1
+from chatbot_api.utils.data_version import aget_data_version, get_data_version
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Reads the (:Reporter)-[:ROLLUP]->(:ReporterTraffic) daily rollups that the
+# ETL maintains, so the whole ranking is a single aggregate query.
+TOP_REPORTERS_QUERY = """
+MATCH (r:Reporter)-[:ROLLUP]->(rt:ReporterTraffic {grain: 'day'})
+WHERE ($start_date IS NULL OR rt.period_start >= $start_date)
+    AND ($end_date IS NULL OR rt.period_start <= $end_date)
+RETURN r.reporter_name AS reporter_name,
+    sum(rt.sessions) AS tot_session,
+    sum(rt.screenPageViews) AS tot_pageviews,
+    sum(rt.activeUsers) AS tot_users
+ORDER BY tot_session DESC
+LIMIT $top_n
+"""
+
+# Same ranking straight from the GAIN edges, for graphs loaded before the
+# rollups existed. Only used when ROLLUPS_EXIST_QUERY finds no rollup, as it
+# aggregates every GAIN edge.
+TOP_REPORTERS_FROM_TRAFFIC_QUERY = """
+MATCH (r:Reporter)-[:WROTE]->(:Articles)-[g:GAIN]->(t:Traffic)
+WHERE ($start_date IS NULL OR t.traffic_date >= $start_date)
+    AND ($end_date IS NULL OR t.traffic_date <= $end_date)
+RETURN r.reporter_name AS reporter_name,
+    sum(g.sessions) AS tot_session,
+    sum(g.screenPageViews) AS tot_pageviews,
+    sum(g.activeUsers) AS tot_users
+ORDER BY tot_session DESC
+LIMIT $top_n
+"""
+
+ROLLUPS_EXIST_QUERY = """
+MATCH (rt:ReporterTraffic)
+RETURN true AS rollups
+LIMIT 1
+"""
+
+# Whether the graph has reporter rollups, checked once per ETL data version.
+_rollups = {"data_version": None, "exist": False}
+
+
+def _parse_date_range(text: Any) -> tuple[str | None, str | None]:
+    """Pick an optional "YYYY-MM-DD [to YYYY-MM-DD]" range out of the tool input."""
+    dates = sorted(DATE_PATTERN.findall(str(text or "")))
+    if not dates:
+        return None, None
+    if len(dates) == 1:
+        return dates[0], None
+    return dates[0], dates[-1]
+
+
+def _top_reporters_query(rollups_exist: bool) -> str:
+    return TOP_REPORTERS_QUERY if rollups_exist else TOP_REPORTERS_FROM_TRAFFIC_QUERY
+
+
+def _rollups_exist() -> bool:
+    data_version = get_data_version()
+    if _rollups["data_version"] != data_version:
+        _rollups["exist"] = bool(get_connection_manager().query(ROLLUPS_EXIST_QUERY))
+        _rollups["data_version"] = data_version
+    return _rollups["exist"]
+
+
+async def _arollups_exist() -> bool:
+    data_version = await aget_data_version()
+    if _rollups["data_version"] != data_version:
+        rows = await get_connection_manager().aquery(ROLLUPS_EXIST_QUERY)
+        _rollups["exist"], _rollups["data_version"] = bool(rows), data_version
+    return _rollups["exist"]
+
+
+def get_top_reporters(
+    start_date: str | None = None,
+    end_date: str | None = None,
+    top_n: int = 5,
+) -> list[dict[str, Any]]:
+    """Rank reporters by the sessions of their articles over a date range,
+    from the rollups, or from the GAIN edges when the graph has none."""
+    params = {"start_date": start_date, "end_date": end_date, "top_n": top_n}
+    query = _top_reporters_query(_rollups_exist())
+    return get_connection_manager().query(query, params)
+
+
+async def aget_top_reporters(
+    start_date: str | None = None,
+    end_date: str | None = None,
+    top_n: int = 5,
+) -> list[dict[str, Any]]:
+    """Async get_top_reporters, on the async driver."""
+    params = {"start_date": start_date, "end_date": end_date, "top_n": top_n}
+    query = _top_reporters_query(await _arollups_exist())
+    return await get_connection_manager().aquery(query, params)
+
+
+def get_most_productive_reporter(query: Any) -> dict[str, Any]:
+    """Find most productive reporter based on the tot_session of their articles"""
 
-    graph = Neo4jGraph(
-        url=os.getenv("NEO4J_URI"),
-        username=os.getenv("NEO4J_USERNAME"),
-        password=os.getenv("NEO4J_PASSWORD"),
-    )
+    start_date, end_date = _parse_date_range(query)
+    return _most_productive(get_top_reporters(start_date, end_date))
 
-    performance = graph.query(
-        """
-        MATCH (r:Reporter)-[:WROTE]->(a:Articles)-[g:GAIN]->(t:Traffic) 
-        WHERE r.reporter_name = $reporter
-        RETURN sum(g.sessions) AS tot_session
-        """,
-        parameters={"reporter": reporter}
-    )
 
-    if performance:
-        return performance[0]["tot_session"]
-    else:
-        return 0
+async def aget_most_productive_reporter(query: Any) -> dict[str, Any]:
+    start_date, end_date = _parse_date_range(query)
+    return _most_productive(await aget_top_reporters(start_date, end_date))
 
 
-def get_most_productive_reporter(_: Any) -> dict[str, float]:
-    """Find most productive reporter based on the tot_session of their articles"""
+def _most_productive(top_reporters: list[dict[str, Any]]) -> dict[str, Any]:
+    if not top_reporters:
+        return {"reporter_name": None, "tot_session": 0, "top_reporters": []}
 
-    reporter_list = _get_reporter_names()
-    
-    current_reporter_performance = {
-        r: _get_current_performance(r) for r in reporter_list
+    return {
+        "reporter_name": top_reporters[0]["reporter_name"],
+        "tot_session": top_reporters[0]["tot_session"],
+        "top_reporters": top_reporters,
     }
-
-    most_productive_reporter = max(current_reporter_performance, key=current_reporter_performance.get)
-    tot_session = current_reporter_performance[most_productive_reporter]
-
-    return {"reporter_name": most_productive_reporter, "tot_session": tot_session}
-
-    
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+
+from chatbot_api.utils.embeddings import get_embeddings
+from chatbot_api.utils.graph_entities import aget_entity_catalog, find_entities
+
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", ".answer_cache.sqlite")
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95")
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s-]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _cache_key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class InMemoryCacheBackend:
+    """LRU cache with a per-entry TTL, local to the process."""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry: dict[str, Any]) -> bool:
+        return time.time() - entry["created_at"] > self.ttl
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def embeddings(self) -> tuple[list[str], np.ndarray | None]:
+        """Keys and stacked embeddings of the live entries that have one."""
+        with self._lock:
+            live = [
+                (key, entry["embedding"])
+                for key, entry in self._entries.items()
+                if entry.get("embedding") is not None and not self._expired(entry)
+            ]
+        if not live:
+            return [], None
+        keys, vectors = zip(*live)
+        return list(keys), np.asarray(vectors, dtype=np.float32)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend:
+    """LRU cache with a per-entry TTL in a local SQLite file, so entries
+    survive restarts and are shared by the workers of one host."""
+
+    def __init__(self, path: str, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                entry TEXT,
+                embedding BLOB,
+                created_at REAL,
+                accessed_at REAL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT entry, embedding, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE answers SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        entry = json.loads(row[0])
+        if row[1] is not None:
+            entry["embedding"] = np.frombuffer(row[1], dtype=np.float32)
+        return entry
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        embedding = entry.get("embedding")
+        blob = (
+            np.asarray(embedding, dtype=np.float32).tobytes()
+            if embedding is not None
+            else None
+        )
+        payload = json.dumps({k: v for k, v in entry.items() if k != "embedding"})
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (key, payload, blob, entry["created_at"], time.time()),
+            )
+            self._conn.execute(
+                """DELETE FROM answers WHERE key IN (
+                    SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def embeddings(self) -> tuple[list[str], np.ndarray | None]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM answers WHERE embedding IS NOT NULL AND created_at >= ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        if not rows:
+            return [], None
+        return [r[0] for r in rows], np.stack(
+            [np.frombuffer(r[1], dtype=np.float32) for r in rows]
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+
+@dataclass
+class CacheLookup:
+    response: dict[str, Any] | None = None
+    tier: str | None = None
+    similarity: float | None = None
+    age_seconds: float | None = None
+    embedding: list[float] | None = field(default=None, repr=False)
+    entities: list[list[str]] | None = field(default=None, repr=False)
+
+    @property
+    def hit(self) -> bool:
+        return self.response is not None
+
+    def info(self, data_version: int) -> dict[str, Any]:
+        return {
+            "hit": self.hit,
+            "tier": self.tier,
+            "similarity": self.similarity,
+            "age_seconds": self.age_seconds,
+            "data_version": data_version,
+        }
+
+
+class AnswerCache:
+    """Two-tier answer cache: exact match on the normalized question, then
+    the most similar cached question above a similarity threshold.
+
+    Entries remember the ETL data version they were answered against and
+    are dropped once the graph moves to a newer version. They also keep the
+    reporter, category and date literals of their question; a similar
+    question is only a hit when those are exactly the same, as questions
+    differing only in them embed almost identically.
+    """
+
+    def __init__(
+        self,
+        backend,
+        embeddings=None,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        catalog: Callable[[], Awaitable[dict[str, list[str]]]] = aget_entity_catalog,
+    ) -> None:
+        self.backend = backend
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.catalog = catalog
+
+    def _fresh(self, key: str, data_version: int) -> dict[str, Any] | None:
+        entry = self.backend.get(key)
+        if entry is not None and entry["data_version"] != data_version:
+            self.backend.delete(key)
+            return None
+        return entry
+
+    async def _embed(self, normalized: str) -> list[float] | None:
+        if self.embeddings is None:
+            return None
+        try:
+            return await self.embeddings.aembed_query(normalized)
+        except Exception as e:
+            LOGGER.warning(f"Skipping semantic answer cache lookup: {e}")
+            return None
+
+    async def _entities(self, question: str) -> list[list[str]] | None:
+        """Sorted [kind, value] pairs of the question's entities and dates."""
+        try:
+            catalog = await self.catalog()
+        except Exception as e:
+            LOGGER.warning(f"Skipping semantic answer cache lookup: {e}")
+            return None
+        return sorted([kind, value] for kind, value, _, _ in find_entities(question, catalog))
+
+    async def alookup(self, question: str, data_version: int) -> CacheLookup:
+        normalized = normalize_question(question)
+        entry = self._fresh(_cache_key(normalized), data_version)
+        if entry is not None:
+            return CacheLookup(
+                response=entry["response"],
+                tier="exact",
+                similarity=1.0,
+                age_seconds=time.time() - entry["created_at"],
+            )
+
+        embedding = await self._embed(normalized)
+        entities = await self._entities(question)
+        if embedding is None or entities is None:
+            return CacheLookup(embedding=embedding, entities=entities)
+
+        keys, matrix = self.backend.embeddings()
+        if matrix is not None:
+            query = np.asarray(embedding, dtype=np.float32)
+            scores = matrix @ query / (
+                np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12
+            )
+            similar = np.flatnonzero(scores >= self.similarity_threshold)
+            for i in similar[np.argsort(-scores[similar], kind="stable")]:
+                entry = self._fresh(keys[i], data_version)
+                if entry is not None and entry.get("entities") == entities:
+                    return CacheLookup(
+                        response=entry["response"],
+                        tier="semantic",
+                        similarity=float(scores[i]),
+                        age_seconds=time.time() - entry["created_at"],
+                        embedding=embedding,
+                        entities=entities,
+                    )
+
+        return CacheLookup(embedding=embedding, entities=entities)
+
+    async def astore(
+        self,
+        question: str,
+        response: dict[str, Any],
+        data_version: int,
+        embedding: list[float] | None = None,
+        entities: list[list[str]] | None = None,
+    ) -> None:
+        normalized = normalize_question(question)
+        if embedding is None:
+            embedding = await self._embed(normalized)
+        if entities is None:
+            entities = await self._entities(question)
+        self.backend.set(
+            _cache_key(normalized),
+            {
+                "question": normalized,
+                "response": response,
+                "data_version": data_version,
+                "created_at": time.time(),
+                "embedding": embedding,
+                "entities": entities,
+            },
+        )
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache | None:
+    """Answer cache configured by ANSWER_CACHE_BACKEND (memory, disk or none)."""
+    if ANSWER_CACHE_BACKEND == "none":
+        return None
+    if ANSWER_CACHE_BACKEND == "disk":
+        backend = DiskCacheBackend(
+            ANSWER_CACHE_PATH, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL
+        )
+    else:
+        backend = InMemoryCacheBackend(ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL)
+    return AnswerCache(backend, embeddings=get_embeddings())
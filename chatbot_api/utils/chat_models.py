@@ -0,0 +1,78 @@
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from chatbot_api.utils.resilience import acall_with_retry, astream_with_retry, call_with_retry
+
+
+class ResilientChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose calls go through the "openai" circuit breaker and
+    the shared retry budget, instead of the OpenAI client's own retries.
+
+    Only the failed call is retried, so a flaky call does not replay the
+    agent steps before it.
+    """
+
+    max_retries: int = 0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return call_with_retry(
+            "openai", super()._generate, messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await acall_with_retry(
+            "openai", super()._agenerate, messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        parent = super()._astream
+        async for chunk in astream_with_retry(
+            "openai",
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+        ):
+            yield chunk
+
+
+class ResilientOpenAIEmbeddings(OpenAIEmbeddings):
+    """OpenAIEmbeddings whose calls go through the same "openai" circuit
+    breaker and retry budget as ResilientChatOpenAI, so an OpenAI outage
+    fails fast with CircuitOpenError during retrieval too."""
+
+    max_retries: int = 0
+
+    # embed_query and aembed_query go through these, so they are not
+    # wrapped again.
+    def embed_documents(
+        self, texts: List[str], chunk_size: Optional[int] = 0
+    ) -> List[List[float]]:
+        return call_with_retry("openai", super().embed_documents, texts, chunk_size)
+
+    async def aembed_documents(
+        self, texts: List[str], chunk_size: Optional[int] = 0
+    ) -> List[List[float]]:
+        return await acall_with_retry("openai", super().aembed_documents, texts, chunk_size)
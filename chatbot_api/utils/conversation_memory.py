@@ -0,0 +1,188 @@
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Any, Callable
+
+from langchain.prompts import PromptTemplate
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+
+from chatbot_api.utils.answer_cache import DiskCacheBackend, InMemoryCacheBackend
+from chatbot_api.utils.chat_models import ResilientChatOpenAI
+from chatbot_api.utils.passage_context import token_counter
+
+# memory (per process, LRU), disk (SQLite file at CONVERSATION_PATH) or none.
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory")
+CONVERSATION_PATH = os.getenv("CONVERSATION_PATH", ".conversations.sqlite")
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+# Conversations are forgotten this many seconds after their last turn.
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "86400"))
+# Turns passed to the agent as they are, and the tokens they may take
+# together with the summary of the older turns.
+CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "6"))
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "1500"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "300"))
+CONVERSATION_SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL") or os.getenv("DOC_QA_MODEL")
+
+LOGGER = logging.getLogger(__name__)
+
+summary_template = """Progressively summarize a conversation between a user
+and an assistant about news articles, reporters and article traffic. Keep
+the reporter names, categories, article titles, dates and numbers the user
+may refer back to. Use at most {max_words} words.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+summary_prompt = PromptTemplate(
+    input_variables=["max_words", "summary", "lines"], template=summary_template
+)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """The longest prefix of text, cut at a word, within max_tokens; with a
+    negative max_tokens the longest such suffix."""
+    keep_end = max_tokens < 0
+    max_tokens = abs(max_tokens)
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        part = words[-middle:] if keep_end else words[:middle]
+        if count_tokens(" ".join(part)) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0:
+        return ""
+    return " ".join(words[-low:] if keep_end else words[:low])
+
+
+def _lines(turns: list[dict[str, str]]) -> str:
+    return "\n".join(f"User: {t['input']}\nAssistant: {t['output']}" for t in turns)
+
+
+class ConversationMemory:
+    """Conversations by session id: the recent turns as they are and a
+    rolling summary of the older ones, together within a token budget."""
+
+    def __init__(
+        self,
+        backend,
+        summarizer=None,
+        recent_turns: int = CONVERSATION_RECENT_TURNS,
+        history_tokens: int = CONVERSATION_HISTORY_TOKENS,
+        summary_tokens: int = CONVERSATION_SUMMARY_TOKENS,
+        count_tokens: Callable[[str], int] | None = None,
+    ) -> None:
+        self.backend = backend
+        self.summarizer = summarizer
+        self.recent_turns = recent_turns
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self._count_tokens = count_tokens
+
+    def count_tokens(self, text: str) -> int:
+        if self._count_tokens is None:
+            self._count_tokens = token_counter(CONVERSATION_SUMMARY_MODEL)
+        return self._count_tokens(text)
+
+    def get(self, session_id: str) -> dict[str, Any]:
+        conversation = self.backend.get(session_id) or {}
+        return {
+            "summary": conversation.get("summary", ""),
+            "turns": list(conversation.get("turns", [])),
+        }
+
+    def history(self, session_id: str) -> list[BaseMessage]:
+        """Chat history for the agent's chat_history placeholder."""
+        conversation = self.get(session_id)
+        messages: list[BaseMessage] = []
+        if conversation["summary"]:
+            messages.append(
+                SystemMessage(
+                    content=f"Summary of the earlier conversation:\n{conversation['summary']}"
+                )
+            )
+        for turn in conversation["turns"]:
+            messages.append(HumanMessage(content=turn["input"]))
+            messages.append(AIMessage(content=turn["output"]))
+        return messages
+
+    def _over_budget(self, conversation: dict[str, Any]) -> bool:
+        turns = conversation["turns"]
+        if len(turns) > self.recent_turns:
+            return True
+        text = conversation["summary"] + "\n" + _lines(turns)
+        return len(turns) > 1 and self.count_tokens(text) > self.history_tokens
+
+    async def _summarize(self, summary: str, turns: list[dict[str, str]]) -> str:
+        lines = _lines(turns)
+        if self.summarizer is not None:
+            try:
+                summary = await self.summarizer.ainvoke(
+                    {
+                        "max_words": int(self.summary_tokens * 0.75),
+                        "summary": summary or "(none)",
+                        "lines": lines,
+                    }
+                )
+            except Exception as e:
+                LOGGER.warning(f"Keeping the latest conversation lines as summary: {e}")
+                summary = f"{summary}\n{lines}"
+        else:
+            summary = f"{summary}\n{lines}"
+        # Without an LLM, or when it ran long, the latest lines are kept.
+        return truncate_to_tokens(summary.strip(), -self.summary_tokens, self.count_tokens)
+
+    async def aappend(self, session_id: str, question: str, answer: str) -> None:
+        """Add a turn. Once the turns exceed the budget, the older half is
+        folded into the summary, so that happens every few turns instead of
+        on every one."""
+        conversation = self.get(session_id)
+        answer = truncate_to_tokens(answer, self.history_tokens // 2, self.count_tokens)
+        conversation["turns"].append({"input": question, "output": answer})
+        if self._over_budget(conversation):
+            keep = max(1, min(self.recent_turns, len(conversation["turns"])) // 2)
+            older = conversation["turns"][:-keep]
+            conversation["turns"] = conversation["turns"][-keep:]
+            conversation["summary"] = await self._summarize(conversation["summary"], older)
+        self.backend.set(
+            session_id,
+            {
+                "summary": conversation["summary"],
+                "turns": conversation["turns"],
+                "created_at": time.time(),
+            },
+        )
+
+    def delete(self, session_id: str) -> None:
+        self.backend.delete(session_id)
+
+
+@lru_cache(maxsize=1)
+def get_conversation_memory() -> ConversationMemory | None:
+    """Conversation memory configured by CONVERSATION_BACKEND (memory, disk
+    or none)."""
+    if CONVERSATION_BACKEND == "none":
+        return None
+    if CONVERSATION_BACKEND == "disk":
+        backend = DiskCacheBackend(CONVERSATION_PATH, CONVERSATION_MAX_SESSIONS, CONVERSATION_TTL)
+    else:
+        backend = InMemoryCacheBackend(CONVERSATION_MAX_SESSIONS, CONVERSATION_TTL)
+    summarizer = (
+        summary_prompt
+        | ResilientChatOpenAI(
+            model=CONVERSATION_SUMMARY_MODEL, temperature=0, tags=["conversation_summary"]
+        )
+        | StrOutputParser()
+    )
+    return ConversationMemory(backend, summarizer)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+from chatbot_api.utils.answer_cache import InMemoryCacheBackend, normalize_question
+from chatbot_api.utils.data_version import aget_data_version, get_data_version
+from chatbot_api.utils.graph_entities import DATE_PATTERN, aget_entity_catalog, find_entities
+
+CYPHER_CACHE_ENABLED = os.getenv("CYPHER_CACHE_ENABLED", "true").lower() == "true"
+CYPHER_CACHE_TTL = float(os.getenv("CYPHER_CACHE_TTL", "86400"))
+CYPHER_CACHE_MAX_ENTRIES = int(os.getenv("CYPHER_CACHE_MAX_ENTRIES", "1000"))
+GRAPH_RESULT_CACHE_TTL = float(os.getenv("GRAPH_RESULT_CACHE_TTL", "3600"))
+GRAPH_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("GRAPH_RESULT_CACHE_MAX_ENTRIES", "1000"))
+
+STRING_LITERAL = re.compile(r"(['\"])((?:\\.|(?!\1).)*)\1")
+WORD = re.compile(r"\w+")
+
+
+@dataclass
+class QuestionTemplate:
+    """A question with its reporter, category and date literals pulled out
+    as named parameters."""
+
+    key: str
+    params: dict[str, str] = field(default_factory=dict)
+
+
+def question_template(
+    question: str, catalog: dict[str, list[str]] | None = None
+) -> QuestionTemplate:
+    params: dict[str, str] = {}
+    counts: dict[str, int] = {}
+    parts = []
+    last = 0
+    for kind, value, start, end in find_entities(question, catalog):
+        name = f"{kind}_{counts.get(kind, 0)}"
+        counts[kind] = counts.get(kind, 0) + 1
+        params[name] = value
+        parts.append(question[last:start])
+        parts.append(f" __{name}__ ")
+        last = end
+    parts.append(question[last:])
+    return QuestionTemplate(key=normalize_question("".join(parts)), params=params)
+
+
+def _derived(cypher: str, template: QuestionTemplate) -> bool:
+    """Whether Cypher left after substitution still holds a value derived
+    from one of the template's literals: part of a name, e.g. 'Ridlo' for
+    Ridlo Akbar or '.*NEWS.*', or a bound or part of a date, e.g.
+    '2024-03-31' or the year 2024 for 2024-03-01."""
+    names: set[str] = set()
+    years: set[str] = set()
+    for name, value in template.params.items():
+        if name.startswith("date_"):
+            years.add(value[:4])
+        else:
+            names.update(WORD.findall(value.lower()))
+    for year in years:
+        if re.search(r"(?<!\w)" + year + r"(?!\w)", cypher):
+            return True
+    for _, literal in STRING_LITERAL.findall(cypher):
+        if years and DATE_PATTERN.search(literal):
+            return True
+        if names & set(WORD.findall(literal.lower())):
+            return True
+    return False
+
+
+def parameterize_cypher(cypher: str, template: QuestionTemplate) -> str | None:
+    """Replace the template's literals in generated Cypher with $parameters.
+
+    Returns None when a literal cannot be located unambiguously, or when
+    other literals were derived from it, in which case the Cypher is not
+    safe to reuse for other values.
+    """
+    if len(set(v.lower() for v in template.params.values())) != len(template.params):
+        return None
+    for name, value in template.params.items():
+        pattern = re.compile(r"(['\"])" + re.escape(value) + r"\1", re.IGNORECASE)
+        cypher, replaced = pattern.subn(f"${name}", cypher)
+        if not replaced:
+            return None
+    if _derived(cypher, template):
+        return None
+    return cypher
+
+
+class CypherTemplateCache:
+    """Maps question templates to validated, parameterized Cypher, so
+    repeated question shapes skip the Cypher generation LLM call. The a*
+    methods load the entity catalog without blocking the event loop."""
+
+    def __init__(
+        self,
+        backend,
+        catalog: Callable[[], dict[str, list[str]]] | None = None,
+        acatalog: Callable[[], Awaitable[dict[str, list[str]]]] = aget_entity_catalog,
+    ) -> None:
+        self.backend = backend
+        self.catalog = catalog
+        self.acatalog = acatalog
+
+    def template(self, question: str) -> QuestionTemplate:
+        return question_template(question, self.catalog() if self.catalog else None)
+
+    async def atemplate(self, question: str) -> QuestionTemplate:
+        catalog = self.catalog() if self.catalog else await self.acatalog()
+        return question_template(question, catalog)
+
+    def get(self, template: QuestionTemplate) -> str | None:
+        entry = self.backend.get(template.key)
+        return entry["cypher"] if entry else None
+
+    async def aget(self, template: QuestionTemplate) -> str | None:
+        return self.get(template)
+
+    def put(self, template: QuestionTemplate, cypher: str) -> None:
+        self.backend.set(template.key, {"cypher": cypher, "created_at": time.time()})
+
+    async def aput(self, template: QuestionTemplate, cypher: str) -> None:
+        self.put(template, cypher)
+
+    def delete(self, template: QuestionTemplate) -> None:
+        self.backend.delete(template.key)
+
+    async def adelete(self, template: QuestionTemplate) -> None:
+        self.delete(template)
+
+
+class GraphResultCache:
+    """Maps Cypher plus parameters to result rows for the current ETL data
+    version. The a* methods read the data version without blocking the
+    event loop."""
+
+    def __init__(
+        self,
+        backend,
+        data_version: Callable[[], int] = get_data_version,
+        adata_version: Callable[[], Awaitable[int]] = aget_data_version,
+    ) -> None:
+        self.backend = backend
+        self.data_version = data_version
+        self.adata_version = adata_version
+
+    def _key(self, cypher: str, params: dict[str, Any], data_version: int) -> str:
+        payload = json.dumps([cypher, params, data_version], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> list[dict[str, Any]] | None:
+        entry = self.backend.get(key)
+        return entry["rows"] if entry else None
+
+    def _put(self, key: str, rows: list[dict[str, Any]]) -> None:
+        self.backend.set(key, {"rows": rows, "created_at": time.time()})
+
+    def get(self, cypher: str, params: dict[str, Any]) -> list[dict[str, Any]] | None:
+        return self._get(self._key(cypher, params, self.data_version()))
+
+    async def aget(self, cypher: str, params: dict[str, Any]) -> list[dict[str, Any]] | None:
+        return self._get(self._key(cypher, params, await self.adata_version()))
+
+    def put(self, cypher: str, params: dict[str, Any], rows: list[dict[str, Any]]) -> None:
+        self._put(self._key(cypher, params, self.data_version()), rows)
+
+    async def aput(
+        self, cypher: str, params: dict[str, Any], rows: list[dict[str, Any]]
+    ) -> None:
+        self._put(self._key(cypher, params, await self.adata_version()), rows)
+
+
+@lru_cache(maxsize=1)
+def get_cypher_caches() -> tuple[CypherTemplateCache | None, GraphResultCache | None]:
+    if not CYPHER_CACHE_ENABLED:
+        return None, None
+    return (
+        CypherTemplateCache(
+            InMemoryCacheBackend(CYPHER_CACHE_MAX_ENTRIES, CYPHER_CACHE_TTL)
+        ),
+        GraphResultCache(
+            InMemoryCacheBackend(GRAPH_RESULT_CACHE_MAX_ENTRIES, GRAPH_RESULT_CACHE_TTL)
+        ),
+    )
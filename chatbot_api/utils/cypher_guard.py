@@ -0,0 +1,190 @@
+import asyncio
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any
+
+CYPHER_GUARD_ENABLED = os.getenv("CYPHER_GUARD_ENABLED", "true").lower() == "true"
+# Plans whose largest operator is estimated above this many rows are rejected.
+CYPHER_MAX_ESTIMATED_ROWS = float(os.getenv("CYPHER_MAX_ESTIMATED_ROWS", "1000000"))
+# Server-side timeout of the generated query's transaction, in seconds.
+CYPHER_TX_TIMEOUT = float(os.getenv("CYPHER_TX_TIMEOUT", "10"))
+# LIMIT injected into queries without one, and the cap on larger limits.
+CYPHER_MAX_ROWS = int(os.getenv("CYPHER_MAX_ROWS", "1000"))
+# Rows passed to the QA LLM as they are; the rest only as a summary.
+CYPHER_CONTEXT_ROWS = int(os.getenv("CYPHER_CONTEXT_ROWS", "25"))
+CYPHER_MAX_VALUE_CHARS = int(os.getenv("CYPHER_MAX_VALUE_CHARS", "500"))
+# Properties the QA LLM never needs, dropped from returned rows and nodes.
+CYPHER_STRIP_PROPERTIES = frozenset(
+    os.getenv(
+        "CYPHER_STRIP_PROPERTIES", "body_content,embedding,content_hash,passages_key"
+    ).split(",")
+)
+
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*")
+_WRITE_CLAUSE = re.compile(
+    r"(?<![.\w$])(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV)\b",
+    re.IGNORECASE,
+)
+# Subqueries and index lookups only, other procedures may write or be costly.
+_CALL = re.compile(r"(?<![.\w$])CALL\b(?!\s*(\{|db\.index\.))", re.IGNORECASE)
+_RETURN = re.compile(r"(?<![.\w$])RETURN\b", re.IGNORECASE)
+_UNION = re.compile(r"(?<![.\w$])UNION\b", re.IGNORECASE)
+_LIMIT = re.compile(r"(?<![.\w$])LIMIT\s+(\S+)\s*$", re.IGNORECASE)
+
+
+class CypherGuardError(ValueError):
+    """Generated Cypher was rejected before or while running it."""
+
+
+def _blank_literals(cypher: str) -> str:
+    """The query with strings, quoted names and comments blanked out, at the
+    same offsets, so keywords inside them are not matched."""
+    return _LITERAL.sub(lambda m: " " * len(m.group()), cypher)
+
+
+def _largest_estimate(plan: dict[str, Any]) -> tuple[float, str]:
+    """Largest EstimatedRows of any operator in an EXPLAIN plan tree."""
+    best = (float(plan.get("args", {}).get("EstimatedRows") or 0), plan.get("operatorType", ""))
+    for child in plan.get("children") or []:
+        best = max(best, _largest_estimate(child))
+    return best
+
+
+def _is_timeout(error: Exception) -> bool:
+    return "TransactionTimedOut" in (getattr(error, "code", None) or "")
+
+
+class CypherGuard:
+    """Checks, rewrites and plans LLM-generated Cypher before it runs, and
+    shapes its rows for the QA prompt."""
+
+    def __init__(
+        self,
+        max_estimated_rows: float = CYPHER_MAX_ESTIMATED_ROWS,
+        tx_timeout: float = CYPHER_TX_TIMEOUT,
+        max_rows: int = CYPHER_MAX_ROWS,
+        context_rows: int = CYPHER_CONTEXT_ROWS,
+        max_value_chars: int = CYPHER_MAX_VALUE_CHARS,
+        strip_properties: frozenset[str] = CYPHER_STRIP_PROPERTIES,
+    ) -> None:
+        self.max_estimated_rows = max_estimated_rows
+        self.tx_timeout = tx_timeout
+        self.max_rows = max_rows
+        self.context_rows = context_rows
+        self.max_value_chars = max_value_chars
+        self.strip_properties = strip_properties
+
+    def rewrite(self, cypher: str) -> str:
+        """Reject writes and procedure calls, and bound the rows returned:
+        add a LIMIT to the final RETURN or lower a larger one."""
+        cypher = cypher.strip().rstrip(";").rstrip()
+        blanked = _blank_literals(cypher)
+        write = _WRITE_CLAUSE.search(blanked)
+        if write:
+            raise CypherGuardError(f"Only read queries may run, found {write.group(1).upper()}")
+        if _CALL.search(blanked):
+            raise CypherGuardError("Only CALL subqueries and db.index procedures may run")
+
+        returns = list(_RETURN.finditer(blanked))
+        if not returns or _UNION.search(blanked):
+            return cypher
+        limit = _LIMIT.search(blanked, returns[-1].end())
+        if limit is None:
+            return f"{cypher}\nLIMIT {self.max_rows}"
+        if limit.group(1).isdigit() and int(limit.group(1)) > self.max_rows:
+            return cypher[: limit.start(1)] + str(self.max_rows) + cypher[limit.end(1) :]
+        return cypher
+
+    def check_plan(self, plan: dict[str, Any]) -> None:
+        estimated, operator = _largest_estimate(plan)
+        if estimated > self.max_estimated_rows:
+            raise CypherGuardError(
+                f"Query is too expensive: {operator} is estimated at {estimated:.0f} rows, "
+                f"the limit is {self.max_estimated_rows:.0f}"
+            )
+
+    def run(self, graph: Any, cypher: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+        """Plan the query with EXPLAIN and run it under the transaction
+        timeout, on graphs that support both; others just run it."""
+        if not hasattr(graph, "explain"):
+            return self.shape(graph.query(cypher, params))
+        self.check_plan(graph.explain(cypher, params))
+        try:
+            rows = graph.query(cypher, params, timeout=self.tx_timeout)
+        except Exception as e:
+            if _is_timeout(e):
+                raise CypherGuardError(f"Query ran longer than {self.tx_timeout:.0f}s") from e
+            raise
+        return self.shape(rows)
+
+    async def arun(
+        self, graph: Any, cypher: str, params: dict[str, Any]
+    ) -> list[dict[str, Any]]:
+        if not hasattr(graph, "aexplain"):
+            if hasattr(graph, "aquery"):
+                return self.shape(await graph.aquery(cypher, params))
+            return await asyncio.to_thread(self.run, graph, cypher, params)
+        self.check_plan(await graph.aexplain(cypher, params))
+        try:
+            rows = await graph.aquery(cypher, params, timeout=self.tx_timeout)
+        except Exception as e:
+            if _is_timeout(e):
+                raise CypherGuardError(f"Query ran longer than {self.tx_timeout:.0f}s") from e
+            raise
+        return self.shape(rows)
+
+    def _shape_value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {
+                k: self._shape_value(v)
+                for k, v in value.items()
+                if k not in self.strip_properties
+            }
+        if isinstance(value, list):
+            return [self._shape_value(v) for v in value]
+        if isinstance(value, str) and len(value) > self.max_value_chars:
+            return value[: self.max_value_chars] + "..."
+        return value
+
+    def shape(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Drop stripped properties from rows and the nodes in them, and cut
+        long strings."""
+        return [self._shape_value(row) for row in rows]
+
+    def compact(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """The first context_rows rows, followed by a summary of every
+        column over all rows when there are more."""
+        if len(rows) <= self.context_rows:
+            return rows
+        columns = {}
+        for column in rows[0]:
+            values = [row.get(column) for row in rows if row.get(column) is not None]
+            numbers = [
+                v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)
+            ]
+            if numbers and len(numbers) == len(values):
+                columns[column] = {
+                    "sum": sum(numbers),
+                    "min": min(numbers),
+                    "max": max(numbers),
+                    "avg": round(sum(numbers) / len(numbers), 3),
+                }
+            elif values and all(isinstance(v, (str, bool, int, float)) for v in values):
+                counts = Counter(values)
+                columns[column] = {
+                    "distinct": len(counts),
+                    "most_common": counts.most_common(5),
+                }
+        summary = {
+            "rows": len(rows),
+            "shown": self.context_rows,
+            "columns": columns,
+        }
+        return rows[: self.context_rows] + [{"summary_of_all_rows": summary}]
+
+
+@lru_cache(maxsize=1)
+def get_cypher_guard() -> CypherGuard | None:
+    return CypherGuard() if CYPHER_GUARD_ENABLED else None
@@ -0,0 +1,30 @@
+import json
+import os
+import threading
+import time
+from typing import Any
+
+# JSON lines file of the generated Cypher that ran against the graph, read
+# by the ETL's index advisor. Unset to not log.
+CYPHER_LOG_PATH = os.getenv("CYPHER_LOG_PATH", "")
+
+_lock = threading.Lock()
+
+
+def log_cypher(
+    cypher: str, params: dict[str, Any], rows: int, duration_ms: float
+) -> None:
+    """Append one executed query to the Cypher log, if one is configured."""
+    if not CYPHER_LOG_PATH:
+        return
+    line = json.dumps(
+        {
+            "ts": time.time(),
+            "cypher": cypher,
+            "params": sorted(params),
+            "rows": rows,
+            "duration_ms": round(duration_ms, 3),
+        }
+    )
+    with _lock, open(CYPHER_LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
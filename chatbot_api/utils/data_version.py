@@ -0,0 +1,44 @@
+import os
+import time
+
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+# How long a data version read from the graph is trusted before re-checking.
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "30"))
+
+DATA_VERSION_QUERY = """
+MATCH (s:EtlState {name: 'publisher'})
+RETURN s.data_version AS data_version
+"""
+
+_state = {"data_version": 0, "checked_at": float("-inf")}
+
+
+def _data_version_from(rows: list[dict]) -> int:
+    return rows[0]["data_version"] if rows else 0
+
+
+def get_data_version() -> int:
+    """Version of the graph data, bumped by every ETL run that changed it.
+
+    Caches keyed on this version drop their entries when a new load lands.
+    """
+    if time.monotonic() - _state["checked_at"] > DATA_VERSION_TTL:
+        try:
+            rows = get_connection_manager().query(DATA_VERSION_QUERY)
+            _state["data_version"] = _data_version_from(rows)
+        except Exception:
+            pass  # keep serving the last known version
+        _state["checked_at"] = time.monotonic()
+    return _state["data_version"]
+
+
+async def aget_data_version() -> int:
+    if time.monotonic() - _state["checked_at"] > DATA_VERSION_TTL:
+        try:
+            rows = await get_connection_manager().aquery(DATA_VERSION_QUERY)
+            _state["data_version"] = _data_version_from(rows)
+        except Exception:
+            pass  # keep serving the last known version
+        _state["checked_at"] = time.monotonic()
+    return _state["data_version"]
@@ -0,0 +1,21 @@
+import os
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1536"))
+
+
+def get_embeddings():
+    """Return the embedding model the ETL embedded the articles with.
+
+    Must match the ETL's EMBEDDING_BACKEND/EMBEDDING_MODEL settings,
+    otherwise query vectors are not comparable with the stored ones.
+    """
+    if EMBEDDING_BACKEND == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+
+        return DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION)
+
+    from chatbot_api.utils.chat_models import ResilientOpenAIEmbeddings
+
+    return ResilientOpenAIEmbeddings(model=EMBEDDING_MODEL)
@@ -0,0 +1,83 @@
+import re
+import threading
+
+from chatbot_api.utils.data_version import aget_data_version, get_data_version
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+ENTITIES_QUERY = """
+MATCH (r:Reporter)
+RETURN 'reporter' AS kind, r.reporter_name AS name
+UNION ALL
+MATCH (c:Category)
+RETURN 'category' AS kind, c.category_name AS name
+"""
+
+DATE_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+
+_lock = threading.Lock()
+_catalog = {"data_version": None, "entities": {}}
+
+
+def _entities_from(rows: list[dict]) -> dict[str, list[str]]:
+    entities: dict[str, list[str]] = {"reporter": [], "category": []}
+    for row in rows:
+        if row["name"]:
+            entities[row["kind"]].append(row["name"])
+    return entities
+
+
+def get_entity_catalog() -> dict[str, list[str]]:
+    """Reporter and category names in the graph, reloaded when the ETL
+    data version changes."""
+    data_version = get_data_version()
+    with _lock:
+        if _catalog["data_version"] != data_version:
+            _catalog["entities"] = _entities_from(
+                get_connection_manager().query(ENTITIES_QUERY)
+            )
+            _catalog["data_version"] = data_version
+        return _catalog["entities"]
+
+
+async def aget_entity_catalog() -> dict[str, list[str]]:
+    data_version = await aget_data_version()
+    if _catalog["data_version"] != data_version:
+        entities = _entities_from(await get_connection_manager().aquery(ENTITIES_QUERY))
+        with _lock:
+            _catalog["entities"] = entities
+            _catalog["data_version"] = data_version
+    return _catalog["entities"]
+
+
+def find_entities(
+    text: str, catalog: dict[str, list[str]] | None = None
+) -> list[tuple[str, str, int, int]]:
+    """Find known entity names and ISO dates in text.
+
+    Returns non-overlapping (kind, canonical value, start, end) matches in
+    order of appearance, preferring the longest name at each position.
+    """
+    if catalog is None:
+        catalog = get_entity_catalog()
+
+    lowered = text.lower()
+    candidates = [
+        ("date", m.group(0), m.start(), m.end()) for m in DATE_PATTERN.finditer(text)
+    ]
+    for kind, names in catalog.items():
+        for name in names:
+            pattern = r"(?<!\w)" + re.escape(name.lower()) + r"(?!\w)"
+            for m in re.finditer(pattern, lowered):
+                candidates.append((kind, name, m.start(), m.end()))
+
+    matches: list[tuple[str, str, int, int]] = []
+    taken = [False] * len(text)
+    for kind, value, start, end in sorted(
+        candidates, key=lambda c: (-(c[3] - c[2]), c[2])
+    ):
+        if not any(taken[start:end]):
+            matches.append((kind, value, start, end))
+            for i in range(start, end):
+                taken[i] = True
+
+    return sorted(matches, key=lambda m: m[2])
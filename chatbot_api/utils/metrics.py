@@ -0,0 +1,173 @@
+import threading
+from typing import Iterable
+
+# Seconds, from a cached lookup to a full agent run.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _ValueMetric(_Metric):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return super().render() + [
+            f"{self.name}{_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Counter(_ValueMetric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_ValueMetric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = LATENCY_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: counts per bucket (non-cumulative), sum and count.
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = {k: (list(c), s, n) for k, (c, s, n) in self._values.items()}
+        lines = super().render()
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "rag_request_duration_seconds",
+    "End-to-end latency of answered questions.",
+    ["endpoint", "route"],
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds",
+    "Latency of one pipeline stage (LLM call, graph query, retrieval, tool).",
+    ["stage"],
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "rag_stage_errors_total", "Pipeline stages that raised.", ["stage"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "rag_llm_tokens_total", "LLM tokens used, by stage and prompt/completion.", ["stage", "kind"]
+)
+LLM_TIER_SECONDS = REGISTRY.histogram(
+    "rag_llm_tier_duration_seconds",
+    "Latency of LLM calls by stage and routed model tier (small/large).",
+    ["stage", "tier"],
+)
+LLM_TIER_TOKENS = REGISTRY.counter(
+    "rag_llm_tier_tokens_total",
+    "LLM tokens used, by routed model tier and prompt/completion.",
+    ["tier", "kind"],
+)
+MODEL_ROUTES = REGISTRY.counter(
+    "rag_model_routes_total",
+    "Model tier chosen per routed step, and why.",
+    ["stage", "tier", "reason"],
+)
+STAGE_ROWS = REGISTRY.histogram(
+    "rag_stage_rows",
+    "Rows returned by graph queries and documents returned by retrievers.",
+    ["stage"],
+    buckets=COUNT_BUCKETS,
+)
+NEO4J_POOL = REGISTRY.gauge(
+    "rag_neo4j_pool", "Neo4j connection pool counters, see /health.", ["metric"]
+)
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from chatbot_api.utils.graph_entities import find_entities
+
+# Layout written by the ETL vector export stage (publisher_neo4j_etl/src/
+# vector_export.py): VECTOR_EXPORT_DIR/CURRENT names the version directory
+# holding vectors.npy (unit-length float32 rows) and articles.json.
+VECTOR_EXPORT_DIR = os.getenv("VECTOR_EXPORT_DIR", "vector_export")
+VECTOR_EXPORT_FORMAT_VERSION = 1
+# Seconds between checks of CURRENT for a newer export.
+VECTOR_INDEX_RELOAD_INTERVAL = float(os.getenv("VECTOR_INDEX_RELOAD_INTERVAL", "10"))
+
+CURRENT_POINTER = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+SIDECAR_FILE = "articles.json"
+
+# Text fields in the same order as the Neo4j retrieval query.
+TEXT_FIELDS = ["reporter_name", "category_name", "body_content", "title", "published_at"]
+METADATA_FIELDS = ["article_id", "title", "published_at", "reporter_name", "category_name"]
+
+
+@dataclass
+class _LoadedVectors:
+    version: str
+    vectors: np.ndarray
+    articles: list[dict[str, Any]]
+    categories: np.ndarray
+    reporters: np.ndarray
+    published_at: np.ndarray
+    catalog: dict[str, list[str]]
+
+
+def _load_version(export_dir: str, version: str) -> _LoadedVectors:
+    version_dir = os.path.join(export_dir, version)
+    with open(os.path.join(version_dir, SIDECAR_FILE), encoding="utf-8") as f:
+        sidecar = json.load(f)
+    if sidecar.get("format_version") != VECTOR_EXPORT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported vector export format in {version_dir}")
+
+    articles = sidecar["articles"]
+    # Read-only memory map: the pages are shared by every worker process.
+    vectors = np.load(os.path.join(version_dir, VECTORS_FILE), mmap_mode="r")
+    if len(vectors) != len(articles):
+        raise ValueError(f"Vector export {version_dir} is incomplete")
+
+    def column(field):
+        return np.array([a.get(field) or "" for a in articles], dtype=object)
+
+    categories, reporters = column("category_name"), column("reporter_name")
+    return _LoadedVectors(
+        version=version,
+        vectors=vectors,
+        articles=articles,
+        categories=categories,
+        reporters=reporters,
+        published_at=column("published_at").astype(str),
+        catalog={
+            "reporter": sorted(set(reporters.tolist()) - {""}),
+            "category": sorted(set(categories.tolist()) - {""}),
+        },
+    )
+
+
+class MmapVectorIndex:
+    """In-process cosine top-k search over the exported article vectors,
+    switching to a newer export when the ETL moves the CURRENT pointer."""
+
+    def __init__(
+        self,
+        export_dir: str = VECTOR_EXPORT_DIR,
+        reload_interval: float = VECTOR_INDEX_RELOAD_INTERVAL,
+    ) -> None:
+        self.export_dir = export_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._loaded: _LoadedVectors | None = None
+        self._checked_at = 0.0
+
+    def _current_version(self) -> str | None:
+        try:
+            with open(os.path.join(self.export_dir, CURRENT_POINTER), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def load(self) -> _LoadedVectors:
+        """The loaded export, reloading it at most every reload_interval
+        seconds when CURRENT names a different version. Searches already
+        running keep the previous export until they finish."""
+        loaded = self._loaded
+        if loaded is not None and time.monotonic() - self._checked_at < self.reload_interval:
+            return loaded
+
+        with self._lock:
+            if self._loaded is not None and time.monotonic() - self._checked_at < self.reload_interval:
+                return self._loaded
+            version = self._current_version()
+            if version is None:
+                raise FileNotFoundError(f"No vector export in {self.export_dir}")
+            if self._loaded is None or self._loaded.version != version:
+                self._loaded = _load_version(self.export_dir, version)
+            self._checked_at = time.monotonic()
+            return self._loaded
+
+    def catalog(self) -> dict[str, list[str]]:
+        """Reporter and category names in the loaded export, in the shape
+        find_entities expects."""
+        return self.load().catalog
+
+    def search(
+        self,
+        embedding: list[float],
+        k: int = 12,
+        category: str | None = None,
+        reporter: str | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ) -> list[tuple[dict[str, Any], float]]:
+        """Top-k (article, cosine score) pairs, best first, among articles
+        matching the optional category, reporter and published_at range
+        (inclusive "YYYY-MM-DD" dates)."""
+        loaded = self.load()
+
+        mask = np.ones(len(loaded.articles), dtype=bool)
+        if category is not None:
+            mask &= loaded.categories == category
+        if reporter is not None:
+            mask &= loaded.reporters == reporter
+        if start_date is not None:
+            mask &= loaded.published_at >= start_date
+        if end_date is not None:
+            # published_at may carry a time after the date.
+            mask &= loaded.published_at < end_date + "\uffff"
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if len(candidates) == len(loaded.articles):
+            scores = loaded.vectors @ query
+        else:
+            scores = loaded.vectors[candidates] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if len(candidates) == len(loaded.articles) else candidates[top]
+        return [
+            (loaded.articles[row], float(score))
+            for row, score in zip(rows, scores[top])
+        ]
+
+
+def _document(article: dict[str, Any]) -> Document:
+    return Document(
+        page_content="".join(
+            f"\n{field}: {article.get(field) or ''}" for field in TEXT_FIELDS
+        ),
+        metadata={
+            field: article[field]
+            for field in METADATA_FIELDS
+            if article.get(field) is not None
+        },
+    )
+
+
+class MmapVectorRetriever(BaseRetriever):
+    """Retriever over the memory-mapped article vectors. Returns the same
+    documents as the Neo4j "articles" retrieval query."""
+
+    index: Any
+    """MmapVectorIndex to search."""
+    embeddings: Any
+    """Embeddings matching the model the ETL embedded the articles with."""
+    k: int = 12
+    filters: dict[str, str] = {}
+    """Optional category, reporter, start_date and end_date pre-filters."""
+    auto_filters: bool = False
+    """Also filter on a reporter, category or dates named in the question."""
+
+    def _question_filters(self, query: str) -> dict[str, str]:
+        filters = dict(self.filters)
+        if not self.auto_filters:
+            return filters
+        dates = []
+        for kind, value, _, _ in find_entities(query, self.index.catalog()):
+            if kind == "date":
+                dates.append(value)
+            else:
+                filters.setdefault(kind, value)
+        if dates:
+            filters.setdefault("start_date", min(dates))
+            filters.setdefault("end_date", max(dates))
+        return filters
+
+    def _search(self, query: str, embedding: list[float]) -> List[Document]:
+        return [
+            _document(article)
+            for article, _ in self.index.search(
+                embedding, self.k, **self._question_filters(query)
+            )
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._search(query, self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._search(query, await self.embeddings.aembed_query(query))
+
+
+@lru_cache(maxsize=1)
+def get_mmap_vector_index() -> MmapVectorIndex:
+    return MmapVectorIndex()
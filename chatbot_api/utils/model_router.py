@@ -0,0 +1,109 @@
+import os
+import re
+from functools import lru_cache
+
+from chatbot_api.utils.chat_models import ResilientChatOpenAI
+from chatbot_api.utils.graph_entities import DATE_PATTERN
+from chatbot_api.utils.metrics import MODEL_ROUTES
+from chatbot_api.utils.tracing import TIER_TAG_PREFIX
+
+# Model for the simple steps; routing is off while it is unset and every
+# step uses its DOC_*_MODEL.
+ROUTER_SMALL_MODEL = os.getenv("ROUTER_SMALL_MODEL")
+# Questions scoring at least this on question_complexity go to the large model.
+ROUTER_COMPLEXITY_THRESHOLD = int(os.getenv("ROUTER_COMPLEXITY_THRESHOLD", "2"))
+# Questions longer than this many words score one point more.
+ROUTER_LONG_QUESTION_WORDS = int(os.getenv("ROUTER_LONG_QUESTION_WORDS", "30"))
+# Answers over a larger retrieved context (approximate tokens) use the large model.
+ROUTER_LARGE_CONTEXT_TOKENS = int(os.getenv("ROUTER_LARGE_CONTEXT_TOKENS", "3000"))
+
+# The large model of each routed step, by the tag its chat model carries.
+LARGE_MODELS = {
+    "agent": os.getenv("DOC_AGENT_MODEL"),
+    "cypher_generation": os.getenv("DOC_CYPHER_MODEL"),
+    "graph_qa": os.getenv("DOC_QA_MODEL"),
+    "summary_qa": os.getenv("DOC_QA_MODEL"),
+}
+
+# Comparisons, trends and explanations, in English and Indonesian.
+_ANALYTICAL = re.compile(
+    r"\b(compar\w*|versus|vs|trend\w*|growth|grow\w*|increas\w*|decreas\w*|"
+    r"difference|differ\w*|why|correlat\w*|breakdown|each|"
+    r"banding\w*|perbandingan|dibanding\w*|tren|pertumbuhan|naik|turun|kenaikan|"
+    r"penurunan|selisih|mengapa|kenapa|setiap|masing-masing)\b",
+    re.IGNORECASE,
+)
+_CONJUNCTION = re.compile(r"\b(and|or|dan|atau|serta)\b|,", re.IGNORECASE)
+
+
+def question_complexity(question: str, long_words: int = ROUTER_LONG_QUESTION_WORDS) -> int:
+    """Cheap score of how hard a question is: 2 for comparisons, trends or
+    explanations, and 1 each for several dates, several parts joined by
+    and/or, and a long question."""
+    score = 2 if _ANALYTICAL.search(question) else 0
+    if len(DATE_PATTERN.findall(question)) >= 2:
+        score += 1
+    if _CONJUNCTION.search(question):
+        score += 1
+    if len(question.split()) > long_words:
+        score += 1
+    return score
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, close enough to route on without a tokenizer."""
+    return len(text) // 4
+
+
+class ModelRouter:
+    """Sends each step to the small or the large model: by question
+    complexity, by the size of the retrieved context, and to the large one
+    when a cheap attempt failed validation. Every choice is counted in
+    rag_model_routes_total and the chat models are tagged with their tier
+    for the per-tier latency and token metrics."""
+
+    def __init__(
+        self,
+        small_model: str,
+        large_models: dict[str, str | None] = LARGE_MODELS,
+        complexity_threshold: int = ROUTER_COMPLEXITY_THRESHOLD,
+        large_context_tokens: int = ROUTER_LARGE_CONTEXT_TOKENS,
+    ) -> None:
+        self.small_model = small_model
+        self.large_models = large_models
+        self.complexity_threshold = complexity_threshold
+        self.large_context_tokens = large_context_tokens
+        self._models: dict[tuple[str, str], ResilientChatOpenAI] = {}
+
+    def _route(self, stage: str, tier: str, reason: str) -> str:
+        MODEL_ROUTES.inc(stage=stage, tier=tier, reason=reason)
+        return tier
+
+    def question_tier(self, stage: str, question: str) -> str:
+        if question_complexity(question) >= self.complexity_threshold:
+            return self._route(stage, "large", "complex")
+        return self._route(stage, "small", "simple")
+
+    def context_tier(self, stage: str, question: str, context: str) -> str:
+        """Tier of an answer over retrieved context: large for complex
+        questions and for contexts over large_context_tokens."""
+        if estimate_tokens(context) > self.large_context_tokens:
+            return self._route(stage, "large", "large_context")
+        return self.question_tier(stage, question)
+
+    def escalate(self, stage: str, reason: str) -> str:
+        return self._route(stage, "large", f"escalated_{reason}")
+
+    def chat_model(self, stage: str, tier: str) -> ResilientChatOpenAI:
+        key = (stage, tier)
+        if key not in self._models:
+            model = self.small_model if tier == "small" else self.large_models.get(stage)
+            self._models[key] = ResilientChatOpenAI(
+                model=model, temperature=0, tags=[stage, TIER_TAG_PREFIX + tier]
+            )
+        return self._models[key]
+
+
+@lru_cache(maxsize=1)
+def get_model_router() -> ModelRouter | None:
+    return ModelRouter(ROUTER_SMALL_MODEL) if ROUTER_SMALL_MODEL else None
@@ -0,0 +1,328 @@
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any
+
+from langchain_community.graphs import Neo4jGraph
+from langchain_community.graphs.neo4j_graph import value_sanitize
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import CypherSyntaxError
+
+from chatbot_api.utils.resilience import acall_with_retry, call_with_retry
+from chatbot_api.utils.tracing import timed_stage
+
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+
+
+class PoolMetrics:
+    """Counters for connection usage, shared by the sync and async paths."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.max_in_use = 0
+        self.acquisitions = 0
+        self.acquisition_timeouts = 0
+        self.errors = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def acquired(self, wait_seconds: float) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.acquisitions += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def released(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def failed(self, timed_out: bool) -> None:
+        with self._lock:
+            self.errors += 1
+            if timed_out:
+                self.acquisition_timeouts += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "acquisitions": self.acquisitions,
+                "acquisition_timeouts": self.acquisition_timeouts,
+                "errors": self.errors,
+                "wait_seconds_avg": self.wait_seconds_total / self.acquisitions
+                if self.acquisitions
+                else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+class Neo4jConnectionManager:
+    """Process-wide Neo4j drivers with one bounded connection pool each
+    for the sync and async paths.
+
+    All chains and tools go through this manager instead of opening their
+    own drivers, so connections are reused across requests.
+    """
+
+    def __init__(
+        self,
+        uri: str | None = NEO4J_URI,
+        username: str | None = NEO4J_USERNAME,
+        password: str | None = NEO4J_PASSWORD,
+        database: str = NEO4J_DATABASE,
+        max_pool_size: int = NEO4J_MAX_POOL_SIZE,
+        acquisition_timeout: float = NEO4J_ACQUISITION_TIMEOUT,
+    ) -> None:
+        self.uri = uri
+        self.username = username
+        self.password = password
+        self.database = database
+        self.max_pool_size = max_pool_size
+        self.acquisition_timeout = acquisition_timeout
+        self.metrics = PoolMetrics()
+        self._lock = threading.Lock()
+        self._driver = None
+        self._async_driver = None
+
+    def _driver_config(self) -> dict[str, Any]:
+        return {
+            "auth": (self.username, self.password),
+            "max_connection_pool_size": self.max_pool_size,
+            "connection_acquisition_timeout": self.acquisition_timeout,
+        }
+
+    @property
+    def driver(self):
+        with self._lock:
+            if self._driver is None:
+                self._driver = GraphDatabase.driver(self.uri, **self._driver_config())
+            return self._driver
+
+    @property
+    def async_driver(self):
+        with self._lock:
+            if self._async_driver is None:
+                self._async_driver = AsyncGraphDatabase.driver(
+                    self.uri, **self._driver_config()
+                )
+            return self._async_driver
+
+    @contextmanager
+    def _transaction(self, timeout: float | None):
+        start = time.perf_counter()
+        with self.driver.session(database=self.database) as session:
+            try:
+                tx = session.begin_transaction(timeout=timeout)
+            except Exception:
+                waited = time.perf_counter() - start
+                self.metrics.failed(timed_out=waited >= self.acquisition_timeout)
+                raise
+            self.metrics.acquired(time.perf_counter() - start)
+            try:
+                with tx:
+                    yield tx
+            finally:
+                self.metrics.released()
+
+    @asynccontextmanager
+    async def _async_transaction(self, timeout: float | None):
+        start = time.perf_counter()
+        async with self.async_driver.session(database=self.database) as session:
+            try:
+                tx = await session.begin_transaction(timeout=timeout)
+            except Exception:
+                waited = time.perf_counter() - start
+                self.metrics.failed(timed_out=waited >= self.acquisition_timeout)
+                raise
+            self.metrics.acquired(time.perf_counter() - start)
+            try:
+                async with tx:
+                    yield tx
+            finally:
+                self.metrics.released()
+
+    def query(
+        self,
+        query: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Run a query on a pooled connection and return the records as dicts.
+        Transient failures are retried behind the "neo4j" circuit breaker."""
+        return call_with_retry("neo4j", self._query_once, query, params, timeout)
+
+    async def aquery(
+        self,
+        query: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Async version of query, on the async driver's pool."""
+        return await acall_with_retry("neo4j", self._aquery_once, query, params, timeout)
+
+    def _query_once(
+        self, query: str, params: dict[str, Any] | None, timeout: float | None
+    ) -> list[dict[str, Any]]:
+        try:
+            with timed_stage("neo4j_query") as span, self._transaction(timeout) as tx:
+                data = [r.data() for r in tx.run(query, params or {})]
+                tx.commit()
+                span.rows = len(data)
+                return data
+        except CypherSyntaxError as e:
+            raise ValueError(f"Generated Cypher Statement is not valid\n{e}")
+
+    async def _aquery_once(
+        self, query: str, params: dict[str, Any] | None, timeout: float | None
+    ) -> list[dict[str, Any]]:
+        try:
+            with timed_stage("neo4j_query") as span:
+                async with self._async_transaction(timeout) as tx:
+                    result = await tx.run(query, params or {})
+                    data = await result.data()
+                    await tx.commit()
+                    span.rows = len(data)
+                    return data
+        except CypherSyntaxError as e:
+            raise ValueError(f"Generated Cypher Statement is not valid\n{e}")
+
+    def explain(
+        self,
+        query: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> dict[str, Any]:
+        """Plan a query with EXPLAIN, without running it, and return the
+        plan tree (operatorType, arguments with EstimatedRows, children)."""
+        return call_with_retry("neo4j", self._explain_once, query, params, timeout)
+
+    async def aexplain(
+        self,
+        query: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> dict[str, Any]:
+        return await acall_with_retry("neo4j", self._aexplain_once, query, params, timeout)
+
+    def _explain_once(
+        self, query: str, params: dict[str, Any] | None, timeout: float | None
+    ) -> dict[str, Any]:
+        try:
+            with timed_stage("neo4j_explain"), self._transaction(timeout) as tx:
+                summary = tx.run(f"EXPLAIN {query}", params or {}).consume()
+                tx.commit()
+                return summary.plan or {}
+        except CypherSyntaxError as e:
+            raise ValueError(f"Generated Cypher Statement is not valid\n{e}")
+
+    async def _aexplain_once(
+        self, query: str, params: dict[str, Any] | None, timeout: float | None
+    ) -> dict[str, Any]:
+        try:
+            with timed_stage("neo4j_explain"):
+                async with self._async_transaction(timeout) as tx:
+                    result = await tx.run(f"EXPLAIN {query}", params or {})
+                    summary = await result.consume()
+                    await tx.commit()
+                    return summary.plan or {}
+        except CypherSyntaxError as e:
+            raise ValueError(f"Generated Cypher Statement is not valid\n{e}")
+
+    def health_check(self) -> dict[str, Any]:
+        """Check connectivity with a trivial query and report its latency."""
+        start = time.perf_counter()
+        try:
+            # Straight to Neo4j, so the check also works while the circuit is open.
+            self._query_once("RETURN 1 AS ok", None, timeout=5)
+        except Exception as e:
+            return {"healthy": False, "error": str(e)}
+        return {"healthy": True, "latency_seconds": time.perf_counter() - start}
+
+    async def ahealth_check(self) -> dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            await self._aquery_once("RETURN 1 AS ok", None, timeout=5)
+        except Exception as e:
+            return {"healthy": False, "error": str(e)}
+        return {"healthy": True, "latency_seconds": time.perf_counter() - start}
+
+    def pool_metrics(self) -> dict[str, Any]:
+        return {"max_pool_size": self.max_pool_size, **self.metrics.snapshot()}
+
+    def adopt(self, client: Any) -> Any:
+        """Make a LangChain Neo4j client (Neo4jGraph, Neo4jVector) use the
+        shared driver instead of the one it created for itself."""
+        if client._driver is not self.driver:
+            client._driver.close()
+            client._driver = self.driver
+        return client
+
+    def close(self) -> None:
+        with self._lock:
+            if self._driver is not None:
+                self._driver.close()
+                self._driver = None
+
+    async def aclose(self) -> None:
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
+
+
+class PooledNeo4jGraph(Neo4jGraph):
+    """Neo4jGraph whose queries run through the connection manager."""
+
+    def __init__(self, manager: Neo4jConnectionManager, **kwargs: Any) -> None:
+        super().__init__(
+            url=manager.uri,
+            username=manager.username,
+            password=manager.password,
+            database=manager.database,
+            refresh_schema=False,
+            **kwargs,
+        )
+        self._manager = manager
+        manager.adopt(self)
+
+    def query(
+        self, query: str, params: dict = {}, timeout: float | None = None
+    ) -> list[dict[str, Any]]:
+        data = self._manager.query(query, params, timeout=timeout or self.timeout)
+        if self.sanitize:
+            data = [value_sanitize(el) for el in data]
+        return data
+
+    async def aquery(
+        self, query: str, params: dict = {}, timeout: float | None = None
+    ) -> list[dict[str, Any]]:
+        data = await self._manager.aquery(query, params, timeout=timeout or self.timeout)
+        if self.sanitize:
+            data = [value_sanitize(el) for el in data]
+        return data
+
+    def explain(self, query: str, params: dict = {}) -> dict[str, Any]:
+        return self._manager.explain(query, params, timeout=self.timeout)
+
+    async def aexplain(self, query: str, params: dict = {}) -> dict[str, Any]:
+        return await self._manager.aexplain(query, params, timeout=self.timeout)
+
+
+@lru_cache(maxsize=1)
+def get_connection_manager() -> Neo4jConnectionManager:
+    return Neo4jConnectionManager()
+
+
+@lru_cache(maxsize=1)
+def get_graph() -> PooledNeo4jGraph:
+    return PooledNeo4jGraph(get_connection_manager())
@@ -0,0 +1,41 @@
+from typing import List
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+VECTOR_SEARCH_QUERY = """
+CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node, score
+"""
+
+
+class AsyncNeo4jVectorRetriever(VectorStoreRetriever):
+    """Retriever over a Neo4jVector store whose async path embeds the query
+    and runs the vector search on the async driver, instead of running the
+    sync search in a worker thread."""
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.search_type != "similarity":
+            return await super()._aget_relevant_documents(query, run_manager=run_manager)
+
+        store = self.vectorstore
+        embedding = await store.embedding.aembed_query(query)
+        rows = await get_connection_manager().aquery(
+            VECTOR_SEARCH_QUERY + store.retrieval_query,
+            {
+                "index": store.index_name,
+                "k": self.search_kwargs.get("k", 4),
+                "embedding": embedding,
+            },
+        )
+        return [
+            Document(
+                page_content=row["text"],
+                metadata={k: v for k, v in (row["metadata"] or {}).items() if v is not None},
+            )
+            for row in rows
+        ]
@@ -0,0 +1,147 @@
+import os
+from functools import lru_cache
+from typing import Any, Callable, List
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from chatbot_api.utils.neo4j_connection import get_connection_manager
+
+SUMMARY_CONTEXT_TOKENS = int(os.getenv("SUMMARY_CONTEXT_TOKENS", "1500"))
+SUMMARY_PASSAGE_CANDIDATES = int(os.getenv("SUMMARY_PASSAGE_CANDIDATES", "40"))
+SUMMARY_MAX_PASSAGES_PER_ARTICLE = int(os.getenv("SUMMARY_MAX_PASSAGES_PER_ARTICLE", "3"))
+
+# Passages written by the ETL passage stage, with their parent article.
+PASSAGE_SEARCH_QUERY = """
+CALL db.index.vector.queryNodes('passages', $k, $embedding) YIELD node, score
+MATCH (node)-[:PART_OF]->(article:Articles)
+OPTIONAL MATCH (reporter:Reporter)-[:WROTE]->(article)
+OPTIONAL MATCH (category:Category)-[:CONTAIN]->(article)
+RETURN node.text AS text,
+    node.seq AS seq,
+    score,
+    article.article_id AS article_id,
+    article.title AS title,
+    article.published_at AS published_at,
+    reporter.reporter_name AS reporter_name,
+    category.category_name AS category_name
+ORDER BY score DESC
+"""
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str | None):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def token_counter(model: str | None = None) -> Callable[[str], int]:
+    encoding = _encoding(model)
+    return lambda text: len(encoding.encode(text))
+
+
+def _article_header(passage: dict[str, Any]) -> str:
+    return (
+        f"\ntitle: {passage['title'] or ''}"
+        f"\nreporter_name: {passage['reporter_name'] or ''}"
+        f"\ncategory_name: {passage['category_name'] or ''}"
+        f"\npublished_at: {passage['published_at'] or ''}"
+        "\nbody_content: "
+    )
+
+
+def build_passage_context(
+    passages: list[dict[str, Any]],
+    count_tokens: Callable[[str], int],
+    token_budget: int = SUMMARY_CONTEXT_TOKENS,
+    max_per_article: int = SUMMARY_MAX_PASSAGES_PER_ARTICLE,
+) -> list[Document]:
+    """Pick the best-scoring passages that fit in token_budget, at most
+    max_per_article per article, and merge each article's picks into one
+    document (header once, passages in article order).
+
+    Documents are ordered by the score of their best passage.
+    """
+    picked: dict[Any, dict[str, Any]] = {}
+    used = 0
+    for passage in sorted(passages, key=lambda p: p["score"], reverse=True):
+        article = picked.get(passage["article_id"])
+        if article is not None and len(article["passages"]) >= max_per_article:
+            continue
+
+        cost = count_tokens(passage["text"])
+        header = None
+        if article is None:
+            header = _article_header(passage)
+            cost += count_tokens(header)
+        if used + cost > token_budget:
+            continue
+
+        used += cost
+        if article is None:
+            article = picked[passage["article_id"]] = {
+                "header": header,
+                "passage": passage,
+                "passages": [],
+            }
+        article["passages"].append(passage)
+
+    documents = []
+    for article in picked.values():
+        first = article["passage"]
+        documents.append(
+            Document(
+                page_content=article["header"]
+                + "\n...\n".join(
+                    p["text"] for p in sorted(article["passages"], key=lambda p: p["seq"])
+                ),
+                metadata={
+                    key: first[key]
+                    for key in ("article_id", "title", "published_at", "reporter_name", "category_name")
+                    if first[key] is not None
+                },
+            )
+        )
+    return documents
+
+
+class PassageContextRetriever(BaseRetriever):
+    """Retriever that searches the "passages" vector index and returns a
+    token-budgeted context, one document per article."""
+
+    embeddings: Any
+    count_tokens: Callable[[str], int]
+    candidates: int = SUMMARY_PASSAGE_CANDIDATES
+    token_budget: int = SUMMARY_CONTEXT_TOKENS
+    max_per_article: int = SUMMARY_MAX_PASSAGES_PER_ARTICLE
+
+    def _build(self, rows: list[dict[str, Any]]) -> List[Document]:
+        return build_passage_context(
+            rows, self.count_tokens, self.token_budget, self.max_per_article
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        rows = get_connection_manager().query(
+            PASSAGE_SEARCH_QUERY,
+            {"k": self.candidates, "embedding": self.embeddings.embed_query(query)},
+        )
+        return self._build(rows)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        rows = await get_connection_manager().aquery(
+            PASSAGE_SEARCH_QUERY,
+            {"k": self.candidates, "embedding": await self.embeddings.aembed_query(query)},
+        )
+        return self._build(rows)
@@ -0,0 +1,293 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+from chatbot_api.utils.metrics import REGISTRY
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+# Retries allowed per first attempt across all dependencies, plus a floor
+# per second so a quiet process can still retry.
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+# Consecutive transient failures that open a dependency's circuit, and how
+# long it stays open before one trial call is let through.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRIES = REGISTRY.counter(
+    "rag_retries_total",
+    "Retry decisions after a transient failure (retried, budget_exhausted, gave_up).",
+    ["dependency", "outcome"],
+)
+CIRCUIT_STATE = REGISTRY.gauge(
+    "rag_circuit_state", "Circuit state per dependency: 0 closed, 1 half open, 2 open.", ["dependency"]
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "rag_circuit_rejections_total", "Calls failed fast by an open circuit.", ["dependency"]
+)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """A dependency's circuit is open, the call was not attempted."""
+
+    def __init__(self, dependency: str, retry_after: float) -> None:
+        super().__init__(f"{dependency} is unavailable, retry in {retry_after:.0f}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class RetryBudget:
+    """Token bucket shared by all retries: each first attempt deposits
+    `ratio` tokens, each retry withdraws one. Keeps retries a fraction of
+    the traffic, so an outage does not multiply the load on it."""
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+        capacity: float = 10.0,
+    ) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._refilled_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._refilled_at) * self.min_per_second
+        )
+        self._refilled_at = now
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive transient failures and
+    fails calls fast until `reset_seconds` have passed. Then a single trial
+    call is let through: its success closes the circuit, its failure opens
+    it again."""
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(
+        self,
+        dependency: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+    ) -> None:
+        self.dependency = dependency
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        CIRCUIT_STATE.set(self.CLOSED, dependency=dependency)
+
+    def _set_state(self, state: int) -> None:
+        self._state = state
+        CIRCUIT_STATE.set(state, dependency=self.dependency)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            waited = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and waited >= self.reset_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            CIRCUIT_REJECTIONS.inc(dependency=self.dependency)
+            raise CircuitOpenError(self.dependency, max(self.reset_seconds - waited, 1))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """End a call that neither proved nor disproved the dependency's
+        health, e.g. one rejected for a bad query."""
+        with self._lock:
+            self._trial_running = False
+
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": ["closed", "half_open", "open"][self._state],
+                "consecutive_failures": self._failures,
+            }
+
+
+def _transient_neo4j(error: BaseException) -> bool:
+    from neo4j.exceptions import DriverError, Neo4jError
+
+    if isinstance(error, (Neo4jError, DriverError)):
+        return error.is_retryable()
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _transient_openai(error: BaseException) -> bool:
+    import openai
+
+    return isinstance(
+        error,
+        (
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+            ConnectionError,
+            TimeoutError,
+        ),
+    )
+
+
+# Dependencies with their circuit and the failures worth retrying; other
+# errors (bad Cypher, invalid requests) are the caller's and fail at once.
+TRANSIENT_ERRORS: dict[str, Callable[[BaseException], bool]] = {
+    "neo4j": _transient_neo4j,
+    "openai": _transient_openai,
+}
+BREAKERS = {dependency: CircuitBreaker(dependency) for dependency in TRANSIENT_ERRORS}
+retry_budget = RetryBudget()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt`."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+def _should_retry(dependency: str, error: BaseException, attempt: int) -> bool:
+    """Record a failed attempt on the circuit and decide whether to retry it."""
+    breaker = BREAKERS[dependency]
+    if not TRANSIENT_ERRORS[dependency](error):
+        breaker.release()
+        return False
+    breaker.record_failure()
+    if attempt >= RETRY_MAX_ATTEMPTS:
+        RETRIES.inc(dependency=dependency, outcome="gave_up")
+        return False
+    if not retry_budget.try_withdraw():
+        RETRIES.inc(dependency=dependency, outcome="budget_exhausted")
+        return False
+    RETRIES.inc(dependency=dependency, outcome="retried")
+    return True
+
+
+def call_with_retry(dependency: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call func behind the dependency's circuit, retrying transient
+    failures with backoff while the retry budget allows."""
+    retry_budget.deposit()
+    attempt = 1
+    while True:
+        BREAKERS[dependency].before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not _should_retry(dependency, e, attempt):
+                raise
+        except BaseException:
+            # Cancelled: says nothing about the dependency.
+            BREAKERS[dependency].release()
+            raise
+        else:
+            BREAKERS[dependency].record_success()
+            return result
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+async def acall_with_retry(
+    dependency: str, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any
+) -> T:
+    """Async version of call_with_retry."""
+    retry_budget.deposit()
+    attempt = 1
+    while True:
+        BREAKERS[dependency].before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            if not _should_retry(dependency, e, attempt):
+                raise
+        except BaseException:
+            # Cancelled: says nothing about the dependency.
+            BREAKERS[dependency].release()
+            raise
+        else:
+            BREAKERS[dependency].record_success()
+            return result
+        await asyncio.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+async def astream_with_retry(
+    dependency: str, stream: Callable[[], AsyncIterator[T]]
+) -> AsyncIterator[T]:
+    """Iterate stream() behind the dependency's circuit. A failure before
+    the first item starts a new stream; once items were passed on, the
+    failure is raised, as the consumer already used them."""
+    retry_budget.deposit()
+    attempt = 1
+    while True:
+        BREAKERS[dependency].before_call()
+        started = False
+        try:
+            async for item in stream():
+                started = True
+                yield item
+        except Exception as e:
+            if started:
+                if TRANSIENT_ERRORS[dependency](e):
+                    BREAKERS[dependency].record_failure()
+                else:
+                    BREAKERS[dependency].release()
+                raise
+            if not _should_retry(dependency, e, attempt):
+                raise
+        except BaseException:
+            BREAKERS[dependency].release()
+            raise
+        else:
+            BREAKERS[dependency].record_success()
+            return
+        await asyncio.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+def circuit_status() -> dict[str, dict[str, Any]]:
+    return {dependency: breaker.status() for dependency, breaker in BREAKERS.items()}
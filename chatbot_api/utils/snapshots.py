@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from typing import Any
+
+from langchain_core.load import dumpd, load
+
+# Local artifacts the API starts from instead of calling LangChain hub and
+# Neo4j at import time.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", ".snapshots")
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+
+def _snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.json")
+
+
+def load_snapshot(name: str) -> dict[str, Any] | None:
+    """Read a snapshot, or None if it is missing or in an old format."""
+    try:
+        with open(_snapshot_path(name), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return snapshot
+
+
+def save_snapshot(name: str, payload: Any, **metadata: Any) -> None:
+    """Atomically write a snapshot next to its format version and metadata."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "created_at": time.time(),
+                **metadata,
+                "payload": payload,
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+
+
+def load_agent_prompt(prompt_name: str):
+    """A LangChain hub prompt from its snapshot, pulled from the hub (and
+    snapshotted) only when no snapshot of that prompt exists yet."""
+    snapshot_name = "prompt-" + prompt_name.replace("/", "--")
+    snapshot = load_snapshot(snapshot_name)
+    if snapshot is not None:
+        return load(snapshot["payload"])
+
+    from langchain import hub
+
+    prompt = hub.pull(prompt_name)
+    save_snapshot(snapshot_name, dumpd(prompt), prompt_name=prompt_name)
+    return prompt
+
+
+def refresh_schema_snapshot(graph, data_version: int | None = None) -> None:
+    """Read the schema from Neo4j and store it as the schema snapshot."""
+    graph.refresh_schema()
+    save_snapshot(
+        "graph_schema",
+        {"schema": graph.schema, "structured_schema": graph.structured_schema},
+        data_version=data_version,
+    )
+
+
+def apply_schema_snapshot(graph) -> dict[str, Any] | None:
+    """Set the graph schema from its snapshot, falling back to reading it
+    from Neo4j when there is no snapshot yet. Returns the snapshot used."""
+    snapshot = load_snapshot("graph_schema")
+    if snapshot is None:
+        refresh_schema_snapshot(graph)
+        return load_snapshot("graph_schema")
+
+    graph.schema = snapshot["payload"]["schema"]
+    graph.structured_schema = snapshot["payload"]["structured_schema"]
+    return snapshot
@@ -0,0 +1,69 @@
+import json
+from typing import Any, AsyncIterator
+
+# Longest tool output forwarded in a tool_end event.
+MAX_EVENT_OUTPUT_CHARS = 2000
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _documents(output: Any) -> list:
+    if isinstance(output, dict):
+        return output.get("documents", [])
+    return output or []
+
+
+async def stream_agent_events(
+    agent_executor, inputs: dict[str, Any], config: dict[str, Any] | None = None
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """Translate the agent's LangChain event stream into the events the
+    frontend renders, as (event, data) pairs:
+
+    - tool_start / tool_end: tool selection, its input and output
+    - cypher: Cypher (and parameters) about to run against the graph
+    - graph_results: how many rows the graph query returned
+    - retrieval: articles returned by the vector search
+    - token: a piece of the agent's final answer
+    - final: the complete response, shaped like DocsQueryOutput
+    """
+    async for event in agent_executor.astream_events(inputs, config=config, version="v1"):
+        kind = event["event"]
+        name = event.get("name")
+        data = event.get("data", {})
+
+        if kind == "on_tool_start":
+            yield "tool_start", {"tool": name, "input": data.get("input")}
+        elif kind == "on_tool_end":
+            yield "tool_end", {
+                "tool": name,
+                "output": str(data.get("output"))[:MAX_EVENT_OUTPUT_CHARS],
+            }
+        elif kind == "on_chain_start" and name == "graph_query" and data.get("input"):
+            yield "cypher", data["input"]
+        elif kind == "on_chain_end" and name == "graph_query":
+            yield "graph_results", {
+                "query": (data.get("input") or {}).get("query"),
+                "rows": len(data.get("output") or []),
+            }
+        elif kind == "on_retriever_end":
+            yield "retrieval", {
+                "documents": [
+                    doc.metadata for doc in _documents(data.get("output"))
+                ]
+            }
+        elif kind == "on_chat_model_stream" and "agent" in event.get("tags", []):
+            content = data["chunk"].content
+            if content:
+                yield "token", {"text": content}
+        elif kind == "on_chain_end" and name == "AgentExecutor":
+            output = data["output"]
+            yield "final", {
+                "input": output["input"],
+                "output": output["output"],
+                "intermediate_steps": [
+                    str(s) for s in output.get("intermediate_steps", [])
+                ],
+            }
@@ -0,0 +1,253 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from chatbot_api.utils.metrics import (
+    LLM_TIER_SECONDS,
+    LLM_TIER_TOKENS,
+    LLM_TOKENS,
+    REQUEST_SECONDS,
+    STAGE_ERRORS,
+    STAGE_ROWS,
+    STAGE_SECONDS,
+)
+
+# Longest Cypher text kept in a span.
+MAX_SPAN_CYPHER_CHARS = 2000
+
+# LLM stages by the tags the chains give their chat models.
+LLM_STAGE_TAGS = {
+    "agent": "agent_llm",
+    "conversation_summary": "conversation_summary_llm",
+    "cypher_generation": "cypher_llm",
+    "graph_qa": "graph_qa_llm",
+    "summary_qa": "summary_qa_llm",
+}
+# Tag prefix of chat models the model router built for a tier.
+TIER_TAG_PREFIX = "tier:"
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """One timed stage of a request."""
+
+    stage: str
+    duration_ms: float
+    name: str | None = None
+    tier: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    rows: int | None = None
+    cypher: str | None = None
+    error: str | None = None
+
+
+@dataclass
+class RequestTrace:
+    """Spans recorded while answering one question. Pass `callbacks` to
+    the agent or chain to trace its LLM calls, queries and tools."""
+
+    endpoint: str
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[Span] = field(default_factory=list)
+    route: str | None = None
+    callbacks: list[BaseCallbackHandler] = field(default_factory=lambda: [StageTracer()])
+
+    def timings(self) -> dict[str, Any]:
+        """Per-request breakdown, shaped like RequestTimings."""
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages": [asdict(span) for span in self.spans],
+        }
+
+
+_current_trace: ContextVar[RequestTrace | None] = ContextVar("request_trace", default=None)
+
+
+def current_callbacks() -> list[BaseCallbackHandler] | None:
+    """Callbacks tracing into the current request, if one is traced."""
+    trace = _current_trace.get()
+    return trace.callbacks if trace is not None else None
+
+
+def record_span(span: Span) -> None:
+    """Add a finished stage to the metrics, the trace log and the current
+    request's trace, if any."""
+    STAGE_SECONDS.observe(span.duration_ms / 1000, stage=span.stage)
+    if span.error is not None:
+        STAGE_ERRORS.inc(stage=span.stage)
+    if span.rows is not None:
+        STAGE_ROWS.observe(span.rows, stage=span.stage)
+    if span.prompt_tokens:
+        LLM_TOKENS.inc(span.prompt_tokens, stage=span.stage, kind="prompt")
+    if span.completion_tokens:
+        LLM_TOKENS.inc(span.completion_tokens, stage=span.stage, kind="completion")
+    if span.tier is not None:
+        LLM_TIER_SECONDS.observe(span.duration_ms / 1000, stage=span.stage, tier=span.tier)
+        if span.prompt_tokens:
+            LLM_TIER_TOKENS.inc(span.prompt_tokens, tier=span.tier, kind="prompt")
+        if span.completion_tokens:
+            LLM_TIER_TOKENS.inc(span.completion_tokens, tier=span.tier, kind="completion")
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append(span)
+    if LOGGER.isEnabledFor(logging.INFO):
+        endpoint = trace.endpoint if trace is not None else None
+        LOGGER.info(json.dumps({"event": "stage", "endpoint": endpoint, **asdict(span)}))
+
+
+@contextmanager
+def timed_stage(stage: str, name: str | None = None) -> Iterator[Span]:
+    """Time the block as one stage. The block may set rows or cypher on the
+    yielded span."""
+    span = Span(stage=stage, duration_ms=0.0, name=name)
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        span.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        record_span(span)
+
+
+@contextmanager
+def request_trace(endpoint: str) -> Iterator[RequestTrace]:
+    """Collect the spans of one request and record its latency under the
+    route that answered it."""
+    trace = RequestTrace(endpoint=endpoint)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A streaming response closed from another context.
+            pass
+        seconds = time.perf_counter() - trace.started
+        REQUEST_SECONDS.observe(seconds, endpoint=endpoint, route=trace.route or "error")
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info(
+                json.dumps(
+                    {
+                        "event": "request",
+                        "endpoint": endpoint,
+                        "route": trace.route,
+                        "duration_ms": round(seconds * 1000, 3),
+                        "stages": len(trace.spans),
+                    }
+                )
+            )
+
+
+def _llm_stage(tags: list[str] | None) -> str:
+    for tag in tags or []:
+        if tag in LLM_STAGE_TAGS:
+            return LLM_STAGE_TAGS[tag]
+    return "llm"
+
+
+def _llm_tier(tags: list[str] | None) -> str | None:
+    for tag in tags or []:
+        if tag.startswith(TIER_TAG_PREFIX):
+            return tag[len(TIER_TAG_PREFIX) :]
+    return None
+
+
+def _llm_span(tags: list[str] | None, name: str | None) -> Span:
+    return Span(stage=_llm_stage(tags), duration_ms=0.0, name=name, tier=_llm_tier(tags))
+
+
+class StageTracer(BaseCallbackHandler):
+    """Callback handler turning LLM calls, graph queries, retrievals and
+    tool runs of the chains and the agent into spans."""
+
+    # Run in the caller's context, where the request trace is set, instead
+    # of a worker thread.
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._runs: dict[UUID, tuple[Span, float]] = {}
+
+    def _start(self, run_id: UUID, span: Span) -> None:
+        self._runs[run_id] = (span, time.perf_counter())
+
+    def _end(self, run_id: UUID, error: BaseException | None = None, **fields: Any) -> None:
+        started = self._runs.pop(run_id, None)
+        if started is None:
+            return
+        span, start = started
+        span.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        for key, value in fields.items():
+            setattr(span, key, value)
+        if error is not None:
+            span.error = type(error).__name__
+        record_span(span)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        self._start(run_id, _llm_span(tags, kwargs.get("name")))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        self._start(run_id, _llm_span(tags, kwargs.get("name")))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(
+            run_id,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        # Only the graph query step of the Cypher chain is a stage, other
+        # chains are the sum of their LLM calls, queries and tools.
+        if kwargs.get("name") == "graph_query" and isinstance(inputs, dict):
+            cypher = inputs.get("query")
+            self._start(
+                run_id,
+                Span(
+                    stage="graph_query",
+                    duration_ms=0.0,
+                    cypher=cypher[:MAX_SPAN_CYPHER_CHARS] if cypher else None,
+                ),
+            )
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, rows=len(outputs) if isinstance(outputs, list) else None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, Span(stage="retrieval", duration_ms=0.0, name=kwargs.get("name")))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, rows=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = serialized.get("name")
+        self._start(run_id, Span(stage=f"tool:{name}", duration_ms=0.0, name=name))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
@@ -1,8 +1,38 @@
+import json
 import os
+import uuid
 import requests
 import streamlit as st
 
 CHATBOT_URL = os.getenv("CHATBOT_URL", "http://localhost:8000/doc-rag-agent")
+CHATBOT_STREAM_URL = os.getenv("CHATBOT_STREAM_URL", f"{CHATBOT_URL}/stream")
+
+
+def read_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+        elif not line and event:
+            yield event, json.loads("\n".join(data))
+            event, data = None, []
+
+
+def describe_event(event, data):
+    """One line for the "How was this generated" box, or None to skip."""
+    if event == "tool_start":
+        return f"Using tool **{data['tool']}** with input: {data['input']}"
+    if event == "cypher":
+        return f"Running Cypher:\n```\n{data['query']}\n```"
+    if event == "graph_results":
+        return f"Graph returned {data['rows']} rows"
+    if event == "retrieval":
+        titles = [d.get("title") for d in data["documents"] if d.get("title")]
+        return "Retrieved articles: " + "; ".join(titles)
+    return None
 
 with st.sidebar:
     st.header("About")
@@ -33,6 +63,11 @@ st.info(
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# The API keeps the conversation under this id, so follow-up questions
+# can refer to earlier answers.
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         if "output" in message.keys():
@@ -47,22 +82,37 @@ if prompt := st.chat_input("What do you want to know?"):
 
     st.session_state.messages.append({"role": "user", "output": prompt})
 
-    data = {"text": prompt}
-
-    with st.spinner("Searching for an answer..."):
-        response = requests.post(CHATBOT_URL, json=data)
-
-        if response.status_code == 200:
-            output_text = response.json()["output"]
-            explanation = response.json()["intermediate_steps"]
+    data = {"text": prompt, "session_id": st.session_state.session_id}
 
-        else:
+    output_text = ""
+    steps = []
+    with st.chat_message("assistant"):
+        answer = st.empty()
+        answer.markdown("Searching for an answer...")
+        status = st.status("How was this generated", expanded=False)
+        try:
+            with requests.post(CHATBOT_STREAM_URL, json=data, stream=True) as response:
+                response.raise_for_status()
+                for event, event_data in read_sse(response):
+                    if event == "token":
+                        output_text += event_data["text"]
+                        answer.markdown(output_text)
+                    elif event == "final":
+                        output_text = event_data["output"]
+                        answer.markdown(output_text)
+                    elif event == "error":
+                        raise RuntimeError(event_data["message"])
+                    elif line := describe_event(event, event_data):
+                        steps.append(line)
+                        status.markdown(line)
+            status.update(state="complete")
+        except Exception:
             output_text = """An error occurred while processing your message.
             Please try again or rephrase your message."""
-            explanation = output_text
+            answer.markdown(output_text)
+            status.update(state="error")
 
-    st.chat_message("assistant").markdown(output_text)
-    st.status("How was this generated", state="complete").info(explanation)
+    explanation = "\n\n".join(steps) or output_text
 
     st.session_state.messages.append(
         {
@@ -1,8 +1,25 @@
 import logging
 import os
+from typing import Any
 
+from csv_source import read_article_batches, read_traffic_batches
+from embedding_stage import embed_articles
+from etl_state import (
+    filter_changed_articles,
+    filter_new_traffic,
+    read_article_hashes,
+    read_etl_state,
+    read_traffic_values,
+    write_etl_state,
+)
+from index_stage import ensure_indexes
 from neo4j import GraphDatabase
+from passage_stage import embed_passages
+from parallel_loader import PartitionedWriter, partition_by_hash
 from retry import retry
+from traffic_export import export_traffic
+from traffic_rollups import refresh_traffic_rollups
+from vector_export import export_article_vectors
 
 ARTICLES_CSV_PATH = os.getenv("ARTICLES_CSV_PATH")
 TRAFFIC_CSV_PATH = os.getenv("TRAFFIC_CSV_PATH")
@@ -11,6 +28,30 @@ NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
+# "load_csv" runs the original server-side LOAD CSV passes, "batched" streams
+# each CSV once and writes it with parameterized UNWIND batches, "parallel"
+# does the same through ETL_WORKERS partitioned worker sessions.
+ETL_LOAD_MODE = os.getenv("ETL_LOAD_MODE", "load_csv")
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "1000"))
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "4"))
+# How long the driver keeps retrying a batch transaction on transient
+# errors (e.g. deadlocks) before giving up.
+ETL_TX_RETRY_SECONDS = float(os.getenv("ETL_TX_RETRY_SECONDS", "60"))
+# Maintain the pre-aggregated traffic rollups after loading.
+ETL_ROLLUPS = os.getenv("ETL_ROLLUPS", "true").lower() == "true"
+# Compute missing/stale article embeddings after loading.
+ETL_EMBEDDINGS = os.getenv("ETL_EMBEDDINGS", "true").lower() == "true"
+# Split articles into embedded passages for the passage-level Summary context
+# (SUMMARY_CONTEXT_MODE=passages on the API); other modes do not read them.
+ETL_PASSAGES = os.getenv("ETL_PASSAGES", "false").lower() == "true"
+# Export the embeddings as a memory-mapped matrix for the API's mmap retriever.
+ETL_VECTOR_EXPORT = os.getenv("ETL_VECTOR_EXPORT", "true").lower() == "true"
+# Export the article traffic as NumPy columns for the API's traffic analytics.
+ETL_TRAFFIC_EXPORT = os.getenv("ETL_TRAFFIC_EXPORT", "false").lower() == "true"
+# Only upsert new/changed rows based on the watermarks and content hashes
+# stored on the (:EtlState) node. Implies the batched loader.
+ETL_INCREMENTAL = os.getenv("ETL_INCREMENTAL", "false").lower() == "true"
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s]: %(message)s",
@@ -19,13 +60,6 @@ logging.basicConfig(
 
 LOGGER = logging.getLogger(__name__)
 
-NODES = ["Reporter", "Category", "Articles", "Traffic"]
-
-def _set_uniqueness_constraints(tx, node):
-    query = f"""CREATE CONSTRAINT IF NOT EXISTS FOR (n:{node})
-        REQUIRE n.id IS UNIQUE;"""
-    _ = tx.run(query, {})
-
 @retry(tries=100, delay=10)
 def load_publisher_graph_from_csv() -> None:
     """Load structured articles CSV data following
@@ -35,10 +69,8 @@ def load_publisher_graph_from_csv() -> None:
         NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD)
     )
 
-    LOGGER.info("Setting uniqueness constraints on nodes")
-    with driver.session(database="neo4j") as session:
-        for node in NODES:
-            session.execute_write(_set_uniqueness_constraints, node)
+    LOGGER.info("Creating constraints and indexes")
+    ensure_indexes(driver)
 
     LOGGER.info("Loading article nodes")
     with driver.session(database="neo4j") as session:
@@ -99,5 +131,245 @@ def load_publisher_graph_from_csv() -> None:
         _ = session.run(query, {})
 
 
+ARTICLES_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (articles:Articles {article_id: row.article_id})
+SET articles.title = row.title, articles.published_at = row.published_at, articles.source = row.source, articles.lead = row.lead, articles.body_content = row.body_content, articles.content_hash = row.content_hash
+MERGE (reporter:Reporter {reporter_name: row.reporter_name})
+MERGE (category:Category {category_name: row.category_name})
+WITH articles, reporter, category, row
+CALL {
+    WITH articles, row
+    MATCH (old:Reporter)-[wrote:WROTE]->(articles)
+    WHERE old.reporter_name <> row.reporter_name
+    DELETE wrote
+}
+CALL {
+    WITH articles, row
+    MATCH (old:Category)-[contain:CONTAIN]->(articles)
+    WHERE old.category_name <> row.category_name
+    DELETE contain
+}
+MERGE (reporter)-[:WROTE]->(articles)
+MERGE (category)-[:CONTAIN]->(articles)
+"""
+
+TRAFFIC_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (traffic:Traffic {traffic_date: row.traffic_date})
+WITH traffic, row
+MATCH (articles:Articles {article_id: row.article_id})
+MERGE (articles)-[gain:GAIN]->(traffic)
+SET
+    gain.activeUsers = row.activeUsers,
+    gain.sessions = row.sessions,
+    gain.screenPageViews = row.screenPageViews,
+    gain.screenPageViewsPerSession = row.screenPageViewsPerSession,
+    gain.screenPageViewsPerUser = row.screenPageViewsPerUser
+"""
+
+
+CATEGORIES_QUERY = """
+UNWIND $names AS name
+MERGE (:Category {category_name: name})
+"""
+
+TRAFFIC_DATES_QUERY = """
+UNWIND $dates AS traffic_date
+MERGE (:Traffic {traffic_date: traffic_date})
+"""
+
+
+def _merge_shared_nodes(tx, query, params):
+    _ = tx.run(query, params).consume()
+
+
+@retry(tries=100, delay=10)
+def _get_driver():
+    """Create a driver once Neo4j is reachable."""
+    driver = GraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USERNAME, NEO4J_PASSWORD),
+        max_transaction_retry_time=ETL_TX_RETRY_SECONDS,
+    )
+    driver.verify_connectivity()
+    return driver
+
+
+def load_publisher_graph_batched(
+    driver,
+    articles_path: str = ARTICLES_CSV_PATH,
+    traffic_path: str = TRAFFIC_CSV_PATH,
+    batch_size: int = ETL_BATCH_SIZE,
+    incremental: bool = ETL_INCREMENTAL,
+    workers: int = 1,
+) -> dict[str, Any]:
+    """Stream each CSV once and write nodes and relationships together
+    in explicit UNWIND transactions of batch_size rows.
+
+    In incremental mode only articles that are new or whose content hash
+    changed, and traffic rows after the traffic watermark day or of that day
+    with changed values, are written, so an unchanged drop keeps the data
+    version. The returned summary lists what changed so later stages can
+    limit their work to it, and the new watermarks; main() records them
+    with the data version once every stage has run.
+
+    With more than one worker, article rows are partitioned by reporter
+    and traffic rows by article so that concurrent batches never MERGE
+    the same reporter or article node. Categories and traffic dates are
+    shared by every partition, so they are merged up front on the
+    reading session before their rows are handed to the workers. The
+    CONTAIN and GAIN MERGEs of different partitions still lock those
+    shared nodes, so lock waits and deadlock retries can occur; the
+    managed-transaction retries (ETL_TX_RETRY_SECONDS) keep the load
+    correct.
+    """
+
+    LOGGER.info("Creating constraints and indexes")
+    ensure_indexes(driver)
+
+    with driver.session(database="neo4j") as session:
+        state = read_etl_state(session)
+        known_hashes = read_article_hashes(session) if incremental else {}
+    articles_watermark = state["articles_watermark"] if incremental else None
+    traffic_watermark = state["traffic_watermark"] if incremental else None
+    if traffic_watermark:
+        with driver.session(database="neo4j") as session:
+            watermark_values = read_traffic_values(session, traffic_watermark)
+    else:
+        watermark_values = {}
+
+    summary = {
+        "articles_read": 0,
+        "articles_written": 0,
+        "traffic_read": 0,
+        "traffic_written": 0,
+        "changed_article_ids": [],
+        "traffic_dates": set(),
+    }
+    new_articles_watermark = state["articles_watermark"]
+    new_traffic_watermark = state["traffic_watermark"]
+
+    LOGGER.info(
+        f"Loading articles, reporters, categories, 'WROTE' and 'CONTAIN' with {workers} worker(s)"
+    )
+    known_categories = set()
+    with driver.session(database="neo4j") as session, PartitionedWriter(
+        driver,
+        ARTICLES_BATCH_QUERY,
+        partition_by_hash(lambda row: row["reporter_name"]),
+        workers=workers,
+        batch_size=batch_size,
+    ) as writer:
+        for rows in read_article_batches(articles_path, batch_size):
+            summary["articles_read"] += len(rows)
+            new_articles_watermark = max(
+                [new_articles_watermark or ""] + [r["published_at"] or "" for r in rows]
+            ) or None
+            rows = filter_changed_articles(rows, known_hashes, articles_watermark)
+            new_categories = {r["category_name"] for r in rows} - known_categories
+            if new_categories:
+                session.execute_write(
+                    _merge_shared_nodes, CATEGORIES_QUERY, {"names": sorted(new_categories)}
+                )
+                known_categories |= new_categories
+            writer.write(rows)
+            summary["articles_written"] += len(rows)
+            summary["changed_article_ids"].extend(r["article_id"] for r in rows)
+            LOGGER.info(
+                f"Read {summary['articles_read']} article rows, queued {summary['articles_written']}"
+            )
+
+    LOGGER.info(f"Loading traffic nodes and 'GAIN' relationships with {workers} worker(s)")
+    with driver.session(database="neo4j") as session, PartitionedWriter(
+        driver,
+        TRAFFIC_BATCH_QUERY,
+        partition_by_hash(lambda row: row["article_id"]),
+        workers=workers,
+        batch_size=batch_size,
+    ) as writer:
+        for rows in read_traffic_batches(traffic_path, batch_size):
+            summary["traffic_read"] += len(rows)
+            new_traffic_watermark = max(
+                [new_traffic_watermark or ""] + [r["traffic_date"] for r in rows]
+            ) or None
+            rows = filter_new_traffic(rows, traffic_watermark, watermark_values)
+            new_dates = {r["traffic_date"] for r in rows} - summary["traffic_dates"]
+            if new_dates:
+                session.execute_write(
+                    _merge_shared_nodes, TRAFFIC_DATES_QUERY, {"dates": sorted(new_dates)}
+                )
+                summary["traffic_dates"] |= new_dates
+            writer.write(rows)
+            summary["traffic_written"] += len(rows)
+            LOGGER.info(
+                f"Read {summary['traffic_read']} traffic rows, queued {summary['traffic_written']}"
+            )
+
+    summary["changed"] = bool(summary["articles_written"] or summary["traffic_written"])
+    summary["traffic_dates"] = sorted(summary["traffic_dates"])
+    summary["articles_watermark"] = new_articles_watermark
+    summary["traffic_watermark"] = new_traffic_watermark
+
+    return summary
+
+
+def main() -> None:
+    """Load the graph, run the post-load stages, then record the new data
+    version, so the API only sees it once the rollups, embeddings and
+    exports it invalidates caches for are in place."""
+    traffic_dates, changed_article_ids, watermarks = None, None, {}
+    if ETL_LOAD_MODE in ("batched", "parallel") or ETL_INCREMENTAL:
+        workers = ETL_WORKERS if ETL_LOAD_MODE == "parallel" else 1
+        driver = _get_driver()
+        try:
+            summary = load_publisher_graph_batched(driver, workers=workers)
+        finally:
+            driver.close()
+        traffic_dates = summary["traffic_dates"]
+        if ETL_INCREMENTAL:
+            changed_article_ids = summary["changed_article_ids"]
+        changed = summary["changed"]
+        watermarks = {
+            "articles_watermark": summary["articles_watermark"],
+            "traffic_watermark": summary["traffic_watermark"],
+        }
+    else:
+        load_publisher_graph_from_csv()
+        # LOAD CSV does not report what it wrote, treat every run as a change.
+        changed = True
+
+    driver = _get_driver()
+    try:
+        with driver.session(database="neo4j") as session:
+            state = {**read_etl_state(session), **watermarks}
+        state["data_version"] += 1 if changed else 0
+
+        if ETL_ROLLUPS:
+            LOGGER.info("Refreshing traffic rollups")
+            refresh_traffic_rollups(driver, traffic_dates, changed_article_ids)
+        if ETL_EMBEDDINGS:
+            LOGGER.info("Embedding articles")
+            embed_articles(driver)
+        if ETL_PASSAGES:
+            LOGGER.info("Splitting articles into passages")
+            embed_passages(driver)
+        if ETL_VECTOR_EXPORT:
+            LOGGER.info("Exporting article vectors")
+            export_article_vectors(driver, data_version=state["data_version"])
+        if ETL_TRAFFIC_EXPORT:
+            LOGGER.info("Exporting article traffic")
+            export_traffic(driver, data_version=state["data_version"])
+
+        with driver.session(database="neo4j") as session:
+            write_etl_state(session, state)
+        LOGGER.info(
+            f"ETL data version {state['data_version']}, watermarks "
+            f"articles={state['articles_watermark']} traffic={state['traffic_watermark']}"
+        )
+    finally:
+        driver.close()
+
+
 if __name__ == "__main__":
-    load_publisher_graph_from_csv()
+    main()
@@ -0,0 +1,65 @@
+import csv
+import io
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Iterator, Sequence
+
+ARTICLE_INT_FIELDS = ["article_id"]
+TRAFFIC_INT_FIELDS = ["article_id", "activeUsers", "sessions", "screenPageViews"]
+TRAFFIC_FLOAT_FIELDS = ["screenPageViewsPerSession", "screenPageViewsPerUser"]
+
+
+@contextmanager
+def _open_csv(path: str) -> Iterator[io.TextIOBase]:
+    """Open a local path or a http(s) URL as a text stream."""
+    if path.startswith(("http://", "https://")):
+        with urllib.request.urlopen(path) as response:
+            yield io.TextIOWrapper(response, encoding="utf-8", newline="")
+    else:
+        with open(path, encoding="utf-8", newline="") as f:
+            yield f
+
+
+def _convert(
+    row: dict[str, str], int_fields: Sequence[str], float_fields: Sequence[str]
+) -> dict[str, Any]:
+    """Cast numeric columns and turn empty cells into nulls."""
+    converted: dict[str, Any] = {k: (v if v != "" else None) for k, v in row.items()}
+    for field in int_fields:
+        if converted.get(field) is not None:
+            converted[field] = int(float(converted[field]))
+    for field in float_fields:
+        if converted.get(field) is not None:
+            converted[field] = float(converted[field])
+    return converted
+
+
+def read_csv_batches(
+    path: str,
+    batch_size: int,
+    int_fields: Sequence[str] = (),
+    float_fields: Sequence[str] = (),
+) -> Iterator[list[dict[str, Any]]]:
+    """Stream a CSV exactly once and yield its rows in chunks of batch_size."""
+    with _open_csv(path) as f:
+        batch = []
+        for row in csv.DictReader(f):
+            batch.append(_convert(row, int_fields, float_fields))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def read_article_batches(path: str, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    return read_csv_batches(path, batch_size, int_fields=ARTICLE_INT_FIELDS)
+
+
+def read_traffic_batches(path: str, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    return read_csv_batches(
+        path,
+        batch_size,
+        int_fields=TRAFFIC_INT_FIELDS,
+        float_fields=TRAFFIC_FLOAT_FIELDS,
+    )
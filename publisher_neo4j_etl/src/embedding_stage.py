@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from typing import Any
+
+import numpy as np
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1536"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite")
+
+ARTICLES_VECTOR_INDEX = "articles"
+
+# Fields of the embedded text, in the same order as the text the API used to
+# embed through Neo4jVector.from_existing_graph. The text is rebuilt from the
+# rows of _fetch_stale_articles: reporter_name and category_name come from
+# its Reporter and Category joins, not from Articles properties.
+TEXT_NODE_PROPERTIES = [
+    "reporter_name",
+    "category_name",
+    "body_content",
+    "title",
+    "published_at",
+]
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_embedding_backend():
+    """Return the configured embedding model and the name it is cached under.
+
+    "openai" uses OpenAIEmbeddings, "fake" a deterministic local embedder
+    that needs no network access (for tests and benchmarks).
+    """
+    if EMBEDDING_BACKEND == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+
+        return (
+            DeterministicFakeEmbedding(size=EMBEDDING_DIMENSION),
+            f"fake:{EMBEDDING_DIMENSION}",
+        )
+
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL), f"openai:{EMBEDDING_MODEL}"
+
+
+def embedding_text(row: dict[str, Any]) -> str:
+    return "".join(
+        f"\n{prop}: {row.get(prop) or ''}" for prop in TEXT_NODE_PROPERTIES
+    )
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by content hash plus model name."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH) -> None:
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for key, blob in self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                chunk,
+            ):
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [
+                (key, np.asarray(vector, dtype=np.float32).tobytes())
+                for key, vector in items.items()
+            ],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def embed_texts(
+    texts: list[str], embeddings, model_name: str, cache: EmbeddingCache
+) -> tuple[list[list[float]], list[str], int]:
+    """Embed texts, calling the backend only for cache misses.
+
+    Returns the vectors, their cache keys and how many were computed.
+    """
+    keys = [embedding_cache_key(model_name, text) for text in texts]
+    cached = cache.get_many(keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+    if missing:
+        vectors = embeddings.embed_documents(list(missing.values()))
+        computed = dict(zip(missing.keys(), vectors))
+        cache.put_many(computed)
+        cached.update(computed)
+    return [cached[key] for key in keys], keys, len(missing)
+
+
+def create_vector_index(tx, index_name, label, dimension):
+    """Create a cosine vector index on the label's embeddings if missing."""
+    query = f"""CREATE VECTOR INDEX {index_name} IF NOT EXISTS
+        FOR (n:{label}) ON (n.embedding)
+        OPTIONS {{indexConfig: {{
+            `vector.dimensions`: {int(dimension)},
+            `vector.similarity_function`: 'cosine'
+        }}}}"""
+    _ = tx.run(query, {}).consume()
+
+
+def _fetch_stale_articles(tx, model_name, limit):
+    result = tx.run(
+        """
+        MATCH (a:Articles)
+        WHERE a.embedding IS NULL
+            OR a.embedding_key IS NULL
+            OR a.embedding_key <> $model_name + ':' + coalesce(a.content_hash, '')
+        OPTIONAL MATCH (r:Reporter)-[:WROTE]->(a)
+        OPTIONAL MATCH (c:Category)-[:CONTAIN]->(a)
+        RETURN a.article_id AS article_id,
+            coalesce(a.content_hash, '') AS content_hash,
+            r.reporter_name AS reporter_name,
+            c.category_name AS category_name,
+            a.body_content AS body_content,
+            a.title AS title,
+            a.published_at AS published_at
+        LIMIT $limit
+        """,
+        {"model_name": model_name, "limit": limit},
+    )
+    return [r.data() for r in result]
+
+
+def _write_embeddings(tx, rows):
+    _ = tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (a:Articles {article_id: row.article_id})
+        SET a.embedding = row.embedding, a.embedding_key = row.embedding_key
+        """,
+        {"rows": rows},
+    ).consume()
+
+
+def embed_articles(
+    driver,
+    embeddings=None,
+    model_name: str | None = None,
+    cache: EmbeddingCache | None = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+) -> dict[str, int]:
+    """Embed every article whose embedding is missing or was computed for
+    different content or a different model, and write the vectors back
+    with UNWIND batches."""
+    if embeddings is None:
+        embeddings, model_name = get_embedding_backend()
+    own_cache = cache is None
+    cache = cache or EmbeddingCache()
+
+    counts = {"embedded": 0, "computed": 0}
+    try:
+        with driver.session(database="neo4j") as session:
+            while True:
+                rows = session.execute_read(_fetch_stale_articles, model_name, batch_size)
+                if not rows:
+                    break
+                vectors, _, computed = embed_texts(
+                    [embedding_text(r) for r in rows], embeddings, model_name, cache
+                )
+                if counts["embedded"] == 0:
+                    session.execute_write(
+                        create_vector_index,
+                        ARTICLES_VECTOR_INDEX,
+                        "Articles",
+                        len(vectors[0]),
+                    )
+                session.execute_write(
+                    _write_embeddings,
+                    [
+                        {
+                            "article_id": r["article_id"],
+                            "embedding": v,
+                            "embedding_key": f"{model_name}:{r['content_hash']}",
+                        }
+                        for r, v in zip(rows, vectors)
+                    ],
+                )
+                counts["embedded"] += len(rows)
+                counts["computed"] += computed
+                LOGGER.info(
+                    f"Embedded {counts['embedded']} articles ({counts['computed']} computed, rest from cache)"
+                )
+    finally:
+        if own_cache:
+            cache.close()
+
+    return counts
+
+
+if __name__ == "__main__":
+    from bulk_csv_writer import _get_driver
+
+    driver = _get_driver()
+    try:
+        embed_articles(driver)
+    finally:
+        driver.close()
@@ -0,0 +1,166 @@
+import hashlib
+from typing import Any
+
+ETL_STATE_NAME = "publisher"
+
+# Columns that make up an article's content, including the reporter and
+# category so that a re-assigned article is detected as changed.
+ARTICLE_HASH_FIELDS = [
+    "title",
+    "published_at",
+    "source",
+    "lead",
+    "body_content",
+    "reporter_name",
+    "category_name",
+]
+
+# GAIN properties compared to tell a changed traffic row from a rewrite.
+TRAFFIC_VALUE_FIELDS = [
+    "activeUsers",
+    "sessions",
+    "screenPageViews",
+    "screenPageViewsPerSession",
+    "screenPageViewsPerUser",
+]
+
+
+def article_content_hash(row: dict[str, Any]) -> str:
+    """Stable hash of the article columns we store in the graph."""
+    digest = hashlib.sha256()
+    for field in ARTICLE_HASH_FIELDS:
+        digest.update(str(row.get(field) or "").encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def _read_state(tx) -> dict[str, Any]:
+    record = tx.run(
+        """
+        MATCH (s:EtlState {name: $name})
+        RETURN s.data_version AS data_version,
+            s.articles_watermark AS articles_watermark,
+            s.traffic_watermark AS traffic_watermark
+        """,
+        {"name": ETL_STATE_NAME},
+    ).single()
+    if record is None:
+        return {
+            "data_version": 0,
+            "articles_watermark": None,
+            "traffic_watermark": None,
+        }
+    return record.data()
+
+
+def _read_article_hashes(tx) -> dict[int, str]:
+    result = tx.run(
+        """
+        MATCH (a:Articles)
+        WHERE a.content_hash IS NOT NULL
+        RETURN a.article_id AS article_id, a.content_hash AS content_hash
+        """
+    )
+    return {r["article_id"]: r["content_hash"] for r in result}
+
+
+def _read_traffic_values(tx, traffic_date: str) -> dict[int, tuple]:
+    result = tx.run(
+        """
+        MATCH (a:Articles)-[g:GAIN]->(:Traffic {traffic_date: $traffic_date})
+        RETURN a.article_id AS article_id, g.activeUsers AS activeUsers,
+            g.sessions AS sessions, g.screenPageViews AS screenPageViews,
+            g.screenPageViewsPerSession AS screenPageViewsPerSession,
+            g.screenPageViewsPerUser AS screenPageViewsPerUser
+        """,
+        {"traffic_date": traffic_date},
+    )
+    return {
+        r["article_id"]: tuple(r[field] for field in TRAFFIC_VALUE_FIELDS)
+        for r in result
+    }
+
+
+def _write_state(tx, state):
+    _ = tx.run(
+        """
+        MERGE (s:EtlState {name: $name})
+        SET s.data_version = $data_version,
+            s.articles_watermark = $articles_watermark,
+            s.traffic_watermark = $traffic_watermark,
+            s.updated_at = datetime()
+        """,
+        {"name": ETL_STATE_NAME, **state},
+    ).consume()
+
+
+def read_etl_state(session) -> dict[str, Any]:
+    """Read the watermarks and data version recorded by the last run."""
+    return session.execute_read(_read_state)
+
+
+def read_article_hashes(session) -> dict[int, str]:
+    """Read the content hash of every article already in the graph."""
+    return session.execute_read(_read_article_hashes)
+
+
+def read_traffic_values(session, traffic_date: str) -> dict[int, tuple]:
+    """Read the stored GAIN values of one traffic date by article id."""
+    return session.execute_read(_read_traffic_values, traffic_date)
+
+
+def write_etl_state(session, state: dict[str, Any]) -> None:
+    """Persist watermarks and data version on the EtlState node."""
+    session.execute_write(
+        _write_state,
+        {
+            "data_version": state["data_version"],
+            "articles_watermark": state["articles_watermark"],
+            "traffic_watermark": state["traffic_watermark"],
+        },
+    )
+
+
+def filter_changed_articles(
+    rows: list[dict[str, Any]],
+    known_hashes: dict[int, str],
+    watermark: str | None,
+) -> list[dict[str, Any]]:
+    """Attach content hashes and keep only new or changed article rows.
+
+    Rows published after the watermark are always new; older rows are
+    kept only when their content hash differs from the stored one.
+    """
+    changed = []
+    for row in rows:
+        row["content_hash"] = article_content_hash(row)
+        is_new = watermark is None or (row["published_at"] or "") > watermark
+        if is_new or known_hashes.get(row["article_id"]) != row["content_hash"]:
+            changed.append(row)
+    return changed
+
+
+def filter_new_traffic(
+    rows: list[dict[str, Any]],
+    watermark: str | None,
+    watermark_values: dict[int, tuple] | None = None,
+) -> list[dict[str, Any]]:
+    """Keep traffic rows after the watermark day, and rows of the watermark
+    day whose values differ from watermark_values (the stored ones).
+
+    The watermark day is compared rather than skipped because a drop may
+    have been appended to after the previous run.
+    """
+    if watermark is None:
+        return rows
+    watermark_values = watermark_values or {}
+    return [
+        r
+        for r in rows
+        if r["traffic_date"] > watermark
+        or (
+            r["traffic_date"] == watermark
+            and watermark_values.get(r["article_id"])
+            != tuple(r.get(field) for field in TRAFFIC_VALUE_FIELDS)
+        )
+    ]
@@ -0,0 +1,424 @@
+import argparse
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+import numpy as np
+from embedding_stage import ARTICLES_VECTOR_INDEX, create_vector_index
+from etl_state import read_etl_state, write_etl_state
+from index_stage import ensure_indexes
+from parallel_loader import PartitionedWriter, partition_by_hash
+from passage_stage import PASSAGES_VECTOR_INDEX
+from traffic_rollups import SCOPES
+
+# Snapshot files are written here, one versioned file per export.
+GRAPH_SNAPSHOT_DIR = os.getenv("GRAPH_SNAPSHOT_DIR", "graph_snapshots")
+GRAPH_SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _rollup_table(scope: dict[str, str]) -> dict[str, Any]:
+    owner, label, key = scope["owner_label"], scope["label"], scope["key"]
+    return {
+        "read": f"""
+        MATCH (owner:{owner})-[:ROLLUP]->(r:{label})
+        RETURN owner.{key} AS {key}, r.grain AS grain, r.period_start AS period_start,
+            r.activeUsers AS activeUsers, r.sessions AS sessions,
+            r.screenPageViews AS screenPageViews
+        """,
+        "columns": {
+            key: "int" if key == "article_id" else "str",
+            "grain": "str",
+            "period_start": "str",
+            "activeUsers": "int",
+            "sessions": "int",
+            "screenPageViews": "int",
+        },
+        "write": f"""
+        UNWIND $rows AS row
+        MATCH (owner:{owner} {{{key}: row.{key}}})
+        MERGE (owner)-[:ROLLUP]->(r:{label} {{{key}: row.{key}, grain: row.grain, period_start: row.period_start}})
+        SET r.activeUsers = row.activeUsers, r.sessions = row.sessions,
+            r.screenPageViews = row.screenPageViews
+        """,
+        "partition": key,
+    }
+
+
+# Every table with the query reading it, its column types, the UNWIND
+# query writing it back and the column its import batches are partitioned
+# by. Imported in this order: nodes before the relationships between them.
+TABLES: dict[str, dict[str, Any]] = {
+    "articles": {
+        "read": """
+        MATCH (a:Articles)
+        RETURN a.article_id AS article_id, a.title AS title,
+            a.published_at AS published_at, a.source AS source, a.lead AS lead,
+            a.body_content AS body_content, a.content_hash AS content_hash,
+            a.embedding_key AS embedding_key, a.passages_key AS passages_key,
+            a.embedding AS embedding
+        ORDER BY a.article_id
+        """,
+        "columns": {
+            "article_id": "int",
+            "title": "str",
+            "published_at": "str",
+            "source": "str",
+            "lead": "str",
+            "body_content": "str",
+            "content_hash": "str",
+            "embedding_key": "str",
+            "passages_key": "str",
+            "embedding": "vector",
+        },
+        "write": """
+        UNWIND $rows AS row
+        MERGE (a:Articles {article_id: row.article_id})
+        SET a.title = row.title, a.published_at = row.published_at, a.source = row.source,
+            a.lead = row.lead, a.body_content = row.body_content,
+            a.content_hash = row.content_hash, a.embedding_key = row.embedding_key,
+            a.passages_key = row.passages_key, a.embedding = row.embedding
+        """,
+        "partition": "article_id",
+    },
+    "reporters": {
+        "read": "MATCH (r:Reporter) RETURN r.reporter_name AS reporter_name",
+        "columns": {"reporter_name": "str"},
+        "write": "UNWIND $rows AS row MERGE (:Reporter {reporter_name: row.reporter_name})",
+        "partition": "reporter_name",
+    },
+    "categories": {
+        "read": "MATCH (c:Category) RETURN c.category_name AS category_name",
+        "columns": {"category_name": "str"},
+        "write": "UNWIND $rows AS row MERGE (:Category {category_name: row.category_name})",
+        "partition": "category_name",
+    },
+    "traffic": {
+        "read": "MATCH (t:Traffic) RETURN t.traffic_date AS traffic_date",
+        "columns": {"traffic_date": "str"},
+        "write": "UNWIND $rows AS row MERGE (:Traffic {traffic_date: row.traffic_date})",
+        "partition": "traffic_date",
+    },
+    "wrote": {
+        "read": """
+        MATCH (r:Reporter)-[:WROTE]->(a:Articles)
+        RETURN r.reporter_name AS reporter_name, a.article_id AS article_id
+        """,
+        "columns": {"reporter_name": "str", "article_id": "int"},
+        "write": """
+        UNWIND $rows AS row
+        MATCH (r:Reporter {reporter_name: row.reporter_name})
+        MATCH (a:Articles {article_id: row.article_id})
+        MERGE (r)-[:WROTE]->(a)
+        """,
+        "partition": "reporter_name",
+    },
+    "contain": {
+        "read": """
+        MATCH (c:Category)-[:CONTAIN]->(a:Articles)
+        RETURN c.category_name AS category_name, a.article_id AS article_id
+        """,
+        "columns": {"category_name": "str", "article_id": "int"},
+        "write": """
+        UNWIND $rows AS row
+        MATCH (c:Category {category_name: row.category_name})
+        MATCH (a:Articles {article_id: row.article_id})
+        MERGE (c)-[:CONTAIN]->(a)
+        """,
+        "partition": "category_name",
+    },
+    "gain": {
+        "read": """
+        MATCH (a:Articles)-[g:GAIN]->(t:Traffic)
+        RETURN a.article_id AS article_id, t.traffic_date AS traffic_date,
+            g.activeUsers AS activeUsers, g.sessions AS sessions,
+            g.screenPageViews AS screenPageViews,
+            g.screenPageViewsPerSession AS screenPageViewsPerSession,
+            g.screenPageViewsPerUser AS screenPageViewsPerUser
+        """,
+        "columns": {
+            "article_id": "int",
+            "traffic_date": "str",
+            "activeUsers": "int",
+            "sessions": "int",
+            "screenPageViews": "int",
+            "screenPageViewsPerSession": "float",
+            "screenPageViewsPerUser": "float",
+        },
+        "write": """
+        UNWIND $rows AS row
+        MATCH (a:Articles {article_id: row.article_id})
+        MATCH (t:Traffic {traffic_date: row.traffic_date})
+        MERGE (a)-[g:GAIN]->(t)
+        SET g.activeUsers = row.activeUsers, g.sessions = row.sessions,
+            g.screenPageViews = row.screenPageViews,
+            g.screenPageViewsPerSession = row.screenPageViewsPerSession,
+            g.screenPageViewsPerUser = row.screenPageViewsPerUser
+        """,
+        "partition": "article_id",
+    },
+    **{f"{name}_rollups": _rollup_table(scope) for name, scope in SCOPES.items()},
+    "passages": {
+        "read": """
+        MATCH (p:Passage)-[:PART_OF]->(a:Articles)
+        RETURN p.passage_id AS passage_id, a.article_id AS article_id, p.seq AS seq,
+            p.text AS text, p.embedding AS embedding
+        ORDER BY p.passage_id
+        """,
+        "columns": {
+            "passage_id": "str",
+            "article_id": "int",
+            "seq": "int",
+            "text": "str",
+            "embedding": "vector",
+        },
+        "write": """
+        UNWIND $rows AS row
+        MATCH (a:Articles {article_id: row.article_id})
+        MERGE (p:Passage {passage_id: row.passage_id})
+        SET p.article_id = row.article_id, p.seq = row.seq, p.text = row.text,
+            p.embedding = row.embedding
+        MERGE (p)-[:PART_OF]->(a)
+        """,
+        "partition": "article_id",
+    },
+}
+
+# Vector indexes to create for the tables' embeddings before importing.
+VECTOR_INDEXES = {
+    "articles": (ARTICLES_VECTOR_INDEX, "Articles"),
+    "passages": (PASSAGES_VECTOR_INDEX, "Passage"),
+}
+
+
+def _npy_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _read_npy(archive: zipfile.ZipFile, name: str) -> np.ndarray:
+    with archive.open(name) as f:
+        return np.load(io.BytesIO(f.read()), allow_pickle=False)
+
+
+def _write_column(
+    archive: zipfile.ZipFile, prefix: str, kind: str, values: list[Any]
+) -> dict[str, Any]:
+    """Write one column as binary arrays: numbers as int64/float64, strings
+    as UTF-8 bytes plus int64 offsets, vectors as one float32 matrix. Nulls
+    are kept in a boolean mask. Returns the column's manifest entry."""
+    nulls = np.array([v is None for v in values], dtype=bool)
+    info: dict[str, Any] = {"type": kind, "nulls": int(nulls.sum())}
+    if info["nulls"]:
+        archive.writestr(f"{prefix}.nulls.npy", _npy_bytes(nulls))
+
+    if kind == "int":
+        array = np.array([0 if v is None else v for v in values], dtype=np.int64)
+        archive.writestr(f"{prefix}.npy", _npy_bytes(array))
+    elif kind == "float":
+        array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        archive.writestr(f"{prefix}.npy", _npy_bytes(array))
+    elif kind == "str":
+        encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        archive.writestr(f"{prefix}.offsets.npy", _npy_bytes(offsets))
+        archive.writestr(f"{prefix}.utf8", b"".join(encoded))
+    else:
+        dimension = next((len(v) for v in values if v is not None), 0)
+        matrix = np.zeros((len(values), dimension), dtype=np.float32)
+        for i, vector in enumerate(values):
+            if vector is not None:
+                matrix[i] = vector
+        info["dimension"] = dimension
+        # Float noise does not deflate, so the matrix is stored as is.
+        archive.writestr(
+            f"{prefix}.npy", _npy_bytes(matrix), compress_type=zipfile.ZIP_STORED
+        )
+    return info
+
+
+def _read_column(
+    archive: zipfile.ZipFile, prefix: str, info: dict[str, Any], rows: int
+) -> list[Any]:
+    nulls = (
+        _read_npy(archive, f"{prefix}.nulls.npy")
+        if info["nulls"]
+        else np.zeros(rows, dtype=bool)
+    )
+    kind = info["type"]
+    if kind == "str":
+        offsets = _read_npy(archive, f"{prefix}.offsets.npy")
+        data = archive.read(f"{prefix}.utf8")
+        values = [
+            data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(rows)
+        ]
+    elif kind == "vector":
+        values = list(_read_npy(archive, f"{prefix}.npy"))
+    else:
+        values = _read_npy(archive, f"{prefix}.npy").tolist()
+    return [None if null else value for value, null in zip(values, nulls)]
+
+
+def _read_table(tx, query, columns):
+    """The table's rows as columns; vectors are converted to float32 per
+    record, so the export never holds them as Python floats."""
+    data: dict[str, list[Any]] = {column: [] for column in columns}
+    for record in tx.run(query):
+        for column, kind in columns.items():
+            value = record[column]
+            if kind == "vector" and value is not None:
+                value = np.asarray(value, dtype=np.float32)
+            data[column].append(value)
+    return data
+
+
+def export_graph_snapshot(driver, snapshot_dir: str = GRAPH_SNAPSHOT_DIR) -> dict[str, Any]:
+    """Export the graph into a new versioned snapshot file: a zip of binary
+    columns per table plus a manifest. Returns the manifest and its path."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with driver.session(database="neo4j") as session:
+        state = read_etl_state(session)
+        path = os.path.join(
+            snapshot_dir, f"graph-v{state['data_version']:08d}-{time.time_ns()}.zip"
+        )
+        manifest: dict[str, Any] = {
+            "format_version": GRAPH_SNAPSHOT_FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **state,
+            "tables": {},
+        }
+        with zipfile.ZipFile(f"{path}.tmp", "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, table in TABLES.items():
+                data = session.execute_read(_read_table, table["read"], table["columns"])
+                rows = len(next(iter(data.values())))
+                manifest["tables"][name] = {
+                    "rows": rows,
+                    "columns": {
+                        column: _write_column(archive, f"{name}/{column}", kind, data[column])
+                        for column, kind in table["columns"].items()
+                    },
+                }
+                LOGGER.info(f"Exported {rows} {name} rows")
+            archive.writestr(MANIFEST_FILE, json.dumps(manifest, indent=2))
+    os.replace(f"{path}.tmp", path)
+    LOGGER.info(f"Wrote graph snapshot {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return {"path": path, **manifest}
+
+
+def read_manifest(path: str) -> dict[str, Any]:
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_FILE))
+    if manifest["format_version"] > GRAPH_SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has snapshot format {manifest['format_version']}, "
+            f"this ETL reads up to {GRAPH_SNAPSHOT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def _table_batches(
+    archive: zipfile.ZipFile, name: str, info: dict[str, Any], batch_size: int
+) -> Iterator[list[dict[str, Any]]]:
+    columns = {
+        column: _read_column(archive, f"{name}/{column}", column_info, info["rows"])
+        for column, column_info in info["columns"].items()
+    }
+    for start in range(0, info["rows"], batch_size):
+        batch = [
+            {column: values[i] for column, values in columns.items()}
+            for i in range(start, min(start + batch_size, info["rows"]))
+        ]
+        for row in batch:
+            for column, column_info in info["columns"].items():
+                if column_info["type"] == "vector" and row[column] is not None:
+                    row[column] = row[column].tolist()
+        yield batch
+
+
+def import_graph_snapshot(
+    driver, path: str, batch_size: int = 1000, workers: int = 1
+) -> dict[str, Any]:
+    """Load a snapshot into Neo4j with UNWIND batches of batch_size rows,
+    written by `workers` partitioned sessions. Rows are merged on their
+    keys, so importing into a non-empty graph updates it.
+
+    The ETL data version is set past both the graph's and the snapshot's,
+    so the API drops caches built from the graph before the import."""
+    manifest = read_manifest(path)
+    ensure_indexes(driver)
+
+    counts = {}
+    with zipfile.ZipFile(path) as archive, driver.session(database="neo4j") as session:
+        current = read_etl_state(session)
+        for name, (index_name, label) in VECTOR_INDEXES.items():
+            info = manifest["tables"].get(name)
+            dimension = info and info["columns"]["embedding"].get("dimension")
+            if dimension:
+                session.execute_write(create_vector_index, index_name, label, dimension)
+
+        for name, table in TABLES.items():
+            info = manifest["tables"].get(name)
+            if info is None:
+                continue
+            with PartitionedWriter(
+                driver,
+                table["write"],
+                partition_by_hash(lambda row, key=table["partition"]: row[key]),
+                workers=workers,
+                batch_size=batch_size,
+            ) as writer:
+                for batch in _table_batches(archive, name, info, batch_size):
+                    writer.write(batch)
+            counts[name] = info["rows"]
+            LOGGER.info(f"Imported {info['rows']} {name} rows")
+
+        data_version = max(current["data_version"], manifest["data_version"]) + 1
+        write_etl_state(
+            session,
+            {
+                "data_version": data_version,
+                "articles_watermark": manifest["articles_watermark"],
+                "traffic_watermark": manifest["traffic_watermark"],
+            },
+        )
+    LOGGER.info(f"Imported {path}, ETL data version {data_version}")
+    return {"data_version": data_version, "rows": counts}
+
+
+def main() -> None:
+    from bulk_csv_writer import ETL_BATCH_SIZE, ETL_WORKERS, _get_driver
+
+    parser = argparse.ArgumentParser(
+        description="Export the graph to a snapshot file or import one."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write a new snapshot")
+    export_parser.add_argument("--dir", default=GRAPH_SNAPSHOT_DIR)
+    import_parser = commands.add_parser("import", help="load a snapshot into Neo4j")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=ETL_BATCH_SIZE)
+    import_parser.add_argument("--workers", type=int, default=ETL_WORKERS)
+    args = parser.parse_args()
+
+    driver = _get_driver()
+    try:
+        if args.command == "export":
+            export_graph_snapshot(driver, args.dir)
+        else:
+            import_graph_snapshot(driver, args.path, args.batch_size, args.workers)
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Propose indexes for the properties the Graph tool's generated Cypher
+filters and sorts on most, from the API's Cypher log (CYPHER_LOG_PATH).
+
+    python index_advisor.py                 # print proposals
+    python index_advisor.py --create        # and create them
+    python index_advisor.py --offline       # compare with index_stage only
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Iterable, Iterator
+
+from index_stage import CONSTRAINTS, RANGE_INDEXES, read_indexes
+from neo4j import GraphDatabase
+
+CYPHER_LOG_PATH = os.getenv("CYPHER_LOG_PATH", "")
+# Queries that must use a property before an index on it is proposed.
+INDEX_ADVISOR_MIN_QUERIES = int(os.getenv("INDEX_ADVISOR_MIN_QUERIES", "5"))
+
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+
+LOGGER = logging.getLogger(__name__)
+
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NODE = re.compile(r"\(\s*(\w*)\s*:\s*`?(\w+)`?\s*(?:\{([^}]*)\})?")
+_RELATIONSHIP = re.compile(r"\[\s*(\w*)\s*:\s*`?(\w+)`?\s*(?:\{([^}]*)\})?")
+_MAP_KEY = re.compile(r"(\w+)\s*:")
+_OPERATOR = r"(=~|<>|<=|>=|=|<|>|IN\b|STARTS\s+WITH|ENDS\s+WITH|CONTAINS|IS\s+NOT\s+NULL)"
+_FILTER = re.compile(r"\b(\w+)\.(\w+)\s*" + _OPERATOR, re.IGNORECASE)
+_REVERSED_FILTER = re.compile(r"(<=|>=|<|>|=)\s*(\w+)\.(\w+)\b")
+_ORDER_BY = re.compile(
+    r"\bORDER\s+BY\s+(.+?)(?=\bSKIP\b|\bLIMIT\b|\bRETURN\b|\bWITH\b|\bMATCH\b|\bUNION\b|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_PROPERTY = re.compile(r"\b(\w+)\.(\w+)\b")
+# Operators a range index cannot serve.
+_TEXT_OPERATORS = {"CONTAINS", "ENDS WITH"}
+
+
+def read_cypher_log(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)["cypher"]
+
+
+def property_uses(cypher: str) -> set[tuple[str, str, str, str]]:
+    """(entity, label or type, property, use) for every filtered or sorted
+    property of a labelled variable; use is "equality", "range", "text"
+    or "sort"."""
+    cypher = _LITERAL.sub("''", cypher)
+    variables: dict[str, tuple[str, str]] = {}
+    uses = set()
+    for entity, pattern in (("node", _NODE), ("relationship", _RELATIONSHIP)):
+        for variable, label, properties in pattern.findall(cypher):
+            if variable:
+                variables.setdefault(variable, (entity, label))
+            for key in _MAP_KEY.findall(properties or ""):
+                uses.add((entity, label, key, "equality"))
+
+    def add(variable: str, key: str, use: str) -> None:
+        if variable in variables:
+            uses.add((*variables[variable], key, use))
+
+    for variable, key, operator in _FILTER.findall(cypher):
+        operator = " ".join(operator.upper().split())
+        if operator in _TEXT_OPERATORS:
+            add(variable, key, "text")
+        elif operator in ("=", "IN", "IS NOT NULL"):
+            add(variable, key, "equality")
+        else:
+            add(variable, key, "range")
+    for _, variable, key in _REVERSED_FILTER.findall(cypher):
+        add(variable, key, "range")
+    for order in _ORDER_BY.findall(cypher):
+        for variable, key in _PROPERTY.findall(order):
+            add(variable, key, "sort")
+    return uses
+
+
+def count_uses(
+    queries: Iterable[str],
+) -> dict[tuple[str, str, str], tuple[int, Counter, Counter]]:
+    """Per (entity, label, property), the number of queries using it, the
+    number of queries per use, and the number of queries per set of
+    properties of the same label used together with it."""
+    counts: dict[tuple[str, str, str], Counter] = defaultdict(Counter)
+    together: dict[tuple[str, str, str], Counter] = defaultdict(Counter)
+    totals: Counter = Counter()
+    for cypher in queries:
+        uses = property_uses(cypher)
+        targets = {(entity, label, key) for entity, label, key, _ in uses}
+        for entity, label, key, use in uses:
+            counts[(entity, label, key)][use] += 1
+        for target in targets:
+            same_label = frozenset(other[2] for other in targets if other[:2] == target[:2])
+            together[target][same_label] += 1
+        totals.update(targets)
+    return {
+        target: (totals[target], uses, together[target]) for target, uses in counts.items()
+    }
+
+
+def _index_type(uses: Counter) -> str:
+    return "TEXT" if set(uses) == {"text"} else "RANGE"
+
+
+def _covered(
+    indexes: list[dict[str, Any]],
+    label: str,
+    key: str,
+    index_type: str,
+    together: frozenset[str] = frozenset(),
+) -> bool:
+    """An index of the type on key, as its first property or after
+    properties that are all used together with it; a composite range index
+    on (grain, period_start) serves queries filtering on both."""
+    for index in indexes:
+        properties = index.get("properties") or []
+        if (
+            label in (index.get("labelsOrTypes") or [])
+            and index.get("type") == index_type
+            and key in properties
+            and set(properties[: properties.index(key)]) <= together
+        ):
+            return True
+    return False
+
+
+def planned_indexes() -> list[dict[str, Any]]:
+    """The indexes index_stage creates, shaped like SHOW INDEXES rows."""
+    return [
+        {"labelsOrTypes": [label], "properties": properties, "type": "RANGE"}
+        for label, properties in [*CONSTRAINTS.values(), *RANGE_INDEXES.values()]
+    ]
+
+
+def index_statement(entity: str, label: str, key: str, index_type: str) -> str:
+    name = f"advisor_{label}_{key}".lower()
+    if entity == "relationship":
+        target = f"()-[r:{label}]-() ON (r.{key})"
+    else:
+        target = f"(n:{label}) ON (n.{key})"
+    return f"CREATE {index_type} INDEX {name} IF NOT EXISTS FOR {target}"
+
+
+def advise(
+    queries: Iterable[str],
+    indexes: list[dict[str, Any]],
+    min_queries: int = INDEX_ADVISOR_MIN_QUERIES,
+) -> list[dict[str, Any]]:
+    """Properties used by at least min_queries queries that no index
+    serves, most used first, with the statement creating their index."""
+    proposals = []
+    for (entity, label, key), (queries_using, uses, together) in count_uses(queries).items():
+        index_type = _index_type(uses)
+        unserved = sum(
+            count
+            for properties, count in together.items()
+            if not _covered(indexes, label, key, index_type, properties)
+        )
+        if unserved < min_queries:
+            continue
+        proposals.append(
+            {
+                "entity": entity,
+                "label": label,
+                "property": key,
+                "queries": queries_using,
+                "uses": dict(uses),
+                "statement": index_statement(entity, label, key, index_type),
+            }
+        )
+    return sorted(proposals, key=lambda p: -p["queries"])
+
+
+def _create_index(tx, statement):
+    _ = tx.run(statement).consume()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", default=CYPHER_LOG_PATH, help="Cypher log (JSON lines)")
+    parser.add_argument("--min-queries", type=int, default=INDEX_ADVISOR_MIN_QUERIES)
+    parser.add_argument("--create", action="store_true", help="create the proposed indexes")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="compare with the indexes index_stage creates instead of the database",
+    )
+    args = parser.parse_args()
+    if not args.log:
+        parser.error("set CYPHER_LOG_PATH or pass --log")
+    if args.create and args.offline:
+        parser.error("--create needs the database, drop --offline")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    queries = list(read_cypher_log(args.log))
+    driver = None
+    try:
+        if args.offline:
+            indexes = planned_indexes()
+        else:
+            driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+            with driver.session(database="neo4j") as session:
+                indexes = session.execute_read(read_indexes)
+
+        proposals = advise(queries, indexes, args.min_queries)
+        LOGGER.info(f"{len(queries)} logged queries, {len(proposals)} proposed indexes")
+        for proposal in proposals:
+            uses = ", ".join(f"{use} {count}" for use, count in sorted(proposal["uses"].items()))
+            LOGGER.info(
+                f"{proposal['label']}.{proposal['property']} in {proposal['queries']} "
+                f"queries ({uses}):\n    {proposal['statement']}"
+            )
+        if args.create:
+            with driver.session(database="neo4j") as session:
+                for proposal in proposals:
+                    session.execute_write(_create_index, proposal["statement"])
+                    LOGGER.info(f"Created index for {proposal['label']}.{proposal['property']}")
+    finally:
+        if driver is not None:
+            driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import logging
+import os
+from typing import Any
+
+# How long to wait for new indexes and constraints to finish populating.
+ETL_INDEX_WAIT_SECONDS = int(os.getenv("ETL_INDEX_WAIT_SECONDS", "600"))
+
+LOGGER = logging.getLogger(__name__)
+
+# Uniqueness constraints on the keys the loaders MERGE and MATCH on. Each
+# is backed by a range index, so lookups by these keys are index seeks.
+CONSTRAINTS = {
+    "articles_article_id": ("Articles", ["article_id"]),
+    "reporter_reporter_name": ("Reporter", ["reporter_name"]),
+    "category_category_name": ("Category", ["category_name"]),
+    "traffic_traffic_date": ("Traffic", ["traffic_date"]),
+    "passage_passage_id": ("Passage", ["passage_id"]),
+    "etl_state_name": ("EtlState", ["name"]),
+}
+
+# Range indexes on common filters and sort keys that are not unique.
+RANGE_INDEXES = {
+    "articles_published_at": ("Articles", ["published_at"]),
+    "articles_title": ("Articles", ["title"]),
+    "passage_article_id": ("Passage", ["article_id"]),
+    "article_traffic_period": ("ArticleTraffic", ["grain", "period_start"]),
+    "category_traffic_period": ("CategoryTraffic", ["grain", "period_start"]),
+    "reporter_traffic_period": ("ReporterTraffic", ["grain", "period_start"]),
+}
+
+
+def _properties(variable: str, properties: list[str]) -> str:
+    return ", ".join(f"{variable}.{p}" for p in properties)
+
+
+def read_indexes(tx) -> list[dict[str, Any]]:
+    result = tx.run(
+        """
+        SHOW INDEXES
+        YIELD name, type, entityType, labelsOrTypes, properties, state,
+            populationPercent, owningConstraint
+        RETURN *
+        """
+    )
+    return [r.data() for r in result]
+
+
+def read_constraints(tx) -> list[dict[str, Any]]:
+    result = tx.run(
+        """
+        SHOW CONSTRAINTS
+        YIELD name, type, labelsOrTypes, properties
+        RETURN *
+        """
+    )
+    return [r.data() for r in result]
+
+
+def _run_schema(tx, query):
+    _ = tx.run(query).consume()
+
+
+def _await_indexes(tx, seconds):
+    _ = tx.run("CALL db.awaitIndexes($seconds)", {"seconds": seconds}).consume()
+
+
+def _on_schema(index: dict[str, Any], label: str, properties: list[str]) -> bool:
+    return index.get("labelsOrTypes") == [label] and index.get("properties") == properties
+
+
+def ensure_indexes(driver, wait_seconds: int = ETL_INDEX_WAIT_SECONDS) -> dict[str, Any]:
+    """Create the constraints and range indexes of the graph, drop the
+    obsolete `n.id` constraints, wait until every index is online and
+    report what was done."""
+    with driver.session(database="neo4j") as session:
+        indexes = session.execute_read(read_indexes)
+        constraints = session.execute_read(read_constraints)
+        existing = {i["name"] for i in indexes} | {c["name"] for c in constraints}
+        report: dict[str, Any] = {"created": [], "dropped": [], "indexes": []}
+
+        # The loaders used to constrain `id`, a property no node has.
+        labels = {label for label, _ in CONSTRAINTS.values()}
+        for constraint in constraints:
+            if constraint.get("properties") == ["id"] and set(
+                constraint.get("labelsOrTypes") or []
+            ) <= labels:
+                session.execute_write(
+                    _run_schema, f"DROP CONSTRAINT {constraint['name']} IF EXISTS"
+                )
+                report["dropped"].append(constraint["name"])
+
+        for name, (label, properties) in CONSTRAINTS.items():
+            if any(_on_schema(c, label, properties) for c in constraints):
+                continue
+            # A plain index on the key, e.g. from the index advisor, would
+            # conflict with the constraint's own index.
+            for index in indexes:
+                if (
+                    _on_schema(index, label, properties)
+                    and index.get("type") == "RANGE"
+                    and not index.get("owningConstraint")
+                ):
+                    session.execute_write(_run_schema, f"DROP INDEX {index['name']} IF EXISTS")
+                    report["dropped"].append(index["name"])
+            session.execute_write(
+                _run_schema,
+                f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) "
+                f"REQUIRE ({_properties('n', properties)}) IS UNIQUE",
+            )
+            if name not in existing:
+                report["created"].append(name)
+
+        for name, (label, properties) in RANGE_INDEXES.items():
+            if any(_on_schema(i, label, properties) for i in indexes):
+                continue
+            session.execute_write(
+                _run_schema,
+                f"CREATE RANGE INDEX {name} IF NOT EXISTS FOR (n:{label}) "
+                f"ON ({_properties('n', properties)})",
+            )
+            if name not in existing:
+                report["created"].append(name)
+
+        LOGGER.info(f"Waiting up to {wait_seconds}s for indexes to come online")
+        session.execute_read(_await_indexes, wait_seconds)
+        report["indexes"] = session.execute_read(read_indexes)
+
+    for name in report["dropped"]:
+        LOGGER.info(f"Dropped {name}")
+    for name in report["created"]:
+        LOGGER.info(f"Created {name}")
+    for index in report["indexes"]:
+        LOGGER.info(
+            f"Index {index['name']} ({index['type']} on {index['labelsOrTypes']} "
+            f"{index['properties']}): {index['state']}, {index['populationPercent']}% populated"
+        )
+    return report
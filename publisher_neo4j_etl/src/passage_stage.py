@@ -0,0 +1,175 @@
+import logging
+import os
+from typing import Any
+
+from embedding_stage import (
+    EMBEDDING_BATCH_SIZE,
+    EmbeddingCache,
+    create_vector_index,
+    embed_texts,
+    get_embedding_backend,
+)
+
+# Passages are windows of PASSAGE_WORDS words, each starting
+# PASSAGE_WORDS - PASSAGE_OVERLAP_WORDS words after the previous one.
+PASSAGE_WORDS = int(os.getenv("PASSAGE_WORDS", "150"))
+PASSAGE_OVERLAP_WORDS = int(os.getenv("PASSAGE_OVERLAP_WORDS", "30"))
+
+PASSAGES_VECTOR_INDEX = "passages"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def split_passages(
+    text: str, words: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP_WORDS
+) -> list[str]:
+    """Split text into overlapping windows of whole words."""
+    tokens = (text or "").split()
+    if not tokens:
+        return []
+    step = max(words - overlap, 1)
+    passages = []
+    for start in range(0, len(tokens), step):
+        passages.append(" ".join(tokens[start : start + words]))
+        if start + words >= len(tokens):
+            break
+    return passages
+
+
+def passage_embedding_text(title: str | None, passage: str) -> str:
+    # The title gives every passage of an article the same topic anchor.
+    return f"title: {title or ''}\n{passage}"
+
+
+def _fetch_stale_articles(tx, passages_key_prefix, limit):
+    result = tx.run(
+        """
+        MATCH (a:Articles)
+        WHERE a.passages_key IS NULL
+            OR a.passages_key <> $prefix + ':' + coalesce(a.content_hash, '')
+        RETURN a.article_id AS article_id,
+            coalesce(a.content_hash, '') AS content_hash,
+            a.title AS title,
+            a.body_content AS body_content
+        LIMIT $limit
+        """,
+        {"prefix": passages_key_prefix, "limit": limit},
+    )
+    return [r.data() for r in result]
+
+
+def _write_passages(tx, articles):
+    _ = tx.run(
+        """
+        UNWIND $articles AS article
+        MATCH (a:Articles {article_id: article.article_id})
+        CALL {
+            WITH a
+            OPTIONAL MATCH (old:Passage)-[:PART_OF]->(a)
+            DETACH DELETE old
+        }
+        SET a.passages_key = article.passages_key
+        WITH a, article
+        UNWIND article.passages AS passage
+        CREATE (p:Passage {
+            passage_id: passage.passage_id,
+            article_id: article.article_id,
+            seq: passage.seq,
+            text: passage.text,
+            embedding: passage.embedding
+        })-[:PART_OF]->(a)
+        """,
+        {"articles": articles},
+    ).consume()
+
+
+def embed_passages(
+    driver,
+    embeddings=None,
+    model_name: str | None = None,
+    cache: EmbeddingCache | None = None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    words: int = PASSAGE_WORDS,
+    overlap: int = PASSAGE_OVERLAP_WORDS,
+) -> dict[str, int]:
+    """Split every new or changed article into overlapping passages and
+    store them, with their embeddings, as (:Passage)-[:PART_OF]->(:Articles).
+
+    An article's passages are rebuilt when its content hash, the embedding
+    model or the passage size changes.
+    """
+    if embeddings is None:
+        embeddings, model_name = get_embedding_backend()
+    own_cache = cache is None
+    cache = cache or EmbeddingCache()
+    passages_key_prefix = f"{model_name}:{words}/{overlap}"
+
+    counts = {"articles": 0, "passages": 0, "computed": 0}
+    index_created = False
+    try:
+        with driver.session(database="neo4j") as session:
+            while True:
+                rows = session.execute_read(
+                    _fetch_stale_articles, passages_key_prefix, batch_size
+                )
+                if not rows:
+                    break
+
+                articles: list[dict[str, Any]] = []
+                texts: list[str] = []
+                for row in rows:
+                    passages = split_passages(row["body_content"], words, overlap)
+                    articles.append({"row": row, "passages": passages})
+                    texts.extend(passage_embedding_text(row["title"], p) for p in passages)
+
+                vectors, _, computed = embed_texts(texts, embeddings, model_name, cache)
+                if vectors and not index_created:
+                    session.execute_write(
+                        create_vector_index,
+                        PASSAGES_VECTOR_INDEX,
+                        "Passage",
+                        len(vectors[0]),
+                    )
+                    index_created = True
+
+                vector_iter = iter(vectors)
+                session.execute_write(
+                    _write_passages,
+                    [
+                        {
+                            "article_id": a["row"]["article_id"],
+                            "passages_key": f"{passages_key_prefix}:{a['row']['content_hash']}",
+                            "passages": [
+                                {
+                                    "passage_id": f"{a['row']['article_id']}:{seq}",
+                                    "seq": seq,
+                                    "text": text,
+                                    "embedding": next(vector_iter),
+                                }
+                                for seq, text in enumerate(a["passages"])
+                            ],
+                        }
+                        for a in articles
+                    ],
+                )
+                counts["articles"] += len(rows)
+                counts["passages"] += len(texts)
+                counts["computed"] += computed
+                LOGGER.info(
+                    f"Split {counts['articles']} articles into {counts['passages']} passages ({counts['computed']} embeddings computed)"
+                )
+    finally:
+        if own_cache:
+            cache.close()
+
+    return counts
+
+
+if __name__ == "__main__":
+    from bulk_csv_writer import _get_driver
+
+    driver = _get_driver()
+    try:
+        embed_passages(driver)
+    finally:
+        driver.close()
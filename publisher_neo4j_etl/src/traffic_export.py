@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import time
+from typing import Any
+
+import numpy as np
+from etl_state import read_etl_state
+from vector_export import CURRENT_POINTER, _prune_versions
+
+# Directory shared with the API (TRAFFIC_ANALYTICS_SOURCE=export). Every
+# export goes to its own version directory and CURRENT is switched to it
+# atomically.
+TRAFFIC_EXPORT_DIR = os.getenv("TRAFFIC_EXPORT_DIR", "traffic_export")
+TRAFFIC_EXPORT_KEEP = int(os.getenv("TRAFFIC_EXPORT_KEEP", "3"))
+TRAFFIC_EXPORT_FORMAT_VERSION = 1
+
+TRAFFIC_FILE = "traffic.npz"
+SIDECAR_FILE = "articles.json"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _read_articles(tx) -> list[dict[str, Any]]:
+    result = tx.run(
+        """
+        MATCH (a:Articles)
+        OPTIONAL MATCH (r:Reporter)-[:WROTE]->(a)
+        OPTIONAL MATCH (c:Category)-[:CONTAIN]->(a)
+        RETURN a.article_id AS article_id, a.title AS title,
+            a.published_at AS published_at,
+            head(collect(DISTINCT r.reporter_name)) AS reporter_name,
+            head(collect(DISTINCT c.category_name)) AS category_name
+        ORDER BY a.article_id
+        """
+    )
+    return [r.data() for r in result]
+
+
+def _read_traffic(tx, article_rows: dict[int, int]) -> dict[str, np.ndarray]:
+    """GAIN edges as columns: the article's row in the sidecar, the day
+    (days since 1970-01-01) and the metrics, sorted by day."""
+    result = tx.run(
+        """
+        MATCH (a:Articles)-[g:GAIN]->(t:Traffic)
+        RETURN a.article_id AS article_id, t.traffic_date AS traffic_date,
+            g.activeUsers AS activeUsers, g.sessions AS sessions,
+            g.screenPageViews AS screenPageViews
+        """
+    )
+    article, day, users, sessions, pageviews = [], [], [], [], []
+    for record in result:
+        article.append(article_rows[record["article_id"]])
+        day.append(str(record["traffic_date"])[:10])
+        users.append(record["activeUsers"] or 0)
+        sessions.append(record["sessions"] or 0)
+        pageviews.append(record["screenPageViews"] or 0)
+
+    days = np.array(day, dtype="datetime64[D]").astype(np.int32)
+    order = np.argsort(days, kind="stable")
+    return {
+        "article": np.array(article, dtype=np.int32)[order],
+        "day": days[order],
+        "users": np.array(users, dtype=np.int64)[order],
+        "sessions": np.array(sessions, dtype=np.int64)[order],
+        "pageviews": np.array(pageviews, dtype=np.int64)[order],
+    }
+
+
+def export_traffic(
+    driver,
+    export_dir: str = TRAFFIC_EXPORT_DIR,
+    keep: int = TRAFFIC_EXPORT_KEEP,
+    data_version: int | None = None,
+) -> dict[str, Any]:
+    """Export the article traffic as NumPy columns (traffic.npz) plus a JSON
+    sidecar with the articles' title, reporter and category, into a new
+    version directory, then point CURRENT at it. data_version defaults to
+    the one recorded on the EtlState node."""
+    with driver.session(database="neo4j") as session:
+        if data_version is None:
+            data_version = read_etl_state(session)["data_version"]
+        articles = session.execute_read(_read_articles)
+        article_rows = {a["article_id"]: i for i, a in enumerate(articles)}
+        columns = session.execute_read(_read_traffic, article_rows)
+
+    # Never write into an existing version, API workers may be loading it.
+    version = f"v{data_version:08d}-{time.time_ns()}"
+    version_dir = os.path.join(export_dir, version)
+    os.makedirs(version_dir)
+    np.savez(os.path.join(version_dir, TRAFFIC_FILE), **columns)
+    with open(os.path.join(version_dir, SIDECAR_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": TRAFFIC_EXPORT_FORMAT_VERSION,
+                "data_version": data_version,
+                "articles": articles,
+            },
+            f,
+        )
+
+    pointer_path = os.path.join(export_dir, CURRENT_POINTER)
+    with open(f"{pointer_path}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer_path}.tmp", pointer_path)
+
+    _prune_versions(export_dir, keep)
+    rows = len(columns["day"])
+    LOGGER.info(f"Exported {rows} traffic rows of {len(articles)} articles to {version_dir}")
+    return {"version": version, "rows": rows, "articles": len(articles)}
+
+
+if __name__ == "__main__":
+    from bulk_csv_writer import _get_driver
+
+    driver = _get_driver()
+    try:
+        export_traffic(driver)
+    finally:
+        driver.close()
@@ -0,0 +1,192 @@
+import logging
+from datetime import date, timedelta
+
+LOGGER = logging.getLogger(__name__)
+
+# Rollup node label, the pattern binding its owner and the owner's key
+# property, per aggregation scope.
+SCOPES = {
+    "article": {
+        "label": "ArticleTraffic",
+        "owner": "(owner:Articles)",
+        "owner_label": "Articles",
+        "key": "article_id",
+    },
+    "category": {
+        "label": "CategoryTraffic",
+        "owner": "(owner:Category)-[:CONTAIN]->(:Articles)",
+        "owner_label": "Category",
+        "key": "category_name",
+    },
+    "reporter": {
+        "label": "ReporterTraffic",
+        "owner": "(owner:Reporter)-[:WROTE]->(:Articles)",
+        "owner_label": "Reporter",
+        "key": "reporter_name",
+    },
+}
+
+
+_DELETE_PERIOD = """
+    CALL {{
+        WITH period
+        MATCH (:{owner_label})-[:ROLLUP]->(old:{label} {{grain: period.grain, period_start: period.start}})
+        DETACH DELETE old
+    }}
+"""
+
+_CREATE_ROLLUP = """
+    CREATE (owner)-[:ROLLUP]->(:{label} {{
+        {key}: owner.{key},
+        grain: period.grain,
+        period_start: period.start,
+        activeUsers: users,
+        sessions: sessions,
+        screenPageViews: pageviews
+    }})
+"""
+
+
+def _day_rollup_query(scope: dict[str, str]) -> str:
+    """Aggregate GAIN edges into the day rollups of each period."""
+    return (
+        "UNWIND $periods AS period"
+        + _DELETE_PERIOD.format(**scope)
+        + f"""
+    WITH period
+    MATCH {scope["owner"]}-[g:GAIN]->(t:Traffic)
+    WHERE t.traffic_date >= period.start AND t.traffic_date < period.end
+    WITH period, owner,
+        sum(g.activeUsers) AS users,
+        sum(g.sessions) AS sessions,
+        sum(g.screenPageViews) AS pageviews
+    """
+        + _CREATE_ROLLUP.format(**scope)
+    )
+
+
+def _period_rollup_query(scope: dict[str, str]) -> str:
+    """Aggregate day rollups into the week/month rollups of each period."""
+    return (
+        "UNWIND $periods AS period"
+        + _DELETE_PERIOD.format(**scope)
+        + f"""
+    WITH period
+    MATCH (owner:{scope["owner_label"]})-[:ROLLUP]->(day:{scope["label"]} {{grain: 'day'}})
+    WHERE day.period_start >= period.start AND day.period_start < period.end
+    WITH period, owner,
+        sum(day.activeUsers) AS users,
+        sum(day.sessions) AS sessions,
+        sum(day.screenPageViews) AS pageviews
+    """
+        + _CREATE_ROLLUP.format(**scope)
+    )
+
+
+def day_periods(traffic_dates: list[str]) -> list[dict[str, str]]:
+    """Half-open [start, end) periods for each traffic date."""
+    return [
+        {
+            "grain": "day",
+            "start": d,
+            "end": (date.fromisoformat(d) + timedelta(days=1)).isoformat(),
+        }
+        for d in sorted(set(traffic_dates))
+    ]
+
+
+def week_periods(traffic_dates: list[str]) -> list[dict[str, str]]:
+    """Monday-based weeks containing the traffic dates."""
+    starts = {
+        date.fromisoformat(d) - timedelta(days=date.fromisoformat(d).weekday())
+        for d in traffic_dates
+    }
+    return [
+        {
+            "grain": "week",
+            "start": start.isoformat(),
+            "end": (start + timedelta(days=7)).isoformat(),
+        }
+        for start in sorted(starts)
+    ]
+
+
+def month_periods(traffic_dates: list[str]) -> list[dict[str, str]]:
+    """Calendar months containing the traffic dates."""
+    starts = {date.fromisoformat(d).replace(day=1) for d in traffic_dates}
+    return [
+        {
+            "grain": "month",
+            "start": start.isoformat(),
+            "end": (start.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat(),
+        }
+        for start in sorted(starts)
+    ]
+
+
+def _write_rollups(tx, query, periods):
+    _ = tx.run(query, {"periods": periods}).consume()
+
+
+def _all_traffic_dates(tx):
+    result = tx.run("MATCH (t:Traffic) RETURN t.traffic_date AS traffic_date")
+    return [r["traffic_date"] for r in result]
+
+
+def _traffic_dates_of_articles(tx, article_ids):
+    result = tx.run(
+        """
+        MATCH (a:Articles)-[:GAIN]->(t:Traffic)
+        WHERE a.article_id IN $article_ids
+        RETURN DISTINCT t.traffic_date AS traffic_date
+        """,
+        {"article_ids": article_ids},
+    )
+    return [r["traffic_date"] for r in result]
+
+
+def refresh_traffic_rollups(
+    driver,
+    traffic_dates: list[str] | None = None,
+    changed_article_ids: list[int] | None = None,
+    batch_size: int = 7,
+) -> int:
+    """Recompute the day, week and month rollups covering the given
+    traffic dates for every scope.
+
+    Dates whose traffic belongs to a changed (e.g. re-assigned) article are
+    recomputed too. Without any dates every traffic date is recomputed.
+    Returns the number of days refreshed.
+    """
+    with driver.session(database="neo4j") as session:
+        if traffic_dates is None:
+            traffic_dates = session.execute_read(_all_traffic_dates)
+        else:
+            traffic_dates = list(traffic_dates)
+        if changed_article_ids:
+            traffic_dates += session.execute_read(
+                _traffic_dates_of_articles, changed_article_ids
+            )
+
+        periods = {
+            "day": day_periods(traffic_dates),
+            "week": week_periods(traffic_dates),
+            "month": month_periods(traffic_dates),
+        }
+        for name, scope in SCOPES.items():
+            # Day rollups first, weeks and months are summed from them.
+            for grain, grain_periods in periods.items():
+                if grain == "day":
+                    query = _day_rollup_query(scope)
+                else:
+                    query = _period_rollup_query(scope)
+                for start in range(0, len(grain_periods), batch_size):
+                    session.execute_write(
+                        _write_rollups, query, grain_periods[start : start + batch_size]
+                    )
+            LOGGER.info(
+                f"Refreshed {name} rollups for {len(periods['day'])} days, "
+                f"{len(periods['week'])} weeks and {len(periods['month'])} months"
+            )
+
+    return len(periods["day"])
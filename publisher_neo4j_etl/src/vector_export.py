@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any
+
+import numpy as np
+from etl_state import read_etl_state
+
+# Directory shared with the API (SUMMARY_RETRIEVER=mmap). Every export goes
+# to its own version directory and CURRENT is switched to it atomically.
+VECTOR_EXPORT_DIR = os.getenv("VECTOR_EXPORT_DIR", "vector_export")
+VECTOR_EXPORT_KEEP = int(os.getenv("VECTOR_EXPORT_KEEP", "3"))
+VECTOR_EXPORT_FORMAT_VERSION = 1
+
+CURRENT_POINTER = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+SIDECAR_FILE = "articles.json"
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _embedding_shape(tx) -> tuple[int, int]:
+    record = tx.run(
+        """
+        MATCH (a:Articles)
+        WHERE a.embedding IS NOT NULL
+        RETURN count(a) AS count, max(size(a.embedding)) AS dimension
+        """
+    ).single()
+    return record["count"], record["dimension"]
+
+
+def _read_embedded_articles(tx, vectors):
+    """Fill vectors with unit-length article embeddings, returning the id,
+    metadata and text of each row."""
+    result = tx.run(
+        """
+        MATCH (a:Articles)
+        WHERE a.embedding IS NOT NULL
+        OPTIONAL MATCH (r:Reporter)-[:WROTE]->(a)
+        OPTIONAL MATCH (c:Category)-[:CONTAIN]->(a)
+        RETURN a.article_id AS article_id,
+            a.title AS title,
+            a.published_at AS published_at,
+            a.body_content AS body_content,
+            r.reporter_name AS reporter_name,
+            c.category_name AS category_name,
+            a.embedding AS embedding
+        ORDER BY a.article_id
+        """
+    )
+    articles = []
+    for i, record in enumerate(result):
+        if i >= len(vectors):
+            raise RuntimeError("Articles were embedded while exporting vectors")
+        vector = np.asarray(record["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vectors[i] = vector / norm if norm else vector
+        articles.append(
+            {
+                "article_id": record["article_id"],
+                "title": record["title"],
+                "published_at": record["published_at"],
+                "reporter_name": record["reporter_name"],
+                "category_name": record["category_name"],
+                "body_content": record["body_content"],
+            }
+        )
+    return articles
+
+
+def read_current_version(export_dir: str = VECTOR_EXPORT_DIR) -> str | None:
+    try:
+        with open(os.path.join(export_dir, CURRENT_POINTER), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _prune_versions(export_dir: str, keep: int) -> None:
+    """Delete all but the newest `keep` version directories. Processes still
+    reading an older one keep their memory map until they reload."""
+    current = read_current_version(export_dir)
+    versions = sorted(
+        name
+        for name in os.listdir(export_dir)
+        if name.startswith("v") and os.path.isdir(os.path.join(export_dir, name))
+    )
+    for name in versions[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(export_dir, name), ignore_errors=True)
+
+
+def export_article_vectors(
+    driver,
+    export_dir: str = VECTOR_EXPORT_DIR,
+    keep: int = VECTOR_EXPORT_KEEP,
+    data_version: int | None = None,
+) -> dict[str, Any]:
+    """Export the Articles embeddings as a float32 .npy matrix plus a JSON
+    sidecar (ids, metadata and retrieval text, in matrix row order) into a
+    new version directory, then point CURRENT at it. data_version defaults
+    to the one recorded on the EtlState node."""
+    with driver.session(database="neo4j") as session:
+        if data_version is None:
+            data_version = read_etl_state(session)["data_version"]
+        count, dimension = session.execute_read(_embedding_shape)
+        if count == 0:
+            LOGGER.info("No embedded articles to export")
+            return {"version": None, "articles": 0}
+
+        # Never write into an existing version, API workers may map it.
+        version = f"v{data_version:08d}-{time.time_ns()}"
+        version_dir = os.path.join(export_dir, version)
+        os.makedirs(version_dir)
+
+        vectors = np.lib.format.open_memmap(
+            os.path.join(version_dir, VECTORS_FILE),
+            mode="w+",
+            dtype=np.float32,
+            shape=(count, dimension),
+        )
+        articles = session.execute_read(_read_embedded_articles, vectors)
+        if len(articles) != count:
+            raise RuntimeError("Articles were embedded while exporting vectors")
+        vectors.flush()
+        del vectors
+
+    with open(os.path.join(version_dir, SIDECAR_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": VECTOR_EXPORT_FORMAT_VERSION,
+                "data_version": data_version,
+                "dimension": dimension,
+                "articles": articles,
+            },
+            f,
+        )
+
+    pointer_path = os.path.join(export_dir, CURRENT_POINTER)
+    with open(f"{pointer_path}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer_path}.tmp", pointer_path)
+
+    _prune_versions(export_dir, keep)
+    LOGGER.info(f"Exported {count} article vectors to {version_dir}")
+    return {"version": version, "articles": count}
+
+
+if __name__ == "__main__":
+    from bulk_csv_writer import _get_driver
+
+    driver = _get_driver()
+    try:
+        export_article_vectors(driver)
+    finally:
+        driver.close()
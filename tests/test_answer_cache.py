@@ -0,0 +1,60 @@
+import asyncio
+
+from chatbot_api.utils.answer_cache import AnswerCache, DiskCacheBackend, InMemoryCacheBackend
+
+CATALOG = {"reporter": ["Muhamad Ridlo", "Natasa Kumalasah Putri"], "category": ["Regional"]}
+
+
+class SameEmbeddings:
+    """Embeds every question alike, as questions differing only in a name
+    nearly do."""
+
+    async def aembed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+async def _catalog():
+    return CATALOG
+
+
+def _cache(backend=None):
+    return AnswerCache(
+        backend or InMemoryCacheBackend(100, 3600), embeddings=SameEmbeddings(), catalog=_catalog
+    )
+
+
+def _store_and_lookup(cache, stored, asked):
+    async def run():
+        await cache.astore(stored, {"output": stored}, data_version=1)
+        return await cache.alookup(asked, data_version=1)
+
+    return asyncio.run(run())
+
+
+def test_semantic_hit_needs_the_same_entities():
+    lookup = _store_and_lookup(
+        _cache(),
+        "How many articles did Muhamad Ridlo write on 2024-03-19?",
+        "How many articles did Natasa Kumalasah Putri write on 2024-03-19?",
+    )
+    assert not lookup.hit
+
+
+def test_semantic_hit_needs_the_same_dates():
+    lookup = _store_and_lookup(
+        _cache(),
+        "Most viewed articles in Regional on 2024-03-19",
+        "Most viewed articles in Regional on 2024-03-20",
+    )
+    assert not lookup.hit
+
+
+def test_semantic_hit_with_the_same_entities(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path / "answers.sqlite"), 100, 3600)
+    lookup = _store_and_lookup(
+        _cache(backend),
+        "Which articles did Muhamad Ridlo write?",
+        "Show me the articles written by Muhamad Ridlo",
+    )
+    assert lookup.tier == "semantic"
+    assert lookup.response == {"output": "Which articles did Muhamad Ridlo write?"}
@@ -0,0 +1,46 @@
+from chatbot_api.utils.answer_cache import InMemoryCacheBackend
+from chatbot_api.utils.cypher_cache import (
+    CypherTemplateCache,
+    parameterize_cypher,
+    question_template,
+)
+
+CATALOG = {"reporter": ["Ridlo Akbar"], "category": ["News"]}
+
+
+def _template(question):
+    return question_template(question, CATALOG)
+
+
+def test_parameterizes_exact_literals():
+    template = _template("Articles by Ridlo Akbar since 2024-03-01")
+    cypher = (
+        "MATCH (r:Reporter)-[:WROTE]->(a) WHERE r.reporter_name = 'ridlo akbar' "
+        "AND a.published_at >= date('2024-03-01') RETURN a.title"
+    )
+    assert parameterize_cypher(cypher, template) == (
+        "MATCH (r:Reporter)-[:WROTE]->(a) WHERE r.reporter_name = $reporter_0 "
+        "AND a.published_at >= date($date_0) RETURN a.title"
+    )
+
+
+def test_rejects_literals_derived_from_the_question():
+    template = _template("Articles by Ridlo Akbar in News on 2024-03-01")
+    base = "WHERE r.reporter_name = 'Ridlo Akbar' AND c.category_name = 'News' "
+    dated = base + "AND t.traffic_date = date('2024-03-01') "
+    # Partial or reshaped names.
+    assert parameterize_cypher(dated + "AND a.title CONTAINS 'Ridlo'", template) is None
+    assert parameterize_cypher(dated + "AND a.slug =~ '.*NEWS.*'", template) is None
+    # Date bounds and parts computed from the date.
+    assert parameterize_cypher(dated + "AND a.published_at < '2024-03-02'", template) is None
+    assert parameterize_cypher(dated + "AND a.published_at.year = 2024", template) is None
+    # Literals unrelated to the extracted values are fine.
+    assert parameterize_cypher(dated + "AND a.status = 'published'", template) is not None
+
+
+def test_delete_evicts_the_template():
+    cache = CypherTemplateCache(InMemoryCacheBackend(10, 60), catalog=lambda: CATALOG)
+    template = cache.template("Articles by Ridlo Akbar")
+    cache.put(template, "MATCH (a) RETURN a")
+    cache.delete(template)
+    assert cache.get(template) is None
@@ -0,0 +1,175 @@
+import asyncio
+import csv
+import os
+
+import pytest
+
+from chatbot_api.rag_agents import fast_path
+from chatbot_api.rag_agents.fast_path import (
+    FAST_PATH_RECENT_DAYS,
+    FAST_PATH_TOP_N,
+    match_fast_path,
+)
+
+CATALOG = {
+    "reporter": ["Muhamad Ridlo", "Natasa Kumalasah Putri"],
+    "category": ["Regional", "News", "Entertainment", "Lifestyle"],
+}
+
+ARTICLES_CSV = os.path.join(os.path.dirname(__file__), "..", "data", "articles.csv")
+
+
+def _real_catalog():
+    with open(ARTICLES_CSV, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    return {
+        "reporter": sorted({r["reporter_name"] for r in rows if r["reporter_name"]}),
+        "category": sorted({r["category_name"] for r in rows if r["category_name"]}),
+    }
+
+
+REAL_CATALOG = _real_catalog()
+
+
+def _match(question):
+    return match_fast_path(question, CATALOG)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        # Example questions of fe/main.py that need the agent.
+        "Give me summary of the latest article?",
+        "What is the highlight of politics right now?",
+        "Have you got any entertainment or lifestyle news?",
+        # Rankings and counts by category or of reporters.
+        "Which reporter wrote the most articles?",
+        "Which category is the most popular?",
+        "What is the most viewed category?",
+        "How many reporters wrote in Regional?",
+        # Totals of views rather than rankings.
+        "How many views did the latest article get?",
+        "How many views did Muhamad Ridlo get?",
+        "What are the views of Muhamad Ridlo?",
+        # Numbers that are not a limit.
+        "How many articles in Regional in 2024?",
+        "What is the most viewed articles in the last 30 days?",
+    ],
+)
+def test_falls_back_to_agent(question):
+    assert _match(question) is None
+
+
+def test_article_by_reporter():
+    match = _match("Give me the article wrote by Muhamad Ridlo?")
+    assert match.intent == "list_articles"
+    assert match.params["reporter"] == "Muhamad Ridlo"
+
+
+def test_most_viewed_lately():
+    match = _match("What is the most viewed articles lately")
+    assert match.intent == "most_viewed"
+    assert match.params["recent_days"] == FAST_PATH_RECENT_DAYS
+    assert match.params["limit"] == FAST_PATH_TOP_N
+
+
+def test_most_productive_reporter():
+    match = _match("Who is the most productive reporter?")
+    assert match.intent == "most_productive_reporter"
+    assert match.params["top_n"] == FAST_PATH_TOP_N
+
+
+def test_top_n_limit():
+    match = _match("Top 5 most viewed articles in Regional")
+    assert match.intent == "most_viewed"
+    assert match.params["limit"] == 5
+    assert match.params["category"] == "Regional"
+
+
+def test_count_articles_on_a_day():
+    match = _match("How many articles did Muhamad Ridlo write on 2024-03-19?")
+    assert match.intent == "count_articles"
+    assert match.params["start_date"] == match.params["end_date"] == "2024-03-19"
+
+
+def test_until_is_an_end_date():
+    match = _match("How many articles did Muhamad Ridlo write until 2024-03-31?")
+    assert match.intent == "count_articles"
+    assert match.params["start_date"] is None
+    assert match.params["end_date"] == "2024-03-31"
+
+
+def test_before_and_after_leave_out_the_date():
+    before = _match("List articles in Regional before 2024-03-31")
+    assert (before.params["start_date"], before.params["end_date"]) == (None, "2024-03-30")
+    after = _match("List articles in Regional after 2024-03-31")
+    assert (after.params["start_date"], after.params["end_date"]) == ("2024-04-01", None)
+
+
+def test_since_is_a_start_date():
+    match = _match("Show articles by Muhamad Ridlo since 2024-03-01")
+    assert (match.params["start_date"], match.params["end_date"]) == ("2024-03-01", None)
+
+
+def test_two_dates_are_a_range():
+    match = _match("Most viewed articles between 2024-03-31 and 2024-03-01")
+    assert (match.params["start_date"], match.params["end_date"]) == (
+        "2024-03-01",
+        "2024-03-31",
+    )
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is the latest news?",
+        "Show me the most popular news",
+        "Give me the 3 latest news",
+    ],
+)
+def test_news_is_not_the_news_category(question):
+    assert "News" in REAL_CATALOG["category"]
+    assert match_fast_path(question, REAL_CATALOG) is None
+
+
+def test_news_category_when_named_as_category():
+    match = match_fast_path("Show the latest articles in category News", REAL_CATALOG)
+    assert match.intent == "latest_articles"
+    assert match.params["category"] == "News"
+
+
+def test_real_category_names():
+    match = match_fast_path("Most viewed articles in Bola", REAL_CATALOG)
+    assert match.intent == "most_viewed"
+    assert match.params["category"] == "Bola"
+
+
+def test_singular_article_gets_one_row():
+    match = _match("What is the most popular article by Muhamad Ridlo?")
+    assert match.intent == "most_viewed"
+    assert match.params["limit"] == 1
+    assert _match("Most popular articles by Muhamad Ridlo").params["limit"] == FAST_PATH_TOP_N
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+
+    async def aquery(self, query, params=None):
+        self.queries.append(query)
+        return [{"articles": 1}]
+
+
+@pytest.mark.parametrize(
+    "question, anchor",
+    [
+        ("How many articles did Muhamad Ridlo write?", "(r:Reporter {reporter_name: $reporter})"),
+        ("How many articles in Regional?", "(c:Category {category_name: $category})"),
+    ],
+)
+def test_queries_start_from_the_named_node(monkeypatch, question, anchor):
+    connection = FakeConnection()
+    monkeypatch.setattr(fast_path, "get_connection_manager", lambda: connection)
+    asyncio.run(fast_path._run_intent(_match(question)))
+    assert connection.queries[0].lstrip().startswith("MATCH " + anchor)
+    assert "IS NULL OR r.reporter_name" not in connection.queries[0]
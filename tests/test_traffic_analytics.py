@@ -0,0 +1,150 @@
+from chatbot_api.tools import traffic_analytics
+from chatbot_api.tools.traffic_analytics import (
+    TRAFFIC_ANALYTICS_TOP_N,
+    TrafficAnalytics,
+    TrafficTable,
+    parse_popular_input,
+)
+
+ARTICLES = [
+    {
+        "article_id": 1,
+        "title": "A",
+        "published_at": "2024-03-01",
+        "reporter_name": "Ridlo",
+        "category_name": "News",
+    },
+    {
+        "article_id": 2,
+        "title": "B",
+        "published_at": "2024-03-02",
+        "reporter_name": "Putri",
+        "category_name": "Regional",
+    },
+]
+
+
+def _row(article_id, traffic_date, pageviews, sessions=1, users=1):
+    return {
+        "article_id": article_id,
+        "traffic_date": traffic_date,
+        "screenPageViews": pageviews,
+        "sessions": sessions,
+        "activeUsers": users,
+    }
+
+
+ROWS = [
+    _row(1, "2024-03-01", 10),
+    _row(2, "2024-03-01", 5),
+    _row(1, "2024-03-02", 10),
+    _row(2, "2024-03-03", 30),
+]
+
+
+def test_top_n_only_after_top():
+    assert parse_popular_input("reporters sessions top 5 in 2024")["top_n"] == 5
+    assert parse_popular_input("5 reporters by sessions")["top_n"] == 5
+    assert parse_popular_input("articles 2024")["top_n"] == TRAFFIC_ANALYTICS_TOP_N
+
+
+def test_first_metric_wins():
+    assert parse_popular_input("users and sessions of reporters")["metric"] == "users"
+    assert parse_popular_input("sessions and users of reporters")["metric"] == "sessions"
+
+
+def test_dates_and_growth():
+    params = parse_popular_input("categories growth 2024-03-31 to 2024-03-01")
+    assert params["dimension"] == "category"
+    assert params["ranking"] == "growth"
+    assert (params["start_date"], params["end_date"]) == ("2024-03-01", "2024-03-31")
+
+
+def test_relative_ranges_end_at_last_day():
+    params = parse_popular_input("top 3 articles last 30 days", "2024-03-31")
+    assert (params["start_date"], params["end_date"]) == ("2024-03-02", "2024-03-31")
+    assert params["top_n"] == 3
+    params = parse_popular_input("reporters 2 weeks", "2024-03-31")
+    assert (params["start_date"], params["end_date"]) == ("2024-03-18", "2024-03-31")
+    params = parse_popular_input("articles last month", "2024-03-31")
+    assert params["start_date"] == "2024-03-02"
+
+
+def test_top_and_growth():
+    table = TrafficTable.from_rows(ROWS, ARTICLES)
+    assert [r["article_id"] for r in table.top("article")] == [2, 1]
+    assert table.top("reporter", "2024-03-01", "2024-03-02")[0] == {
+        "reporter_name": "Ridlo", "pageviews": 20, "sessions": 2, "users": 2,
+    }
+    growth = table.growth("category", "2024-03-03", "2024-03-03")
+    assert growth[0]["category_name"] == "Regional"
+    assert growth[0]["change"] == 30
+
+
+def test_trend_counts_days_without_traffic():
+    trend = TrafficTable.from_rows(ROWS, ARTICLES).trend(reporter="Ridlo")
+    assert [p["pageviews"] for p in trend["series"]] == [10, 10, 0]
+    assert trend["direction"] == "falling"
+
+
+def test_trend_relative_range_is_not_a_grain():
+    table = TrafficTable.from_rows(ROWS, ARTICLES)
+    trend = traffic_analytics._trend(table, "sessions last 2 days")
+    assert (trend["start_date"], trend["end_date"], trend["grain"]) == (
+        "2024-03-02",
+        "2024-03-03",
+        "day",
+    )
+
+
+class FakeConnection:
+    def __init__(self, rows, articles):
+        self.rows, self.articles = rows, articles
+
+    def query(self, query, params=None):
+        if query == traffic_analytics.TRAFFIC_ARTICLES_QUERY:
+            return self.articles
+        return self.rows
+
+
+def test_refresh_rereads_all_article_metadata(monkeypatch):
+    connection = FakeConnection(ROWS, ARTICLES)
+    version = {"value": 1}
+    monkeypatch.setattr(traffic_analytics, "get_connection_manager", lambda: connection)
+    monkeypatch.setattr(traffic_analytics, "get_data_version", lambda: version["value"])
+    analytics = TrafficAnalytics(source="neo4j", refresh_interval=0)
+    assert analytics.table().top("reporter")[0]["reporter_name"] == "Putri"
+
+    # Article 2 moves to Ridlo and gets a new day of traffic.
+    connection.rows = ROWS + [_row(2, "2024-03-04", 1)]
+    connection.articles = [ARTICLES[0], {**ARTICLES[1], "reporter_name": "Ridlo"}]
+    version["value"] = 2
+    table = analytics.table()
+    assert table.version == 2
+    assert table.last_day == "2024-03-04"
+    assert table.reporters == ["Ridlo"]
+    assert table.top("reporter")[0]["pageviews"] == 56
+
+
+def test_refresh_picks_up_backfilled_days(monkeypatch):
+    connection = FakeConnection(ROWS, ARTICLES)
+    version = {"value": 1}
+    monkeypatch.setattr(traffic_analytics, "get_connection_manager", lambda: connection)
+    monkeypatch.setattr(traffic_analytics, "get_data_version", lambda: version["value"])
+    analytics = TrafficAnalytics(source="neo4j", refresh_interval=0)
+    assert analytics.table().first_day == "2024-03-01"
+
+    # A day long before the last one is loaded late.
+    connection.rows = [_row(1, "2024-01-15", 7)] + ROWS
+    version["value"] = 2
+    table = analytics.table()
+    assert table.first_day == "2024-01-15"
+    assert table.top("article", "2024-01-15", "2024-01-15")[0]["pageviews"] == 7
+
+
+def test_empty_table_answers_without_raising():
+    table = TrafficTable.from_rows([], ARTICLES)
+    popular = traffic_analytics._popular(table, "reporters growth last 7 days")
+    assert popular["results"] == []
+    assert popular["message"] == traffic_analytics.NO_TRAFFIC
+    assert traffic_analytics._trend(table, "sessions")["message"] == traffic_analytics.NO_TRAFFIC